@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# Optimizations of the automata computed by SPOT that are applied before generating monitor code:
+# removal of unreachable states and of states that cannot contribute to a violation, merging of
+# bisimilar states, and merging of parallel transitions. Every removed state saves RAM and
+# computation time in all monitor encodings.
+#
+# This file is dual-licensed under licensed under CC BY-SA version 4.0, available at 
+# https://creativecommons.org/licenses/by-sa/4.0/legalcode and the following BSD licence:
+#
+# ------------------------------------------[BSD License Text]---------------------------------------------
+# Copyright 2024 Ruediger Ehlers
+# 
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided 
+# that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this list of conditions and 
+# the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and
+# the following disclaimer in the documentation and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or 
+# promote products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS “AS IS” AND ANY EXPRESS OR IMPLIED 
+# WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A 
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE 
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS 
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, 
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN 
+# IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from hoa_automaton import Automaton, Guard
+
+# =====================================
+# State pruning
+# =====================================
+def computeReachableStates(transitions,startStates):
+    """Set of states reachable from the given states, where transitions is a list of lists of (state,guard) pairs."""
+    reachable = set(startStates)
+    todo = list(startStates)
+    while len(todo)>0:
+        thisOne = todo.pop()
+        for (target,guard) in transitions[thisOne]:
+            if not target in reachable:
+                reachable.add(target)
+                todo.append(target)
+    return reachable
+
+
+def computeUsefulStates(automaton,universal):
+    """Computes the states that need to be kept: the states reachable from the starting states and, for universal
+    automata, only those from which the rejecting state can be reached. States of nondeterministic and deterministic
+    automata without outgoing transitions are kept, as removing them would change the step in which a violation
+    is reported. The rejecting state of a universal automaton is always kept."""
+    useful = computeReachableStates(automaton.transitions,automaton.startingStates)
+    if universal:
+        rejectingState = automaton.findRejectingState()
+        useful &= computeReachableStates(automaton.reverseTransitions,[rejectingState])
+        useful.add(rejectingState)
+    return useful
+
+
+# =====================================
+# Bisimulation and quotient automaton
+# =====================================
+def computeBisimulationClasses(automaton,states,universal):
+    """Partitions the given states into classes of bisimilar states, i.e., states that have, for every letter,
+    the same set of classes of successor states. Transitions to states that are not in the given set are ignored.
+    For universal automata, the rejecting state is not merged with any other state. Returns a dictionary mapping
+    the states to class numbers, which are ordered by the smallest state in a class."""
+    if universal:
+        rejectingState = automaton.findRejectingState()
+        classOf = {a:(1 if a==rejectingState else 0) for a in states}
+    else:
+        classOf = {a:0 for a in states}
+    nofClasses = len(set(classOf.values()))
+    while True:
+        signatures = {}
+        for state in states:
+            successorLetters = {}
+            for (target,guard) in automaton.transitions[state]:
+                if target in classOf:
+                    successorLetters[classOf[target]] = successorLetters.get(classOf[target],0) | automaton.guardToLetterSet(guard)
+            signatures[state] = (classOf[state],tuple(sorted([a for a in successorLetters.items() if a[1]!=0])))
+        classNumbers = {}
+        for state in sorted(states):
+            if not signatures[state] in classNumbers:
+                classNumbers[signatures[state]] = len(classNumbers)
+        classOf = {a:classNumbers[signatures[a]] for a in states}
+        if len(classNumbers)==nofClasses:
+            return classOf
+        nofClasses = len(classNumbers)
+
+
+def mergeGuards(guards,guardCache):
+    """A guard that is the disjunction of the given guards, which is shared via the guardCache dictionary."""
+    labels = []
+    for guard in guards:
+        if not guard.label in labels:
+            labels.append(guard.label)
+    if "t" in labels:
+        labels = ["t"]
+    label = " | ".join(labels)
+    if not label in guardCache:
+        cubes = []
+        for guard in guards:
+            for cube in guard.cubes:
+                if not cube in cubes:
+                    cubes.append(cube)
+        if labels==["t"]:
+            cubes = [(0,0)]
+        guardCache[label] = Guard(label,tuple(cubes))
+    return guardCache[label]
+
+
+def optimizeAutomaton(automaton,universal=False,name=""):
+    """Returns an optimized copy of the automaton, in which useless states (see computeUsefulStates) are removed,
+    bisimilar states are merged, and parallel transitions are merged into a single transition. The language of
+    the monitor, i.e., the steps in which violations are reported, does not change. The numbers of states and
+    transitions before and after the optimization are printed. The given automaton is not modified, as it may
+    also be used by other compilers (see loadHOAFile)."""
+    useful = computeUsefulStates(automaton,universal)
+    classOf = computeBisimulationClasses(automaton,useful,universal)
+    nofClasses = len(set(classOf.values()))
+    representatives = [None for a in range(nofClasses)]
+    for state in sorted(useful):
+        if representatives[classOf[state]] is None:
+            representatives[classOf[state]] = state
+
+    optimized = Automaton(automaton.APs)
+    optimized.apMapper = automaton.apMapper
+    optimized.literalOrder = automaton.literalOrder
+    optimized.letterSetCache = dict(automaton.letterSetCache)
+    optimized.nofStates = nofClasses
+    optimized.startingStates = set([classOf[a] for a in automaton.startingStates if a in classOf])
+    guardCache = {}
+    for state in representatives:
+        guardsByTarget = {}
+        for (target,guard) in automaton.transitions[state]:
+            if target in classOf:
+                if not classOf[target] in guardsByTarget:
+                    guardsByTarget[classOf[target]] = []
+                guardsByTarget[classOf[target]].append(guard)
+        optimized.transitions.append([(target,mergeGuards(guards,guardCache)) for (target,guards) in guardsByTarget.items()])
+    optimized.reverseTransitions = [[] for a in range(nofClasses)]
+    for (source,transitionList) in enumerate(optimized.transitions):
+        for (target,guard) in transitionList:
+            optimized.reverseTransitions[target].append((source,guard))
+
+    nofTransitionsBefore = sum([len(a) for a in automaton.transitions])
+    nofTransitionsAfter = sum([len(a) for a in optimized.transitions])
+    print("Automaton optimization for "+name+": "+str(automaton.nofStates)+" -> "+str(optimized.nofStates)+" states, "+str(nofTransitionsBefore)+" -> "+str(nofTransitionsAfter)+" transitions")
+    return optimized
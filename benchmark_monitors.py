@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# Python file to benchmark the monitors built by "build_monitors.py" and "build_violation_reason_tracking_monitor.py"
+# on the host computer instead of the Nucleo board. Every monitor is compiled with the C compiler of the host and run
+# on a long randomly generated trace that satisfies the specification as well as on recorded traces, whose file names can
+# be given as parameters to this script (in the format described in "monitortest/benchmark.c").
+#
+# This script is dual-licensed under licensed under CC BY-SA version 4.0, available at 
+# https://creativecommons.org/licenses/by-sa/4.0/legalcode and the following BSD licence:
+#
+# ------------------------------------------[BSD License Text]---------------------------------------------
+# Copyright 2024 Ruediger Ehlers
+# 
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided 
+# that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this list of conditions and 
+# the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and
+# the following disclaimer in the documentation and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or 
+# promote products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS “AS IS” AND ANY EXPRESS OR IMPLIED 
+# WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A 
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE 
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS 
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, 
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN 
+# IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import os, sys
+from hoa_automaton import loadHOAFile
+from host_benchmark import generateTrace, writeTraceFile, benchmarkMonitor, writeEmptyMonitor
+
+# =========================================
+# Settings for the scenario
+# =========================================
+APs = ["r1","y1","g1","r2","y2","g2","a1","a2"]
+TRACE_LENGTH = 1000000 # Number of letters of the generated trace
+TRACE_SEED = 1 # Seed for generating the trace
+NOF_REPETITIONS = 10 # Number of runs over every trace, used for computing the variance
+MONITORS = ["monolithic_nba.c","fragmented_monitor.c","fragmented_event_monitor.c","partitioned_fragmented_monitor.c","hybrid_fragmented_monitor.c","fragmented_packed_monitor.c","uca.c","uca_reason_tracking.c","monolithic_nba_bitparallel.c","monolithic_nba_branchless.c","monolithic_det_monitor.c","monolithic_det_table_monitor.c","monolithic_det_branchless.c","uca_bitparallel.c","uca_lookup_tables.c","uca_lazy_determinization.c","uca_context.c","uca_bitsliced.c","uca_branchless.c","uca_packed.c"]
+
+if not os.path.exists("results/uca.txt"):
+    raise Exception("Error: results/uca.txt does not exist. Run ./build_monitors.py first.")
+
+# Traces
+universalAutomaton = loadHOAFile("results/uca.txt",APs)
+writeTraceFile(generateTrace(universalAutomaton,TRACE_LENGTH,TRACE_SEED),"results/benchmark_trace.bin")
+traces = ["results/benchmark_trace.bin"]+sys.argv[1:]
+
+# Run the benchmarks
+writeEmptyMonitor(APs,"results/empty_monitor.c")
+resultLines = ["Monitor\tTrace\tns/step\tVariance\tSteps/s\tViolations"]
+for trace in traces:
+    for monitor in ["empty_monitor.c"]+MONITORS:
+        if os.path.exists("results/"+monitor):
+            result = benchmarkMonitor("results/"+monitor,trace,NOF_REPETITIONS)
+            resultLines.append(monitor+"\t"+trace+"\t"+("%.2f" % result["nsPerStep"])+"\t"+("%.4f" % result["variance"])+"\t"+("%.0f" % result["stepsPerSecond"])+"\t"+str(result["violations"]))
+            print(resultLines[-1])
+
+with open("results/host_benchmark.txt","w") as outFile:
+    for line in resultLines:
+        outFile.write(line+"\n")
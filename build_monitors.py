@@ -33,6 +33,13 @@
 # IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 import os, sys
+from hoa_automaton import loadHOAFile
+from automaton_optimization import optimizeAutomaton
+from spot_translation import translateLTL
+from spec_partitioning import partitionSpec, writeSpecBlocks
+from wcet_analysis import computeReachableStateSets, analyzeStateSetMonitor, analyzePackedStateSetMonitor, analyzeDeterministicMonitor, analyzeTableMonitor, analyzeBitParallelMonitor, analyzeLazyDeterminizationMonitor, analyzeBranchlessMonitor, analyzeBitSlicedMonitor, analyzeFragmentedMonitor, reportWorstCaseStepCost
+from caravel_encoding import generateCaravelEncoding
+from monitor_compilers import monitorCompilerNondeterministic, monitorCompilerUniversal, monitorCompilerNondeterministicBitParallel, monitorCompilerUniversalBitParallel, monitorCompilerUniversalLazyDeterminization, monitorCompilerUniversalContext, monitorCompilerUniversalBitSliced, monitorCompilerUniversalBranchless, monitorCompilerNondeterministicBranchless, monitorCompilerDeterministicBranchless, monitorCompilerDeterministic, monitorCompilerDeterministicTable, compileFragmentedMonitorInParallel, isDeterministic
 
 # =========================================
 # Settings for the scenario
@@ -42,6 +49,15 @@ APs = ["r1","y1","g1","r2","y2","g2","a1","a2"]
 # Open output file
 outFile = open("resultsTexMacros.tex","w")
 USE_NUCLEO_BOARD = True # Run experiments on the board?
+LOOKUP_TABLE_FLASH_BUDGET = 16*1024 # Flash memory (in bytes) that monitors with letter-indexed successor tables may use for the tables
+LAZY_DETERMINIZATION_CACHE_SIZE = 16 # Number of entries of the successor cache of the lazily determinizing universal monitor
+NOF_WORKERS = os.cpu_count() # Number of processes for translating and compiling the fragments of fragmented monitors
+OPTIMIZE_GUARDS = True # Minimize the guards and compute shared subterms only once per step?
+OPTIMIZE_AUTOMATA = True # Remove useless states, merge bisimilar states, and merge parallel transitions before generating code?
+PARTITIONING_COST_WEIGHTS = (1,8,16) # Weights of the estimated flash memory and RAM (in bytes) and operations per step of the fragments for the automatic partitioning of the specification
+HYBRID_COST_WEIGHTS = (1,4,16) # Weights of the estimated flash memory and RAM (in bytes) and operations per step for selecting the encoding of every fragment of the hybrid fragmented monitor
+WCET_MAX_NOF_STATE_SETS = 10000 # Number of reachable combinations of active states up to which the worst-case step cost analysis does not assume that all states can be active at the same time
+CARAVEL_MAX_NOF_BLOCKS = 6 # Number of blocks (NEWBLOCK) available for the generated Caravel hardware monitor encoding
 
 if USE_NUCLEO_BOARD:
     import serial, glob
@@ -65,14 +81,6 @@ with open("spec/starting_spec.txt","r") as inFile:
 # =====================================
 # Misc. Helper functions
 # =====================================
-def getNofStatesFromSpotFile(filename):
-    with open(filename,"r") as inFile:
-        for line in inFile.readlines():
-            if line.startswith("States: "):
-                nofStates = line.split(" ")[1].strip()
-                return nofStates
-    raise Exception("Error: Didn't find number of states in file: "+filename)
-
 def getSizesForF446RE(inFile):
     foundSuccess = False
     for line in open(inFile).readlines():
@@ -97,358 +105,29 @@ def getFlashOverflowSizeForF446RE(inFile):
     assert foundOverflow
     return dataFlash + 512*1024 # Add to FLASH memory of F446RE
 
+def measureMonitor(monitorFilename,macroName):
+    """Compiles the given monitor for the F446RE and writes the RAM and flash usage (and the number of
+    clock cycles per step if the board is used) to the TeX macros file."""
+    assert os.system("cp "+monitorFilename+" pioproject/src/monitor.c")==0
+    assert os.system("cd pioproject; pio run > /tmp/pioout 2>&1")==0
+    (newRAM,newFlash) = getSizesForF446RE("/tmp/pioout")
+    outFile.write("\\newcommand{\\RAM"+macroName+"}{"+str(newRAM-baseRAM)+"}\n")
+    outFile.write("\\newcommand{\\Flash"+macroName+"}{"+str(newFlash-baseFlash)+"}\n")
+    if USE_NUCLEO_BOARD:
+        assert os.system("cd pioproject; pio run --target upload > /tmp/pioout2 2>&1")==0
+        port = serial.Serial(glob.glob("/dev/serial/by-id/usb-STMicroelectronics_STM32_STLink*")[0],baudrate=115200)
+        nofCyclesThis = port.readline().strip().decode ("utf-8")
+        port.close()
+        assert nofCyclesThis.startswith("#Cycles:")
+        nofCyclesThis = int(nofCyclesThis.split(" ")[1])
+        outFile.write("\\newcommand{\\Cycles"+macroName+"}{"+str((nofCyclesThis-nofCyclesEmpty)//7)+"}\n")
+
 def getNofLinesFromFile(inFile):
     nofLines = 0
     for line in open(inFile).readlines():
         nofLines += 1
     return nofLines
 
-# =====================================
-# Simple monitor compilers
-# =====================================
-def monitorCompilerNondeterministic(filenameIn,filenameOut):
-    with open(filenameOut,"w") as outFile:
-        outFile.write("/* Temporal Logic Runtime Monitor Code */\n")
-        outFile.write("#include <stdint.h>\n")
-        with open(filenameIn,"r") as inFile:
-            allInLines = [a.strip() for a in inFile.readlines()]
-        
-        # Gather header information
-        apMapper = {}
-        statesToTransitionsMapper = {}
-        currentTransitionList = None
-
-        for line in allInLines:
-            if line.startswith("States: "):
-                nofStates = int(line.split(" ")[1].strip())
-            elif line.startswith("AP: "):
-                parts = line.split(" ")
-                for i,a in enumerate(parts[2:]):
-                    for j,b in enumerate(APs):
-                        if a=="\""+b+"\"":
-                            apMapper[i] = j
-                    if not i in apMapper:
-                        raise Exception("Error: AP list in the script seems to be incorrect.")
-            elif line.startswith("Start:"):
-                startingStates = set([int(a) for a in line[7:].split(" ")])
-            elif line.startswith("State:"):
-                stateNum = int(line.split(" ")[1])
-                assert not stateNum in statesToTransitionsMapper
-                currentTransitionList = []
-                statesToTransitionsMapper[stateNum] = currentTransitionList
-            elif line.startswith("["):
-                condition = line[0:line.find("]")+1]
-                destinationState = int(line[line.find("]")+1:].strip().split(" ")[0])
-                currentTransitionList.append((destinationState,condition))
-
-        # Build state information
-        outFile.write("/* State storage information */\n")
-        for i in range(0,nofStates):
-            if i in startingStates:
-                outFile.write("uint8_t inState"+str(i)+" = 1;\n")
-            else:
-                outFile.write("uint8_t inState"+str(i)+" = 0;\n")
-
-        # Build transition function
-        outFile.write("\n/* Monitor step/update function */\n")
-        outFile.write("int monitor("+",".join(["uint8_t "+a for a in APs])+") {\n")
-        for i in range(0,nofStates):
-            outFile.write("  uint8_t nextState"+str(i)+" = 0;\n")
-        for state in range(nofStates):
-            outFile.write("  if (inState"+str(state)+"){\n")
-            for (target,condition) in statesToTransitionsMapper[state]:
-                assert condition[0]=="["
-                assert condition[-1]=="]"
-                condition = condition[1:-1]
-                disjuncts = condition.split("|")
-                outFile.write("    if (")
-                for num,disjunct in enumerate(disjuncts):
-                    if num>0:
-                        outFile.write("||")
-                    if len(disjuncts)!=1:
-                        outFile.write("(")
-                    for num2,conjunct in enumerate(disjunct.split("&")):
-                        if num2>0:
-                            outFile.write("&&")
-                        conjunct = conjunct.strip()
-                        if conjunct[0]=="!":
-                            outFile.write("!")
-                            conjunct = conjunct[1:]
-                        apNum = int(conjunct)
-                        outFile.write(APs[apMapper[apNum]])
-                    if len(disjuncts)!=1:
-                        outFile.write(")")
-                outFile.write(") nextState"+str(target)+" = 1;\n")
-            outFile.write("  }\n")
-        for i in range(0,nofStates):
-            outFile.write("  inState"+str(i)+" = nextState"+str(i)+";\n")
-        for i in range(0,nofStates):
-            outFile.write("  if (inState"+str(i)+") return 0;\n")
-        outFile.write("  return 1; /* Reporting a violation. */\n")
-        outFile.write("}\n")
-
-
-def monitorCompilerUniversal(filenameIn,filenameOut):
-    with open(filenameOut,"w") as outFile:
-        outFile.write("/* Temporal Logic Runtime Monitor Code */\n")
-        outFile.write("#include <stdint.h>\n")
-        with open(filenameIn,"r") as inFile:
-            allInLines = [a.strip() for a in inFile.readlines()]
-        
-        # Gather header information
-        apMapper = {}
-        statesToTransitionsMapper = {}
-        currentTransitionList = None
-
-        for line in allInLines:
-            if line.startswith("States: "):
-                nofStates = int(line.split(" ")[1].strip())
-            elif line.startswith("AP: "):
-                parts = line.split(" ")
-                for i,a in enumerate(parts[2:]):
-                    for j,b in enumerate(APs):
-                        if a=="\""+b+"\"":
-                            apMapper[i] = j
-                    if not i in apMapper:
-                        raise Exception("Error: AP list in the script seems to be incorrect.")
-            elif line.startswith("Start:"):
-                startingStates = set([int(a) for a in line[7:].split(" ")])
-            elif line.startswith("State:"):
-                stateNum = int(line.split(" ")[1])
-                assert not stateNum in statesToTransitionsMapper
-                currentTransitionList = []
-                statesToTransitionsMapper[stateNum] = currentTransitionList
-            elif line.startswith("["):
-                condition = line[0:line.find("]")+1]
-                destinationState = int(line[line.find("]")+1:].strip().split(" ")[0])
-                currentTransitionList.append((destinationState,condition))
-
-        # Find rejecting state
-        rejectingState = None
-        for state in range(nofStates):
-            if len(statesToTransitionsMapper[state])==1:
-                if statesToTransitionsMapper[state][0][0]==state and statesToTransitionsMapper[state][0][1]=="[t]":
-                    assert rejectingState is None
-                    rejectingState = state
-        assert not rejectingState is None
-
-
-        # Build state information
-        outFile.write("/* State storage information */\n")
-        for i in range(0,nofStates):
-            if i in startingStates:
-                outFile.write("uint8_t inState"+str(i)+" = 1;\n")
-            else:
-                outFile.write("uint8_t inState"+str(i)+" = 0;\n")
-
-        # Build transition function
-        outFile.write("\n/* Monitor step/update function */\n")
-        outFile.write("int monitor("+",".join(["uint8_t "+a for a in APs])+") {\n")
-        for i in range(0,nofStates):
-            outFile.write("  uint8_t nextState"+str(i)+" = 0;\n")
-        for state in range(nofStates):
-            outFile.write("  if (inState"+str(state)+"){\n")
-            for (target,condition) in statesToTransitionsMapper[state]:
-                assert condition[0]=="["
-                assert condition[-1]=="]"
-                condition = condition[1:-1]
-                disjuncts = condition.split("|")
-                outFile.write("    if (")
-                for num,disjunct in enumerate(disjuncts):
-                    if num>0:
-                        outFile.write("||")
-                    if len(disjuncts)!=1:
-                        outFile.write("(")
-                    for num2,conjunct in enumerate(disjunct.split("&")):
-                        if num2>0:
-                            outFile.write("&&")
-                        conjunct = conjunct.strip()
-                        if conjunct=="t":
-                            outFile.write("1")
-                        else:
-                            if conjunct[0]=="!":
-                                outFile.write("!")
-                                conjunct = conjunct[1:]
-                            apNum = int(conjunct)
-                            outFile.write(APs[apMapper[apNum]])
-                    if len(disjuncts)!=1:
-                        outFile.write(")")
-                outFile.write(") nextState"+str(target)+" = 1;\n")
-            outFile.write("  }\n")
-        for i in range(0,nofStates):
-            outFile.write("  inState"+str(i)+" = nextState"+str(i)+";\n")
-        outFile.write("  return inState"+str(rejectingState)+";\n")
-        outFile.write("}\n")
-
-
-def monitorCompilerDeterministic(filenameIn,filenameOut):
-    with open(filenameOut,"w") as outFile:
-        outFile.write("/* Temporal Logic Runtime Monitor Code */\n")
-        outFile.write("#include <stdint.h>\n")
-        with open(filenameIn,"r") as inFile:
-            allInLines = [a.strip() for a in inFile.readlines()]
-        
-        # Gather header information
-        apMapper = {}
-        statesToTransitionsMapper = {}
-        currentTransitionList = None
-
-        for line in allInLines:
-            if line.startswith("States: "):
-                nofStates = int(line.split(" ")[1].strip())
-            elif line.startswith("AP: "):
-                parts = line.split(" ")
-                for i,a in enumerate(parts[2:]):
-                    for j,b in enumerate(APs):
-                        if a=="\""+b+"\"":
-                            apMapper[i] = j
-                    if not i in apMapper:
-                        raise Exception("Error: AP list in the script seems to be incorrect.")
-            elif line.startswith("Start:"):
-                startingStates = set([int(a) for a in line[7:].split(" ")])
-            elif line.startswith("State:"):
-                stateNum = int(line.split(" ")[1])
-                assert not stateNum in statesToTransitionsMapper
-                currentTransitionList = []
-                statesToTransitionsMapper[stateNum] = currentTransitionList
-            elif line.startswith("["):
-                condition = line[0:line.find("]")+1]
-                destinationState = int(line[line.find("]")+1:].strip().split(" ")[0])
-                currentTransitionList.append((destinationState,condition))
-
-        # Build state information
-        outFile.write("/* State storage information */\n")
-        assert len(startingStates)==1
-        for a in startingStates:
-            outFile.write("uint32_t monitorState = "+str(a)+";\n")
-
-        # Build transition function
-        outFile.write("\n/* Monitor step/update function */\n")
-        outFile.write("int monitor("+",".join(["uint8_t "+a for a in APs])+") {\n")
-        for state in range(nofStates):
-            outFile.write("  if (monitorState=="+str(state)+") {\n")
-            for (target,condition) in statesToTransitionsMapper[state]:
-                assert condition[0]=="["
-                assert condition[-1]=="]"
-                condition = condition[1:-1]
-                disjuncts = condition.split("|")
-                outFile.write("    if (")
-                for num,disjunct in enumerate(disjuncts):
-                    if num>0:
-                        outFile.write("||")
-                    if len(disjuncts)!=1:
-                        outFile.write("(")
-                    for num2,conjunct in enumerate(disjunct.split("&")):
-                        if num2>0:
-                            outFile.write("&&")
-                        conjunct = conjunct.strip()
-                        if conjunct[0]=="!":
-                            outFile.write("!")
-                            conjunct = conjunct[1:]
-                        apNum = int(conjunct)
-                        outFile.write(APs[apMapper[apNum]])
-                    if len(disjuncts)!=1:
-                        outFile.write(")")
-                outFile.write(") { monitorState="+str(target)+"; return 0;")
-                outFile.write("}\n")
-            outFile.write("  }\n")
-        outFile.write("  return 1; /* Fall through. */\n")
-        outFile.write("}\n")
-
-
-def monitorCompilerFragmented(filenamesIn,filenameOut):
-    with open(filenameOut,"w") as outFile:
-        outFile.write("/* Temporal Logic Runtime Monitor Code */\n")
-        outFile.write("#include <stdint.h>\n")
-        
-        apMapperFragments = [{} for a in filenamesIn]
-        statesToTransitionsMapperFragments = [{} for a in filenamesIn]
-        nofStates = {}
-        startingStates = {}
-        
-        for fragment,filenameIn in enumerate(filenamesIn):
-            with open(filenameIn,"r") as inFile:
-                allInLines = [a.strip() for a in inFile.readlines()]
-            
-            # Gather header information
-            currentTransitionList = None
-            for line in allInLines:
-                if line.startswith("States: "):
-                    nofStates[fragment] = int(line.split(" ")[1].strip())
-                elif line.startswith("AP: "):
-                    parts = line.split(" ")
-                    for i,a in enumerate(parts[2:]):
-                        for j,b in enumerate(APs):
-                            if a=="\""+b+"\"":
-                                apMapperFragments[fragment][i] = j
-                        if not i in apMapperFragments[fragment]:
-                            raise Exception("Error: AP list in the script seems to be incorrect.")
-                elif line.startswith("Start:"):
-                    startingStates[fragment] = set([int(a) for a in line[7:].split(" ")])
-                elif line.startswith("State:"):
-                    stateNum = int(line.split(" ")[1])
-                    assert not stateNum in statesToTransitionsMapperFragments[fragment]
-                    currentTransitionList = []
-                    statesToTransitionsMapperFragments[fragment][stateNum] = currentTransitionList
-                elif line.startswith("["):
-                    condition = line[0:line.find("]")+1]
-                    destinationState = int(line[line.find("]")+1:].strip().split(" ")[0])
-                    currentTransitionList.append((destinationState,condition))
-
-        # Build state information
-        outFile.write("/* State storage information */\n")
-        for fragment in range(len(filenamesIn)):
-            for i in range(0,nofStates[fragment]):
-                if i in startingStates[fragment]:
-                    outFile.write("uint8_t inState"+str(fragment)+"_"+str(i)+" = 1;\n")
-                else:
-                    outFile.write("uint8_t inState"+str(fragment)+"_"+str(i)+" = 0;\n")
-
-        # Build transition function
-        outFile.write("\n/* Monitor step/update function */\n")
-        outFile.write("int monitor("+",".join(["uint8_t "+a for a in APs])+") {\n")
-        for fragment in range(len(filenamesIn)):
-            for i in range(0,nofStates[fragment]):
-                outFile.write("  uint8_t nextState"+str(fragment)+"_"+str(i)+" = 0;\n")
-            for state in range(nofStates[fragment]):
-                outFile.write("  if (inState"+str(fragment)+"_"+str(state)+"){\n")
-                for (target,condition) in statesToTransitionsMapperFragments[fragment][state]:
-                    assert condition[0]=="["
-                    assert condition[-1]=="]"
-                    condition = condition[1:-1]
-                    disjuncts = condition.split("|")
-                    outFile.write("    if (")
-                    for num,disjunct in enumerate(disjuncts):
-                        if num>0:
-                            outFile.write("||")
-                        if len(disjuncts)!=1:
-                            outFile.write("(")
-                        for num2,conjunct in enumerate(disjunct.split("&")):
-                            if num2>0:
-                                outFile.write("&&")
-                            conjunct = conjunct.strip()
-                            if conjunct[0]=="!":
-                                outFile.write("!")
-                                conjunct = conjunct[1:]
-                            apNum = int(conjunct)
-                            outFile.write(APs[apMapperFragments[fragment][apNum]])
-                        if len(disjuncts)!=1:
-                            outFile.write(")")
-                    outFile.write(") nextState"+str(fragment)+"_"+str(target)+" = 1;\n")
-                outFile.write("  }\n")
-            for i in range(0,nofStates[fragment]):
-                outFile.write("  inState"+str(fragment)+"_"+str(i)+" = nextState"+str(fragment)+"_"+str(i)+";\n")
-            outFile.write("if (")
-            for i in range(0,nofStates[fragment]):
-                if i>0:
-                    outFile.write(" && ")
-                outFile.write("(!(inState"+str(fragment)+"_"+str(i)+"))")
-            outFile.write(") return 1;\n")
-
-        outFile.write("  return 0;\n")
-        outFile.write("}\n")
-
-
 # Get PlatformIO size base
 with open("pioproject/src/monitor.c","w") as monitorCFile:
     monitorCFile.write("#include <stdint.h>\nint monitor("+",".join(["uint8_t "+a for a in APs])+") {}\n")
@@ -471,10 +150,17 @@ for a in specBlocks:
 specOfAllBlocks = " & ".join(["("+a+")" for a in specLinesOfAllBlocks])
 
 # Experiment 1: SPOT Compilation to a single NBA
-assert os.system("lib/spot-2.12/bin/ltl2tgba -f \""+specOfAllBlocks+"\" > results/monolithic_nba.txt")==0
-outFile.write("\\newcommand{\\nofStatesMonolithic}{"+getNofStatesFromSpotFile("results/monolithic_nba.txt")+"}\n")
-monitorCompilerNondeterministic("results/monolithic_nba.txt","results/monolithic_nba.c")
+translateLTL(specOfAllBlocks,[],"results/monolithic_nba.txt")
+monolithicNBA = loadHOAFile("results/monolithic_nba.txt",APs)
+outFile.write("\\newcommand{\\nofStatesMonolithic}{"+str(monolithicNBA.nofStates)+"}\n")
+if OPTIMIZE_AUTOMATA:
+    monolithicNBA = optimizeAutomaton(monolithicNBA,False,"results/monolithic_nba.txt")
+monolithicGuards = monitorCompilerNondeterministic(monolithicNBA,"results/monolithic_nba.c",OPTIMIZE_GUARDS)
 outFile.write("\\newcommand{\\nofLinesMonolithic}{"+str(getNofLinesFromFile("results/monolithic_nba.c"))+"}\n")
+monolithicBitParallelGuards = monitorCompilerNondeterministicBitParallel(monolithicNBA,"results/monolithic_nba_bitparallel.c",0,OPTIMIZE_GUARDS)
+outFile.write("\\newcommand{\\nofLinesMonolithicBitParallel}{"+str(getNofLinesFromFile("results/monolithic_nba_bitparallel.c"))+"}\n")
+monolithicBranchlessGuards = monitorCompilerNondeterministicBranchless(monolithicNBA,"results/monolithic_nba_branchless.c",OPTIMIZE_GUARDS)
+outFile.write("\\newcommand{\\nofLinesMonolithicBranchless}{"+str(getNofLinesFromFile("results/monolithic_nba_branchless.c"))+"}\n")
 # We run out of memory both with optimization turned on and off in the next 4 lines.
 # assert os.system("cp results/monolithic_nba.c pioproject/src/monitor.c")==0
 # assert os.system("cd pioproject; pio run -e nucleo_f446re_noopt > /tmp/pioout 2>&1")!=0
@@ -483,24 +169,44 @@ outFile.write("\\newcommand{\\nofLinesMonolithic}{"+str(getNofLinesFromFile("res
 
 
 # Experiment 2: SPOT Compilation to a single det. Monitor
-assert os.system("lib/spot-2.12/bin/ltl2tgba -M -f \""+specOfAllBlocks+"\" > results/monolithic_det_monitor.txt")==0
-outFile.write("\\newcommand{\\nofStatesDeterministic}{"+getNofStatesFromSpotFile("results/monolithic_det_monitor.txt")+"}\n")
-monitorCompilerDeterministic("results/monolithic_det_monitor.txt","results/monolithic_det_monitor.c")
+translateLTL(specOfAllBlocks,["-M"],"results/monolithic_det_monitor.txt")
+monolithicDeterministic = loadHOAFile("results/monolithic_det_monitor.txt",APs)
+outFile.write("\\newcommand{\\nofStatesDeterministic}{"+str(monolithicDeterministic.nofStates)+"}\n")
+if OPTIMIZE_AUTOMATA:
+    monolithicDeterministic = optimizeAutomaton(monolithicDeterministic,False,"results/monolithic_det_monitor.txt")
+deterministicGuards = monitorCompilerDeterministic(monolithicDeterministic,"results/monolithic_det_monitor.c",OPTIMIZE_GUARDS)
 # We need to run the following without GCC optimization, as otherwise
 # GCC runs out of memory.
 assert os.system("cp results/monolithic_det_monitor.c pioproject/src/monitor.c")==0
 assert os.system("cd pioproject; pio run -e nucleo_f446re_noopt > /tmp/pioout 2>&1")!=0
 newFlash = getFlashOverflowSizeForF446RE("/tmp/pioout")
 outFile.write("\\newcommand{\\FlashDeterministicDoesNotFit}{"+str(newFlash-baseFlash)+"}\n")
+# The branchless variant stores one variable per state, so it is not flashed either
+deterministicBranchlessGuards = monitorCompilerDeterministicBranchless(monolithicDeterministic,"results/monolithic_det_branchless.c",OPTIMIZE_GUARDS)
+outFile.write("\\newcommand{\\nofLinesDeterministicBranchless}{"+str(getNofLinesFromFile("results/monolithic_det_branchless.c"))+"}\n")
+
+# Experiment 2b: Table-driven det. monitor. The "-M" automaton above need not be deterministic, so
+# SPOT is asked for a deterministic one. The table may not fit into the flash memory either.
+translateLTL(specOfAllBlocks,["-M","-D"],"results/monolithic_det_table_monitor.txt")
+tableDeterministic = loadHOAFile("results/monolithic_det_table_monitor.txt",APs)
+if OPTIMIZE_AUTOMATA:
+    tableDeterministic = optimizeAutomaton(tableDeterministic,False,"results/monolithic_det_table_monitor.txt")
+if isDeterministic(tableDeterministic):
+    outFile.write("\\newcommand{\\nofStatesDeterministicTable}{"+str(tableDeterministic.nofStates)+"}\n")
+    monitorCompilerDeterministicTable(tableDeterministic,"results/monolithic_det_table_monitor.c")
+    assert os.system("cp results/monolithic_det_table_monitor.c pioproject/src/monitor.c")==0
+    if os.system("cd pioproject; pio run > /tmp/pioout 2>&1")==0:
+        measureMonitor("results/monolithic_det_table_monitor.c","DeterministicTable")
+    else:
+        newFlash = getFlashOverflowSizeForF446RE("/tmp/pioout")
+        outFile.write("\\newcommand{\\FlashDeterministicTableDoesNotFit}{"+str(newFlash-baseFlash)+"}\n")
+else:
+    print("Warning: SPOT did not compute a deterministic automaton, so no table-driven monitor is built.")
+    tableDeterministic = None
 
 # Experiment 3: Compilation of multiple monitor blocks
-totalNumStatesBlocks = 0
-for blockNum,block in enumerate(specBlocks):
-    assert os.system("lib/spot-2.12/bin/ltl2tgba -M -f \""+" & ".join(["("+a+")" for a in block])+"\" > results/split_monitor"+str(blockNum)+".txt")==0
-    nofAdditionalStates = getNofStatesFromSpotFile("results/split_monitor"+str(blockNum)+".txt")
-    totalNumStatesBlocks += int(nofAdditionalStates)
-outFile.write("\\newcommand{\\totalNofStatesFragmented}{"+str(totalNumStatesBlocks)+"}\n")
-monitorCompilerFragmented(["results/split_monitor"+str(blockNum)+".txt" for blockNum in range(len(specBlocks))],"results/fragmented_monitor.c")
+(nofStatesBlocks,fragments) = compileFragmentedMonitorInParallel(specBlocks,APs,["results/split_monitor"+str(blockNum)+".txt" for blockNum in range(len(specBlocks))],"results/fragmented_monitor.c",NOF_WORKERS,OPTIMIZE_GUARDS,OPTIMIZE_AUTOMATA)
+outFile.write("\\newcommand{\\totalNofStatesFragmented}{"+str(sum(nofStatesBlocks))+"}\n")
 assert os.system("cp results/fragmented_monitor.c pioproject/src/monitor.c")==0
 assert os.system("cd pioproject; pio run > /tmp/pioout 2>&1")==0
 (newRAM,newFlash) = getSizesForF446RE("/tmp/pioout")
@@ -514,12 +220,35 @@ if USE_NUCLEO_BOARD:
     assert nofCyclesThis.startswith("#Cycles:")
     nofCyclesThis = int(nofCyclesThis.split(" ")[1])
     outFile.write("\\newcommand{\\CyclesFragmented}{"+str((nofCyclesThis-nofCyclesEmpty)//7)+"}\n")
+
+# Experiment 3b: Event-driven fragmented monitor that only updates fragments whose APs have changed
+eventDrivenFragments = compileFragmentedMonitorInParallel(specBlocks,APs,["results/split_monitor"+str(blockNum)+".txt" for blockNum in range(len(specBlocks))],"results/fragmented_event_monitor.c",NOF_WORKERS,OPTIMIZE_GUARDS,OPTIMIZE_AUTOMATA,True)[1]
+measureMonitor("results/fragmented_event_monitor.c","FragmentedEventDriven")
+
+# Experiment 3c: Fragmented monitor for an automatically computed partitioning of the specification
+partitionedBlocks = partitionSpec(specLinesOfAllBlocks,APs,PARTITIONING_COST_WEIGHTS,NOF_WORKERS,OPTIMIZE_GUARDS,OPTIMIZE_AUTOMATA,specBlocks)
+writeSpecBlocks(partitionedBlocks,"results/partitioned_spec.txt")
+(nofStatesPartitioned,partitionedFragments) = compileFragmentedMonitorInParallel(partitionedBlocks,APs,["results/partitioned_monitor"+str(blockNum)+".txt" for blockNum in range(len(partitionedBlocks))],"results/partitioned_fragmented_monitor.c",NOF_WORKERS,OPTIMIZE_GUARDS,OPTIMIZE_AUTOMATA)
+outFile.write("\\newcommand{\\nofBlocksPartitioned}{"+str(len(partitionedBlocks))+"}\n")
+outFile.write("\\newcommand{\\totalNofStatesPartitioned}{"+str(sum(nofStatesPartitioned))+"}\n")
+measureMonitor("results/partitioned_fragmented_monitor.c","Partitioned")
+
+# Experiment 3d: Fragmented monitor with the cheapest encoding for every fragment
+hybridFragments = compileFragmentedMonitorInParallel(specBlocks,APs,["results/hybrid_monitor"+str(blockNum)+".txt" for blockNum in range(len(specBlocks))],"results/hybrid_fragmented_monitor.c",NOF_WORKERS,OPTIMIZE_GUARDS,OPTIMIZE_AUTOMATA,False,HYBRID_COST_WEIGHTS)[1]
+measureMonitor("results/hybrid_fragmented_monitor.c","FragmentedHybrid")
+
+# Experiment 3e: Fragmented monitor with the states of all fragments stored in a single bit array
+packedFragments = compileFragmentedMonitorInParallel(specBlocks,APs,["results/split_monitor"+str(blockNum)+".txt" for blockNum in range(len(specBlocks))],"results/fragmented_packed_monitor.c",NOF_WORKERS,OPTIMIZE_GUARDS,OPTIMIZE_AUTOMATA,False,None,True)[1]
+measureMonitor("results/fragmented_packed_monitor.c","FragmentedPacked")
     
 # Experiment 4: Universal automaton
-assert os.system("lib/spot-2.12/bin/ltl2tgba -f \"!("+specOfAllBlocks+")\" > results/uca.txt")==0
-assert os.system("lib/spot-2.12/bin/ltl2tgba -f \"!("+specOfAllBlocks+")\" -d > results/uca.dot")==0
-outFile.write("\\newcommand{\\nofStatesUCW}{"+getNofStatesFromSpotFile("results/uca.txt")+"}\n")    
-monitorCompilerUniversal("results/uca.txt","results/uca.c")
+translateLTL("!("+specOfAllBlocks+")",[],"results/uca.txt")
+translateLTL("!("+specOfAllBlocks+")",["-d"],"results/uca.dot")
+universalAutomaton = loadHOAFile("results/uca.txt",APs)
+outFile.write("\\newcommand{\\nofStatesUCW}{"+str(universalAutomaton.nofStates)+"}\n")
+if OPTIMIZE_AUTOMATA:
+    universalAutomaton = optimizeAutomaton(universalAutomaton,True,"results/uca.txt")
+universalGuards = monitorCompilerUniversal(universalAutomaton,"results/uca.c",OPTIMIZE_GUARDS)
 assert os.system("cp results/uca.c pioproject/src/monitor.c")==0
 assert os.system("cd pioproject; pio run > /tmp/pioout 2>&1")==0
 (newRAM,newFlash) = getSizesForF446RE("/tmp/pioout")
@@ -534,5 +263,63 @@ if USE_NUCLEO_BOARD:
     nofCyclesThis = int(nofCyclesThis.split(" ")[1])
     outFile.write("\\newcommand{\\CyclesUniversal}{"+str((nofCyclesThis-nofCyclesEmpty)//7)+"}\n")
 
+# Experiment 4b: Universal automaton with bit-parallel state storage
+universalBitParallelGuards = monitorCompilerUniversalBitParallel(universalAutomaton,"results/uca_bitparallel.c",0,OPTIMIZE_GUARDS)
+measureMonitor("results/uca_bitparallel.c","UniversalBitParallel")
+
+# Experiment 4c: Universal automaton with bit-parallel state storage and letter-indexed successor tables
+lookupTableGuards = monitorCompilerUniversalBitParallel(universalAutomaton,"results/uca_lookup_tables.c",LOOKUP_TABLE_FLASH_BUDGET,OPTIMIZE_GUARDS)
+measureMonitor("results/uca_lookup_tables.c","UniversalLookupTables")
+
+# Experiment 4d: Universal automaton with a cache for lazy determinization
+lazyDeterminizationGuards = monitorCompilerUniversalLazyDeterminization(universalAutomaton,"results/uca_lazy_determinization.c",LAZY_DETERMINIZATION_CACHE_SIZE,0,OPTIMIZE_GUARDS)
+measureMonitor("results/uca_lazy_determinization.c","UniversalLazyDeterminization")
+
+# Experiment 4e: Universal automaton with the state in a caller-provided context, for running multiple instances
+contextGuards = monitorCompilerUniversalContext(universalAutomaton,"results/uca_context.c",OPTIMIZE_GUARDS)
+measureMonitor("results/uca_context.c","UniversalContext")
+
+# Experiment 4f: Universal automaton, bit-sliced so that one step function call advances 32 instances
+bitSlicedGuards = monitorCompilerUniversalBitSliced(universalAutomaton,"results/uca_bitsliced.c",OPTIMIZE_GUARDS)
+measureMonitor("results/uca_bitsliced.c","UniversalBitSliced")
+
+# Experiment 4g: Universal automaton with a step function without branches, which takes constant time
+branchlessGuards = monitorCompilerUniversalBranchless(universalAutomaton,"results/uca_branchless.c",OPTIMIZE_GUARDS)
+measureMonitor("results/uca_branchless.c","UniversalBranchless")
+
+# Experiment 4h: Universal automaton with the states stored in a bit array and updated in place
+packedGuards = monitorCompilerUniversal(universalAutomaton,"results/uca_packed.c",OPTIMIZE_GUARDS,True)
+measureMonitor("results/uca_packed.c","UniversalPacked")
+
+# Experiment 4i: Hardware monitor encoding for the Caravel SoC, generated from the universal automaton
+(nofLets,nofBlocks,criticalPathLength) = generateCaravelEncoding(universalAutomaton,"monitor_for_caravel/monitor_encoding_generated.txt",CARAVEL_MAX_NOF_BLOCKS)
+outFile.write("\\newcommand{\\nofLetsGeneratedCaravelEncoding}{"+str(nofLets)+"}\n")
+outFile.write("\\newcommand{\\nofBlocksGeneratedCaravelEncoding}{"+str(nofBlocks)+"}\n")
+outFile.write("\\newcommand{\\criticalPathGeneratedCaravelEncoding}{"+str(criticalPathLength)+"}\n")
+
+# Experiment 5: Static analysis of the worst-case step costs, with the guard optimizers used by the compilers
+monolithicStateSets = computeReachableStateSets(monolithicNBA,WCET_MAX_NOF_STATE_SETS)
+reportWorstCaseStepCost(outFile,"Monolithic",analyzeStateSetMonitor(monolithicNBA,monolithicStateSets,monolithicGuards),APs)
+reportWorstCaseStepCost(outFile,"MonolithicBitParallel",analyzeBitParallelMonitor(monolithicNBA,monolithicBitParallelGuards),APs)
+reportWorstCaseStepCost(outFile,"MonolithicBranchless",analyzeBranchlessMonitor(monolithicNBA,monolithicBranchlessGuards),APs)
+reportWorstCaseStepCost(outFile,"Deterministic",analyzeDeterministicMonitor(monolithicDeterministic,deterministicGuards),APs)
+reportWorstCaseStepCost(outFile,"DeterministicBranchless",analyzeBranchlessMonitor(monolithicDeterministic,deterministicBranchlessGuards),APs)
+if tableDeterministic is not None:
+    reportWorstCaseStepCost(outFile,"DeterministicTable",analyzeTableMonitor(tableDeterministic),APs)
+reportWorstCaseStepCost(outFile,"Fragmented",analyzeFragmentedMonitor(fragments,WCET_MAX_NOF_STATE_SETS,OPTIMIZE_GUARDS),APs)
+reportWorstCaseStepCost(outFile,"FragmentedEventDriven",analyzeFragmentedMonitor(eventDrivenFragments,WCET_MAX_NOF_STATE_SETS,OPTIMIZE_GUARDS,True),APs)
+reportWorstCaseStepCost(outFile,"Partitioned",analyzeFragmentedMonitor(partitionedFragments,WCET_MAX_NOF_STATE_SETS,OPTIMIZE_GUARDS),APs)
+reportWorstCaseStepCost(outFile,"FragmentedHybrid",analyzeFragmentedMonitor(hybridFragments,WCET_MAX_NOF_STATE_SETS,OPTIMIZE_GUARDS,False,True),APs)
+reportWorstCaseStepCost(outFile,"FragmentedPacked",analyzeFragmentedMonitor(packedFragments,WCET_MAX_NOF_STATE_SETS,OPTIMIZE_GUARDS,False,False,True),APs)
+universalStateSets = computeReachableStateSets(universalAutomaton,WCET_MAX_NOF_STATE_SETS)
+reportWorstCaseStepCost(outFile,"Universal",analyzeStateSetMonitor(universalAutomaton,universalStateSets,universalGuards,True),APs)
+reportWorstCaseStepCost(outFile,"UniversalBitParallel",analyzeBitParallelMonitor(universalAutomaton,universalBitParallelGuards,True),APs)
+reportWorstCaseStepCost(outFile,"UniversalLookupTables",analyzeBitParallelMonitor(universalAutomaton,lookupTableGuards,True,LOOKUP_TABLE_FLASH_BUDGET),APs)
+reportWorstCaseStepCost(outFile,"UniversalLazyDeterminization",analyzeLazyDeterminizationMonitor(universalAutomaton,lazyDeterminizationGuards),APs)
+reportWorstCaseStepCost(outFile,"UniversalContext",analyzeStateSetMonitor(universalAutomaton,universalStateSets,contextGuards,True),APs)
+reportWorstCaseStepCost(outFile,"UniversalBitSliced",analyzeBitSlicedMonitor(universalAutomaton,bitSlicedGuards,True),APs)
+reportWorstCaseStepCost(outFile,"UniversalBranchless",analyzeBranchlessMonitor(universalAutomaton,branchlessGuards,True),APs)
+reportWorstCaseStepCost(outFile,"UniversalPacked",analyzePackedStateSetMonitor(universalAutomaton,universalStateSets,packedGuards,True),APs)
+
 # Finally, statistics on this script
 outFile.write("\\newcommand{\\LinesBuildMonitorsScript}{"+str(len([a for a in open("build_monitors.py","r").readlines() if len(a.strip())>0 and not a.startswith("#")]))+"}\n")
@@ -33,6 +33,12 @@
 # IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 import os, sys
+from hoa_automaton import loadHOAFile
+from automaton_optimization import optimizeAutomaton, computeReachableStates
+from spot_translation import translateLTL
+from guard_optimization import GuardOptimizer
+from wcet_analysis import computeReachableStateSets, computeSuccessorMasks, computeLetterRepresentatives, analyzeReasonTrackingMonitor, reportWorstCaseStepCost
+from monitor_compilers import batchEntryPointsCode, smallestUnsignedCType, letterConstructionCode, cArrayInitializer
 
 # =========================================
 # Settings for the scenario
@@ -41,6 +47,11 @@ APs = ["r1","y1","g1","r2","y2","g2","a1","a2"]
 
 # User settings -- full analysis?
 USE_NUCLEO_BOARD = True # Run experiments on the board?
+OPTIMIZE_GUARDS = True # Minimize the guards and compute shared subterms only once per step?
+OPTIMIZE_AUTOMATA = True # Remove useless states, merge bisimilar states, and merge parallel transitions before generating code?
+HOST_DECODING = False # Only store a raw violation record on the device and decode it with a generated Python script?
+WCET_MAX_NOF_STATE_SETS = 10000 # Number of reachable combinations of active states up to which the worst-case step cost analysis does not assume that all states can be active at the same time
+WCET_STEP_BUDGET = None # Maximal worst-case step cost (guard operations, memory writes, and bytes copied) of the monitor, or None if there is no limit
 
 if USE_NUCLEO_BOARD:
     import serial, glob
@@ -103,74 +114,431 @@ def getNofLinesFromFile(inFile):
     return nofLines
 
 
-def monitorCompilerUniversalWithReasonTracking(filenameIn,filenameOut):
+def computeLongestIncomingPathLengths(automaton):
+    """Computes for every state the maximal number of non-self-loop transitions on a path from a starting
+    state, which is well-defined as the automaton is very weak. The states are processed in a topological
+    order (ignoring self-loops), so that the computation takes time linear in the size of the automaton.
+    If the automaton is not very weak, a cycle through multiple states is reported."""
+    nofIncoming = [len([a for (a,b) in automaton.reverseTransitions[state] if a!=state]) for state in range(automaton.nofStates)]
+    lengths = [0 for a in range(automaton.nofStates)]
+    todo = [a for a in range(automaton.nofStates) if nofIncoming[a]==0]
+    while len(todo)>0:
+        thisOne = todo.pop()
+        for (target,guard) in automaton.transitions[thisOne]:
+            if target!=thisOne:
+                lengths[target] = max(lengths[target],lengths[thisOne]+1)
+                nofIncoming[target] -= 1
+                if nofIncoming[target]==0:
+                    todo.append(target)
+
+    # All states that have not been processed have an unprocessed predecessor, so going backwards
+    # from one of them eventually leads to a state that has been visited before.
+    remainingStates = [a for a in range(automaton.nofStates) if nofIncoming[a]>0]
+    if len(remainingStates)>0:
+        path = [remainingStates[0]]
+        positions = {remainingStates[0]:0}
+        while True:
+            predecessor = [a for (a,b) in automaton.reverseTransitions[path[-1]] if a!=path[-1] and nofIncoming[a]>0][0]
+            if predecessor in positions:
+                cycle = list(reversed(path[positions[predecessor]:]))
+                break
+            positions[predecessor] = len(path)
+            path.append(predecessor)
+        raise Exception("Error: The input automaton is not very weak. It contains the cycle "+" -> ".join([str(a) for a in cycle+cycle[:1]])+".")
+    return lengths
+
+
+def computeHistoryTypes(automaton):
+    """The history of a state encodes the path to the state as a mixed-radix number, where every state on the
+    path contributes a digit for the number of the incoming transition with which it was entered. Computes for
+    every state the number of possible history values from the in-degrees along the incoming paths, and from
+    it a pair consisting of the narrowest C type that can store them and the number of 32-bit words if an
+    array of words is needed because 64 bits do not suffice (or 0 otherwise)."""
+    lengths = computeLongestIncomingPathLengths(automaton)
+    nofValues = [1 for a in range(automaton.nofStates)]
+    for state in sorted(range(automaton.nofStates),key=lambda a: lengths[a]):
+        for (sourcestate,guard) in automaton.reverseTransitions[state]:
+            if sourcestate!=state:
+                nofValues[state] = max(nofValues[state],nofValues[sourcestate]*len(automaton.reverseTransitions[state]))
+    historyTypes = []
+    for a in nofValues:
+        if a-1 < (1 << 64):
+            historyTypes.append((smallestUnsignedCType(a-1),0))
+        else:
+            historyTypes.append(("uint32_t",((a-1).bit_length()+31)//32))
+    return historyTypes
+
+
+def computeBytesCopiedPerTransition(automaton):
+    """For every transition (source,target) that is not a self-loop, computes the number of bytes written when
+    it is taken in the monitors that store the proposition values along the path to every state in a buffer:
+    the buffer of the source state and the current proposition values are copied to the buffer of the target
+    state, and the history of the target state is written."""
+    apValueSize = 1 if len(APs)<=8 else 4
+    maxLengthIncomingTracePerState = computeLongestIncomingPathLengths(automaton)
+    historyTypes = computeHistoryTypes(automaton)
+    bytesCopied = {}
+    for state in range(automaton.nofStates):
+        for (target,guard) in automaton.transitions[state]:
+            if target!=state:
+                (cType,nofWords) = historyTypes[target]
+                historySize = 4*nofWords if nofWords>0 else int(cType[4:-2])//8
+                bytesCopied[(state,target)] = (maxLengthIncomingTracePerState[state]+1)*apValueSize+historySize
+    return bytesCopied
+
+
+def computeTraceStorageBytes(automaton):
+    """Number of bytes of RAM for the state variables, histories, and proposition value buffers of the
+    monitors that store a buffer for every state."""
+    apValueSize = 1 if len(APs)<=8 else 4
+    maxLengthIncomingTracePerState = computeLongestIncomingPathLengths(automaton)
+    nofBytes = 0
+    for (state,(cType,nofWords)) in enumerate(computeHistoryTypes(automaton)):
+        nofBytes += 1+(4*nofWords if nofWords>0 else int(cType[4:-2])//8)+maxLengthIncomingTracePerState[state]*apValueSize
+    return nofBytes
+
+
+def computeHistoryPoolLayout(automaton,stateSets):
+    """Computes the size of the history node pool of monitorCompilerUniversalWithSharedHistoryReasonTracking.
+    Every state that is active before or after a step holds a chain of at most (length of the longest path
+    to it) nodes, and as the states are updated from the deepest one, the states that have already been
+    updated hold their new chains and the others their old ones. The pool size is the maximum of the number
+    of nodes in these chains over all steps from the reachable combinations of states (stateSets, e.g., as
+    computed by computeReachableStateSets) and all letters. As the reference count of a node is at most the
+    number of states holding a chain through it, which are the state of the node and states reachable from it,
+    the number of the incoming transition of a node and its reference count are stored together, with the
+    reference count in the lowest referenceBits bits. For the universal automaton of the case study, both fit
+    into a single byte.
+    Returns a tuple consisting of the pool size, the C types for node numbers and the combined transition
+    numbers and reference counts, and referenceBits."""
+    lengths = computeLongestIncomingPathLengths(automaton)
+    successorMasks = computeSuccessorMasks(automaton)
+    letters = computeLetterRepresentatives(automaton)
+    updateOrder = [a for a in sorted(range(automaton.nofStates),key=lambda a: -lengths[a]) if not a in automaton.startingStates]
+    poolSize = 1
+    maxNofHolders = 1
+    for stateSet in stateSets:
+        activeStates = [state for state in range(automaton.nofStates) if stateSet & (1 << state)]
+        for letter in letters:
+            successors = 0
+            for state in activeStates:
+                successors |= successorMasks[state][letter]
+            nofNodes = sum([lengths[state] for state in updateOrder if stateSet & (1 << state)])
+            maxNofNodes = nofNodes
+            for state in updateOrder:
+                nofNodes += lengths[state]*(((successors >> state) & 1)-((stateSet >> state) & 1))
+                maxNofNodes = max(maxNofNodes,nofNodes)
+            poolSize = max(poolSize,maxNofNodes)
+            maxNofHolders = max(maxNofHolders,len([state for state in updateOrder if (stateSet | successors) & (1 << state)]))
+    # The chains through a node of a state only belong to the state and to the states reachable from it
+    maxNofDescendants = max([1]+[len([a for a in computeReachableStates(automaton.transitions,[state]) if not a in automaton.startingStates]) for state in updateOrder])
+    referenceBits = min(maxNofHolders,maxNofDescendants).bit_length()
+    edgeBits = (max([len(a) for a in automaton.reverseTransitions])-1).bit_length()
+    return (poolSize,smallestUnsignedCType(poolSize),smallestUnsignedCType((1 << (referenceBits+edgeBits))-1),referenceBits)
+
+
+def computeSharedHistoryStorageBytes(automaton,stateSets):
+    """Number of bytes of RAM for the state variables and the history node pool of
+    monitorCompilerUniversalWithSharedHistoryReasonTracking."""
+    (poolSize,nodeType,infoType,referenceBits) = computeHistoryPoolLayout(automaton,stateSets)
+    nodeSize = int(nodeType[4:-2])//8
+    letterSize = 1 if len(APs)<=8 else 4
+    nofInitialStates = len(automaton.startingStates)
+    return nofInitialStates+(automaton.nofStates-nofInitialStates)*nodeSize+poolSize*(letterSize+nodeSize+int(infoType[4:-2])//8)+nodeSize
+
+
+def historyDeclarationCode(state,historyTypes):
+    (cType,nofWords) = historyTypes[state]
+    if nofWords==0:
+        return "volatile "+cType+" state"+str(state)+"history = 0;\n"
+    return "volatile uint32_t state"+str(state)+"history["+str(nofWords)+"] = {0};\n"
+
+
+def historyLoadCode(state,historyTypes):
+    """Declaration of a local copy localState<i>history of the history of a state, for the batch entry points."""
+    (cType,nofWords) = historyTypes[state]
+    if nofWords==0:
+        return "  "+cType+" localState"+str(state)+"history = state"+str(state)+"history;\n"
+    return "  uint32_t localState"+str(state)+"history["+str(nofWords)+"] = {"+",".join(["state"+str(state)+"history["+str(i)+"]" for i in range(nofWords)])+"};\n"
+
+
+def historyStoreCode(state,historyTypes):
+    """Code for copying the local copy of the history of a state back."""
+    nofWords = historyTypes[state][1]
+    if nofWords==0:
+        return "  state"+str(state)+"history = localState"+str(state)+"history;\n"
+    return "".join(["  state"+str(state)+"history["+str(i)+"] = localState"+str(state)+"history["+str(i)+"];\n" for i in range(nofWords)])
+
+
+def historyUpdateCode(state,sourcestate,inDegree,transitionNum,historyTypes,indentation,prefix="state"):
+    """Code for appending the digit transitionNum to the history of sourcestate and storing the result as history of state.
+    The histories are stored in the variables <prefix><i>history."""
+    (cType,nofWords) = historyTypes[state]
+    (sourceType,nofSourceWords) = historyTypes[sourcestate]
+    source = prefix+str(sourcestate)+"history"
+    if nofWords==0:
+        return indentation+prefix+str(state)+"history = ("+cType+")"+source+" * "+str(inDegree)+" + "+str(transitionNum)+";\n"
+
+    # Multiplication of an array of words with the in-degree, word by word with carry
+    if nofSourceWords>0:
+        sourceWords = [source+"["+str(i)+"]" for i in range(nofSourceWords)]
+    elif sourceType=="uint64_t":
+        sourceWords = ["(uint32_t)"+source,"(uint32_t)("+source+" >> 32)"]
+    else:
+        sourceWords = [source]
+    code = [indentation+"{\n"]
+    code.append(indentation+"  uint64_t product = "+str(transitionNum)+";\n")
+    for i in range(nofWords):
+        carry = "product" if i==0 else "(product >> 32)"
+        if i<len(sourceWords):
+            code.append(indentation+"  product = (uint64_t)"+sourceWords[i]+" * "+str(inDegree)+" + "+carry+";\n")
+        else:
+            code.append(indentation+"  product = "+carry+";\n")
+        code.append(indentation+"  "+prefix+str(state)+"history["+str(i)+"] = (uint32_t)product;\n")
+    code.append(indentation+"}\n")
+    return "".join(code)
+
+
+def historyDivisionCode(historyTypes,rejectingState):
+    """Code for a function that divides the history of the rejecting state by the in-degree of a state and returns
+    the remainder, which is only needed if the history is stored in an array of words."""
+    nofWords = historyTypes[rejectingState][1]
+    if nofWords==0:
+        return ""
+    code = ["static uint32_t divideHistory(uint32_t *history, uint32_t divisor) {\n"]
+    code.append("  uint64_t remainder = 0;\n")
+    code.append("  for (int i="+str(nofWords-1)+";i>=0;i--) {\n")
+    code.append("    uint64_t value = (remainder << 32) | history[i];\n")
+    code.append("    history[i] = (uint32_t)(value / divisor);\n")
+    code.append("    remainder = value % divisor;\n")
+    code.append("  }\n")
+    code.append("  return (uint32_t)remainder;\n")
+    code.append("}\n\n")
+    return "".join(code)
+
+
+def historyDecoderCode(historyTypes,rejectingState):
+    """Declaration of the local copy of the history of the rejecting state in the trace decompiler."""
+    (cType,nofWords) = historyTypes[rejectingState]
+    if nofWords==0:
+        return "  "+cType+" history = state"+str(rejectingState)+"history;\n"
+    return "  uint32_t history["+str(nofWords)+"] = {"+",".join(["state"+str(rejectingState)+"history["+str(i)+"]" for i in range(nofWords)])+"};\n"
+
+
+def historyDigitCode(historyTypes,rejectingState,inDegree):
+    """Expression for the last digit of the history in the trace decompiler. For arrays of words, the digit is
+    removed from the history at the same time."""
+    if historyTypes[rejectingState][1]==0:
+        return "history % "+str(inDegree)
+    return "divideHistory(history,"+str(inDegree)+")"
+
+
+def writeViolatingTraceInformationCode(outFile,automaton,historyTypes,maxLengthIncomingTracePerState):
+    """Writes the function buildViolatingTraceInformation(), which decodes the history and the proposition values
+    stored for the rejecting state into a human-readable description of the violating trace on the device."""
+    nofStates = automaton.nofStates
+    startingStates = automaton.startingStates
+    reverseTransitionRelation = automaton.reverseTransitions
+    rejectingState = automaton.findRejectingState()
+    outFile.write(historyDivisionCode(historyTypes,rejectingState))
+    outFile.write("/* Function for obtaining trace information from stored values. Uses statically reserved space */")
+    maximumTraceLength = max(maxLengthIncomingTracePerState)
+    stringLengthOfAllAPs = sum([len(a)+3 for a in APs])
+    maxSpaceViolationTrackingPrintout = 64+64*maximumTraceLength+stringLengthOfAllAPs*maximumTraceLength
+    outFile.write("char violatingTraceInformation["+str(maxSpaceViolationTrackingPrintout+1)+"];\n")
+    outFile.write("void buildViolatingTraceInformation() {\n")
+    outFile.write("  int selector;\n")
+    outFile.write(historyDecoderCode(historyTypes,rejectingState))
+    outFile.write("  int state="+str(rejectingState)+";\n")
+    outFile.write("  int ptr=snprintf(violatingTraceInformation,"+str(maxSpaceViolationTrackingPrintout)+",\"Violating trace (before entering the rejecting state):\\n\");\n")
+    outFile.write("  while ("+"&&".join(["(state!="+str(a)+")" for a in startingStates])+") {\n")
+    outFile.write("    switch(state) {\n")
+    for state in range(nofStates):
+        if not state in startingStates:
+            outFile.write("      case "+str(state)+":\n")
+            outFile.write("        selector = (int[]){")
+            for j,a in enumerate(reverseTransitionRelation[state]):
+                if j>0:
+                    outFile.write(",")
+                outFile.write(str(a[0]))
+            outFile.write("}["+historyDigitCode(historyTypes,rejectingState,len(reverseTransitionRelation[state]))+"];\n")
+            outFile.write("        ptr += snprintf(violatingTraceInformation+ptr,"+str(maxSpaceViolationTrackingPrintout)+"-ptr,\"- Transition from state %d with prop. values: ")
+            for i,a in enumerate(APs):
+                if i>0:
+                    outFile.write(", ")
+                outFile.write(a+"=%d")
+            outFile.write("\\n\",selector")
+            src = "state"+str(rejectingState)+"apValues.vals"+str(maxLengthIncomingTracePerState[state]-1)
+            for i,a in enumerate(APs):
+                outFile.write(", ")
+                outFile.write("("+src+" & (1 << "+str(i)+"))?1:0")
+            outFile.write(");\n")
+            if historyTypes[rejectingState][1]==0:
+                outFile.write("        history =  history / "+str(len(reverseTransitionRelation[state]))+";\n")
+            outFile.write("        state = selector;\n")
+            outFile.write("        break;\n")
+    outFile.write("    }\n")              
+    outFile.write("  }\n")              
+    outFile.write("}\n")
+
+
+def writeViolationRecordCode(outFile,automaton,historyTypes,maxLengthIncomingTracePerState,dataTypeAPValues,filenameDecoder):
+    """Writes the function buildViolationRecord(), which only copies the history and the proposition values stored
+    for the rejecting state into a byte array, so that neither snprintf nor a text buffer is needed on the device.
+    The record is decoded on the host by a Python script written to filenameDecoder, which prints the same
+    description of the violating trace as buildViolatingTraceInformation()."""
+    rejectingState = automaton.findRejectingState()
+    (historyType,nofHistoryWords) = historyTypes[rejectingState]
+    if nofHistoryWords==0:
+        historyBytes = [("state"+str(rejectingState)+"history",8*i) for i in range(int(historyType[4:-2])//8)]
+    else:
+        historyBytes = [("state"+str(rejectingState)+"history["+str(i)+"]",8*j) for i in range(nofHistoryWords) for j in range(4)]
+    apValueSize = int(dataTypeAPValues[4:-2])//8
+    apValueBytes = [("state"+str(rejectingState)+"apValues.vals"+str(i),8*j) for i in range(maxLengthIncomingTracePerState[rejectingState]) for j in range(apValueSize)]
+    recordBytes = historyBytes+apValueBytes
+
+    outFile.write("/* Violation record for decoding on the host: the history of the rejecting state, followed by its stored\n")
+    outFile.write("   proposition values, all in little-endian byte order. */\n")
+    outFile.write("uint8_t violationRecord["+str(len(recordBytes))+"];\n")
+    outFile.write("const uint32_t violationRecordSize = "+str(len(recordBytes))+";\n")
+    outFile.write("void buildViolationRecord() {\n")
+    for i,(source,shift) in enumerate(recordBytes):
+        if shift==0:
+            outFile.write("  violationRecord["+str(i)+"] = (uint8_t)"+source+";\n")
+        else:
+            outFile.write("  violationRecord["+str(i)+"] = (uint8_t)("+source+" >> "+str(shift)+");\n")
+    outFile.write("}\n")
+
+    with open(filenameDecoder,"w") as decoderFile:
+        decoderFile.write("#!/usr/bin/env python3\n")
+        decoderFile.write("# Decoder for the violation records of a monitor generated by build_violation_reason_tracking_monitor.py.\n")
+        decoderFile.write("# Usage: "+os.path.basename(filenameDecoder)+" <file with the violationRecord bytes>\n")
+        decoderFile.write("import sys\n\n")
+        decoderFile.write("APs = "+repr(list(automaton.APs))+"\n")
+        decoderFile.write("STARTING_STATES = "+repr(sorted(automaton.startingStates))+"\n")
+        decoderFile.write("REJECTING_STATE = "+str(rejectingState)+"\n")
+        decoderFile.write("HISTORY_SIZE = "+str(len(historyBytes))+"\n")
+        decoderFile.write("AP_VALUE_SIZE = "+str(apValueSize)+"\n")
+        decoderFile.write("# For every non-initial state: the source states of the incoming transitions and the index of the stored proposition values\n")
+        decoderFile.write("INCOMING_STATES = {"+", ".join([str(state)+": "+repr([a for (a,b) in automaton.reverseTransitions[state]]) for state in range(automaton.nofStates) if not state in automaton.startingStates])+"}\n")
+        decoderFile.write("AP_VALUE_INDICES = {"+", ".join([str(state)+": "+str(maxLengthIncomingTracePerState[state]-1) for state in range(automaton.nofStates) if not state in automaton.startingStates])+"}\n\n")
+        decoderFile.write(VIOLATION_RECORD_DECODER)
+
+
+VIOLATION_RECORD_DECODER = '''def decodeViolationRecord(record):
+    history = int.from_bytes(record[:HISTORY_SIZE],"little")
+    lines = ["Violating trace (before entering the rejecting state):"]
+    state = REJECTING_STATE
+    while not state in STARTING_STATES:
+        selector = INCOMING_STATES[state][history % len(INCOMING_STATES[state])]
+        position = HISTORY_SIZE+AP_VALUE_SIZE*AP_VALUE_INDICES[state]
+        apValues = int.from_bytes(record[position:position+AP_VALUE_SIZE],"little")
+        lines.append("- Transition from state "+str(selector)+" with prop. values: "+", ".join([a+"="+str((apValues >> i) & 1) for i,a in enumerate(APs)]))
+        history = history // len(INCOMING_STATES[state])
+        state = selector
+    return "".join([a+"\\n" for a in lines])
+
+
+if __name__ == "__main__":
+    with open(sys.argv[1],"rb") as inFile:
+        sys.stdout.write(decodeViolationRecord(inFile.read()))
+'''
+
+
+def writeSharedHistoryViolationRecordCode(outFile,automaton,maxLength,nodeType,noNode,referenceBits,dataTypeAPValues,filenameDecoder):
+    """Version of writeViolationRecordCode() for the monitor with the shared history node pool. buildViolationRecord()
+    copies the number of the incoming transition and the letter of every node along the chain of the rejecting
+    state into the byte array, starting with the node of the rejecting state."""
+    rejectingState = automaton.findRejectingState()
+    assert max([len(a) for a in automaton.reverseTransitions])<=256
+    apValueSize = int(dataTypeAPValues[4:-2])//8
+    recordSize = (1+apValueSize)*maxLength
+
+    outFile.write("/* Violation record for decoding on the host: for every node along the chain of the rejecting state, the number\n")
+    outFile.write("   of the incoming transition, followed by the letter in little-endian byte order. */\n")
+    outFile.write("uint8_t violationRecord["+str(recordSize)+"];\n")
+    outFile.write("const uint32_t violationRecordSize = "+str(recordSize)+";\n")
+    outFile.write("void buildViolationRecord() {\n")
+    outFile.write("  "+nodeType+" node = state"+str(rejectingState)+"node;\n")
+    outFile.write("  uint32_t ptr = 0;\n")
+    outFile.write("  while (node!="+noNode+") {\n")
+    outFile.write("    violationRecord[ptr++] = (uint8_t)(historyInfo[node] >> "+str(referenceBits)+");\n")
+    for j in range(apValueSize):
+        if j==0:
+            outFile.write("    violationRecord[ptr++] = (uint8_t)historyLetters[node];\n")
+        else:
+            outFile.write("    violationRecord[ptr++] = (uint8_t)(historyLetters[node] >> "+str(8*j)+");\n")
+    outFile.write("    node = historyParents[node];\n")
+    outFile.write("  }\n")
+    outFile.write("}\n")
+
+    with open(filenameDecoder,"w") as decoderFile:
+        decoderFile.write("#!/usr/bin/env python3\n")
+        decoderFile.write("# Decoder for the violation records of a monitor generated by build_violation_reason_tracking_monitor.py.\n")
+        decoderFile.write("# Usage: "+os.path.basename(filenameDecoder)+" <file with the violationRecord bytes>\n")
+        decoderFile.write("import sys\n\n")
+        decoderFile.write("APs = "+repr(list(automaton.APs))+"\n")
+        decoderFile.write("STARTING_STATES = "+repr(sorted(automaton.startingStates))+"\n")
+        decoderFile.write("REJECTING_STATE = "+str(rejectingState)+"\n")
+        decoderFile.write("AP_VALUE_SIZE = "+str(apValueSize)+"\n")
+        decoderFile.write("# For every non-initial state: the source states of the incoming transitions\n")
+        decoderFile.write("INCOMING_STATES = {"+", ".join([str(state)+": "+repr([a for (a,b) in automaton.reverseTransitions[state]]) for state in range(automaton.nofStates) if not state in automaton.startingStates])+"}\n\n")
+        decoderFile.write(SHARED_HISTORY_RECORD_DECODER)
+
+
+SHARED_HISTORY_RECORD_DECODER = '''def decodeViolationRecord(record):
+    lines = ["Violating trace (before entering the rejecting state):"]
+    state = REJECTING_STATE
+    position = 0
+    while not state in STARTING_STATES:
+        selector = INCOMING_STATES[state][record[position]]
+        apValues = int.from_bytes(record[position+1:position+1+AP_VALUE_SIZE],"little")
+        lines.append("- Transition from state "+str(selector)+" with prop. values: "+", ".join([a+"="+str((apValues >> i) & 1) for i,a in enumerate(APs)]))
+        position += 1+AP_VALUE_SIZE
+        state = selector
+    return "".join([a+"\\n" for a in lines])
+
+
+if __name__ == "__main__":
+    with open(sys.argv[1],"rb") as inFile:
+        sys.stdout.write(decodeViolationRecord(inFile.read()))
+'''
+
+
+def reasonTrackingBatchEntryPointsCode(automaton,guards,historyTypes,dataTypeAPValues,transitionCode):
+    """Entry points for packed letters for the monitors with reason tracking. monitor_run() works on local copies
+    state<i> of the state flags and localState<i>history of the histories, and stores the packed letter as trace
+    element directly instead of constructing it from the propositions. transitionCode(stateVariable,historyPrefix,
+    traceElement,indentation) gives the code of the state update."""
+    nofStates = automaton.nofStates
+    loadCode = "".join(["  uint8_t state"+str(i)+" = inState"+str(i)+";\n"+historyLoadCode(i,historyTypes) for i in range(nofStates)])
+    traceElement = "("+dataTypeAPValues+")(letter & "+str((1 << len(automaton.APs))-1)+")"
+    stepCode = guards.declarationCode("    ")+transitionCode("state","localState",traceElement,"    ")
+    stepCode += "    if (state"+str(automaton.findRejectingState())+") break;\n"
+    storeCode = "".join(["  inState"+str(i)+" = state"+str(i)+";\n"+historyStoreCode(i,historyTypes) for i in range(nofStates)])
+    return batchEntryPointsCode(automaton.APs,loadCode,stepCode,storeCode)
+
+
+def monitorCompilerUniversalWithReasonTracking(automaton,filenameOut,optimizeGuards=False,hostDecoding=False):
     with open(filenameOut,"w") as outFile:
         outFile.write("/* Temporal Logic Runtime Monitor Code */\n")
         outFile.write("#include <stdint.h>\n")
-        outFile.write("#include <stdio.h>\n")
-        with open(filenameIn,"r") as inFile:
-            allInLines = [a.strip() for a in inFile.readlines()]
-        
-        # Gather header information
-        apMapper = {}
-        statesToTransitionsMapper = {}
-        currentTransitionList = None
-
-        for line in allInLines:
-            if line.startswith("States: "):
-                nofStates = int(line.split(" ")[1].strip())
-            elif line.startswith("AP: "):
-                parts = line.split(" ")
-                for i,a in enumerate(parts[2:]):
-                    for j,b in enumerate(APs):
-                        if a=="\""+b+"\"":
-                            apMapper[i] = j
-                    if not i in apMapper:
-                        raise Exception("Error: AP list in the script seems to be incorrect.")
-            elif line.startswith("Start:"):
-                startingStates = set([int(a) for a in line[7:].split(" ")])
-            elif line.startswith("State:"):
-                stateNum = int(line.split(" ")[1])
-                assert not stateNum in statesToTransitionsMapper
-                currentTransitionList = []
-                statesToTransitionsMapper[stateNum] = currentTransitionList
-            elif line.startswith("["):
-                condition = line[0:line.find("]")+1]
-                destinationState = int(line[line.find("]")+1:].strip().split(" ")[0])
-                currentTransitionList.append((destinationState,condition))
+        if not hostDecoding:
+            outFile.write("#include <stdio.h>\n")
+        nofStates = automaton.nofStates
+        startingStates = automaton.startingStates
+        statesToTransitionsMapper = automaton.transitions
+        guards = GuardOptimizer(automaton,[guard for transitionList in statesToTransitionsMapper for (target,guard) in transitionList],optimizeGuards)
 
         # Tracking states works by multiplying the incoming state information by #incoming
         # edges, and then adding the incoming edge number
-        # Also store max #transitions leading here
-        # Note th
-        maxLengthIncomingTracePerState = {a:0 for a in startingStates}
-        todo = [a for a in startingStates]
-        while len(todo)>0:
-            thisOne = todo[0]
-            todo = todo[1:]
-            thisValue = maxLengthIncomingTracePerState[thisOne]
-            for (a,b) in statesToTransitionsMapper[thisOne]:
-                if not a in maxLengthIncomingTracePerState:
-                    maxLengthIncomingTracePerState[a] = thisValue+1
-                    todo.append(a)
-                else:
-                    if not a==thisOne:
-                        if maxLengthIncomingTracePerState[thisOne]<thisValue+1:
-                            maxLengthIncomingTracePerState[a] = thisValue+1
-                            if not a in todo:
-                                todo.append(a)
-                            if thisValue>100:
-                                raise Exception("Error: The input automaton is not very weak")
+        # Also compute the maximal number of transitions leading to every state
+        maxLengthIncomingTracePerState = computeLongestIncomingPathLengths(automaton)
         
 
         # Find rejecting state
-        rejectingState = None
-        for state in range(nofStates):
-            if len(statesToTransitionsMapper[state])==1:
-                if statesToTransitionsMapper[state][0][0]==state and statesToTransitionsMapper[state][0][1]=="[t]":
-                    assert rejectingState is None
-                    rejectingState = state
-        assert not rejectingState is None
+        rejectingState = automaton.findRejectingState()
+        historyTypes = computeHistoryTypes(automaton)
 
         # Data type for AP values:
         if len(APs)<=8:
@@ -186,7 +554,7 @@ def monitorCompilerUniversalWithReasonTracking(filenameIn,filenameOut):
                 outFile.write("uint8_t inState"+str(i)+" = 1;\n")
             else:
                 outFile.write("uint8_t inState"+str(i)+" = 0;\n")
-            outFile.write("volatile uint32_t state"+str(i)+"history = 0;\n")
+            outFile.write(historyDeclarationCode(i,historyTypes))
             # Backup.
             outFile.write("typedef struct {\n")
             for j in range(maxLengthIncomingTracePerState[i]):
@@ -203,12 +571,9 @@ def monitorCompilerUniversalWithReasonTracking(filenameIn,filenameOut):
             outFile.write("("+a+">0?"+str(1 << i)+":0)")
         outFile.write(")\n")
 
-        # Build a revserse transition relation, so that we can 
-        # access for each state which incoming states there are
-        reverseTransitionRelation = [[] for a in statesToTransitionsMapper]
-        for (a,b) in statesToTransitionsMapper.items():
-            for c in b:
-                reverseTransitionRelation[c[0]].append((a,c[1]))
+        # The reverse transition relation gives us access to the incoming
+        # transitions of each state
+        reverseTransitionRelation = automaton.reverseTransitions
 
         # Check assumption that there is no incoming edge in an initial state that
         # is not a self-loop -- the debug trace printer below doesn't work otherwise.
@@ -219,7 +584,7 @@ def monitorCompilerUniversalWithReasonTracking(filenameIn,filenameOut):
         # Build a topological sort of the depth in the weak automaton, so that
         # we can go leaf-to-root in the construction
         reverseTopologyPre = {}
-        for (a,b) in maxLengthIncomingTracePerState.items():
+        for (a,b) in enumerate(maxLengthIncomingTracePerState):
             if not b in reverseTopologyPre:
                 reverseTopologyPre[b] = [a]
             else:
@@ -232,194 +597,73 @@ def monitorCompilerUniversalWithReasonTracking(filenameIn,filenameOut):
         
         # Build transition function
         # Use topological sorting, so that "nextState" variables are not needed.
+        # The state flags are stored in <stateVariable><i> and the histories in <historyPrefix><i>history,
+        # so that the code can work on the global variables as well as on local copies of them.
+        def transitionCode(stateVariable,historyPrefix,traceElement,indentation):
+            code = []
+            for state in topologicalStateSort:
+                # First: process self-loops
+                foundSelfLoop = False
+                for (target,guard) in statesToTransitionsMapper[state]:
+                    if (target==state):
+                        if foundSelfLoop:
+                            raise Exception("Error: Multiple self-loops are not supported.")
+                        foundSelfLoop = True
+                        code.append(indentation+stateVariable+str(state)+" = "+stateVariable+str(state)+" && ("+guards.guardToC(guard)+");\n")
+                if not foundSelfLoop:
+                    code.append(indentation+stateVariable+str(state)+" = 0;\n")
+
+                # Then, all other incoming transitions
+                for transitionNum,(sourcestate,guard) in enumerate(reverseTransitionRelation[state]):
+                    if (sourcestate!=state):
+                        code.append(indentation+"if ("+stateVariable+str(sourcestate)+" && ("+guards.guardToC(guard)+")) {\n"+indentation+"  "+stateVariable+str(state)+" = 1;\n")
+                        # Copy violation tracking information from previous state...
+                        code.append(indentation+"  *((state"+str(sourcestate)+"apValuesType*)&state"+str(state)+"apValues) = state"+str(sourcestate)+"apValues;\n")
+                        code.append(indentation+"   state"+str(state)+"apValues.vals"+str(maxLengthIncomingTracePerState[state]-1)+" = "+traceElement+";\n" )
+                        code.append(indentation+"   /* Transition from state "+str(sourcestate)+": "+guard.label+"*/\n")
+                        code.append(historyUpdateCode(state,sourcestate,len(reverseTransitionRelation[state]),transitionNum,historyTypes,indentation+"   ",historyPrefix))
+                        code.append(indentation+"}\n")
+            return "".join(code)
+
         outFile.write("\n/* Monitor step/update function */\n")
         outFile.write("int monitor("+",".join(["uint8_t "+a for a in APs])+") {\n")
-        for state in topologicalStateSort:
-            # First: process self-loops
-            foundSelfLoop = False
-            for (target,condition) in statesToTransitionsMapper[state]:
-                if (target==state):
-                    if foundSelfLoop:
-                        raise Exception("Error: Multiple self-loops are not supported.")
-                    foundSelfLoop = True
-                    outFile.write("  inState"+str(state)+" = inState"+str(state)+" && (")
-                    assert condition[0]=="["
-                    assert condition[-1]=="]"
-                    condition = condition[1:-1]
-                    disjuncts = condition.split("|")
-                    for num,disjunct in enumerate(disjuncts):
-                        if num>0:
-                            outFile.write("||")
-                        if len(disjuncts)!=1:
-                            outFile.write("(")
-                        for num2,conjunct in enumerate(disjunct.split("&")):
-                            if num2>0:
-                                outFile.write("&&")
-                            conjunct = conjunct.strip()
-                            if conjunct=="t":
-                                outFile.write("1")
-                            else:
-                                if conjunct[0]=="!":
-                                    outFile.write("!")
-                                    conjunct = conjunct[1:]
-                                apNum = int(conjunct)
-                                outFile.write(APs[apMapper[apNum]])
-                        if len(disjuncts)!=1:
-                            outFile.write(")")
-                    outFile.write(");\n")
-            if not foundSelfLoop:
-                outFile.write("  inState"+str(state)+" = 0;\n")
-
-            # Then, all other incoming transitions
-            for transitionNum,(sourcestate,condition) in enumerate(reverseTransitionRelation[state]):
-                if (sourcestate!=state):
-                    assert condition[0]=="["
-                    assert condition[-1]=="]"
-                    condition = condition[1:-1]
-                    disjuncts = condition.split("|")
-                    outFile.write("  if (inState"+str(sourcestate)+" && (")
-                    for num,disjunct in enumerate(disjuncts):
-                        if num>0:
-                            outFile.write("||")
-                        if len(disjuncts)!=1:
-                            outFile.write("(")
-                        for num2,conjunct in enumerate(disjunct.split("&")):
-                            if num2>0:
-                                outFile.write("&&")
-                            conjunct = conjunct.strip()
-                            if conjunct=="t":
-                                outFile.write("1")
-                            else:
-                                if conjunct[0]=="!":
-                                    outFile.write("!")
-                                    conjunct = conjunct[1:]
-                                apNum = int(conjunct)
-                                outFile.write(APs[apMapper[apNum]])
-                        if len(disjuncts)!=1:
-                            outFile.write(")")
-                    outFile.write(")) {\n    inState"+str(state)+" = 1;\n")
-                    # Copy violation tracking information from previous state...
-                    outFile.write("    *((state"+str(sourcestate)+"apValuesType*)&state"+str(state)+"apValues) = state"+str(sourcestate)+"apValues;\n")
-                    outFile.write("     state"+str(state)+"apValues.vals"+str(maxLengthIncomingTracePerState[state]-1)+" = CONSTRUCTTRACEELEMENT;\n" )
-                    outFile.write("     /* Transition from state "+str(sourcestate)+": "+str(condition)+"*/\n")
-                    outFile.write("     state"+str(state)+"history = state"+str(sourcestate)+"history * "+str(len(reverseTransitionRelation[state])) + " + "+str(transitionNum)+";\n")
-                    outFile.write("  }\n")
-
+        outFile.write(guards.declarationCode("  "))
+        outFile.write(transitionCode("inState","state","CONSTRUCTTRACEELEMENT","  "))
         outFile.write("  return inState"+str(rejectingState)+";\n")
         outFile.write("}\n")
         outFile.write("#undef CONSTRUCTTRACEELEMENT\n\n")
 
-        # Write trace decompiler.
-        outFile.write("/* Function for obtaining trace information from stored values. Uses statically reserved space */")
-        maximumTraceLength = max([b for (a,b) in maxLengthIncomingTracePerState.items()])
-        stringLengthOfAllAPs = sum([len(a)+3 for a in APs])
-        maxSpaceViolationTrackingPrintout = 64+64*maximumTraceLength+stringLengthOfAllAPs*maximumTraceLength
-        outFile.write("char violatingTraceInformation["+str(maxSpaceViolationTrackingPrintout+1)+"];\n")
-        outFile.write("void buildViolatingTraceInformation() {\n")
-        outFile.write("  int selector;\n")
-        outFile.write("  uint32_t history = state"+str(rejectingState)+"history;\n")
-        outFile.write("  int state="+str(rejectingState)+";\n")
-        outFile.write("  int ptr=snprintf(violatingTraceInformation,"+str(maxSpaceViolationTrackingPrintout)+",\"Violating trace (before entering the rejecting state):\\n\");\n")
-        outFile.write("  while ("+"&&".join(["(state!="+str(a)+")" for a in startingStates])+") {\n")
-        outFile.write("    switch(state) {\n")
-        for state in range(nofStates):
-            if not state in startingStates:
-                outFile.write("      case "+str(state)+":\n")
-                outFile.write("        selector = (int[]){")
-                for j,a in enumerate(reverseTransitionRelation[state]):
-                    if j>0:
-                        outFile.write(",")
-                    outFile.write(str(a[0]))
-                outFile.write("}[history % "+str(len(reverseTransitionRelation[state]))+"];\n")
-                outFile.write("        ptr += snprintf(violatingTraceInformation+ptr,"+str(maxSpaceViolationTrackingPrintout)+"-ptr,\"- Transition from state %d with prop. values: ")
-                for i,a in enumerate(APs):
-                    if i>0:
-                        outFile.write(", ")
-                    outFile.write(a+"=%d")
-                outFile.write("\\n\",selector")
-                src = "state"+str(rejectingState)+"apValues.vals"+str(maxLengthIncomingTracePerState[state]-1)
-                for i,a in enumerate(APs):
-                    outFile.write(", ")
-                    outFile.write("("+src+" & (1 << "+str(i)+"))?1:0")
-                outFile.write(");\n")
-                outFile.write("        history =  history / "+str(len(reverseTransitionRelation[state]))+";\n")
-                outFile.write("        state = selector;\n")
-                outFile.write("        break;\n")
-        outFile.write("    }\n")              
-        outFile.write("  }\n")              
-        outFile.write("}\n")
+        # Write trace decompiler, or the violation record for decoding it on the host.
+        if hostDecoding:
+            writeViolationRecordCode(outFile,automaton,historyTypes,maxLengthIncomingTracePerState,dataTypeAPValues,filenameOut[:-2]+"_decoder.py")
+        else:
+            writeViolatingTraceInformationCode(outFile,automaton,historyTypes,maxLengthIncomingTracePerState)
+        outFile.write(reasonTrackingBatchEntryPointsCode(automaton,guards,historyTypes,dataTypeAPValues,transitionCode))
+    guards.report(filenameOut)
 
 
-def monitorCompilerUniversalWithReasonTrackingWithoutUVWOptimizations(filenameIn,filenameOut):
+def monitorCompilerUniversalWithReasonTrackingWithoutUVWOptimizations(automaton,filenameOut,optimizeGuards=False,hostDecoding=False):
     """This version of the translation does not use the fact that the UVW is very weak, which causes additional
     state copying operations."""
     with open(filenameOut,"w") as outFile:
         outFile.write("/* Temporal Logic Runtime Monitor Code */\n")
         outFile.write("#include <stdint.h>\n")
-        outFile.write("#include <stdio.h>\n")
-        with open(filenameIn,"r") as inFile:
-            allInLines = [a.strip() for a in inFile.readlines()]
-        
-        # Gather header information
-        apMapper = {}
-        statesToTransitionsMapper = {}
-        currentTransitionList = None
-
-        for line in allInLines:
-            if line.startswith("States: "):
-                nofStates = int(line.split(" ")[1].strip())
-            elif line.startswith("AP: "):
-                parts = line.split(" ")
-                for i,a in enumerate(parts[2:]):
-                    for j,b in enumerate(APs):
-                        if a=="\""+b+"\"":
-                            apMapper[i] = j
-                    if not i in apMapper:
-                        raise Exception("Error: AP list in the script seems to be incorrect.")
-            elif line.startswith("Start:"):
-                startingStates = set([int(a) for a in line[7:].split(" ")])
-            elif line.startswith("State:"):
-                stateNum = int(line.split(" ")[1])
-                assert not stateNum in statesToTransitionsMapper
-                currentTransitionList = []
-                statesToTransitionsMapper[stateNum] = currentTransitionList
-            elif line.startswith("["):
-                condition = line[0:line.find("]")+1]
-                destinationState = int(line[line.find("]")+1:].strip().split(" ")[0])
-                currentTransitionList.append((destinationState,condition))
+        if not hostDecoding:
+            outFile.write("#include <stdio.h>\n")
+        nofStates = automaton.nofStates
+        startingStates = automaton.startingStates
+        statesToTransitionsMapper = automaton.transitions
+        guards = GuardOptimizer(automaton,[guard for transitionList in statesToTransitionsMapper for (target,guard) in transitionList],optimizeGuards)
 
         # Tracking states works by multiplying the incoming state information by #incoming
         # edges, and then adding the incoming edge number
-        # Also store max #transitions leading here
-        # Note th
-        maxLengthIncomingTracePerState = {a:0 for a in startingStates}
-        todo = [a for a in startingStates]
-        while len(todo)>0:
-            thisOne = todo[0]
-            todo = todo[1:]
-            thisValue = maxLengthIncomingTracePerState[thisOne]
-            for (a,b) in statesToTransitionsMapper[thisOne]:
-                if not a in maxLengthIncomingTracePerState:
-                    maxLengthIncomingTracePerState[a] = thisValue+1
-                    todo.append(a)
-                else:
-                    if not a==thisOne:
-                        if maxLengthIncomingTracePerState[thisOne]<thisValue+1:
-                            maxLengthIncomingTracePerState[a] = thisValue+1
-                            if not a in todo:
-                                todo.append(a)
-                            if thisValue>100:
-                                raise Exception("Error: The input automaton is not very weak")
+        # Also compute the maximal number of transitions leading to every state
+        maxLengthIncomingTracePerState = computeLongestIncomingPathLengths(automaton)
         
 
         # Find rejecting state
-        rejectingState = None
-        for state in range(nofStates):
-            if len(statesToTransitionsMapper[state])==1:
-                if statesToTransitionsMapper[state][0][0]==state and statesToTransitionsMapper[state][0][1]=="[t]":
-                    assert rejectingState is None
-                    rejectingState = state
-        assert not rejectingState is None
+        rejectingState = automaton.findRejectingState()
+        historyTypes = computeHistoryTypes(automaton)
 
         # Data type for AP values:
         if len(APs)<=8:
@@ -435,7 +679,7 @@ def monitorCompilerUniversalWithReasonTrackingWithoutUVWOptimizations(filenameIn
                 outFile.write("uint8_t inState"+str(i)+" = 1;\n")
             else:
                 outFile.write("uint8_t inState"+str(i)+" = 0;\n")
-            outFile.write("volatile uint32_t state"+str(i)+"history = 0;\n")
+            outFile.write(historyDeclarationCode(i,historyTypes))
             # Backup.
             outFile.write("typedef struct {\n")
             for j in range(maxLengthIncomingTracePerState[i]):
@@ -452,12 +696,9 @@ def monitorCompilerUniversalWithReasonTrackingWithoutUVWOptimizations(filenameIn
             outFile.write("("+a+">0?"+str(1 << i)+":0)")
         outFile.write(")\n")
 
-        # Build a revserse transition relation, so that we can 
-        # access for each state which incoming states there are
-        reverseTransitionRelation = [[] for a in statesToTransitionsMapper]
-        for (a,b) in statesToTransitionsMapper.items():
-            for c in b:
-                reverseTransitionRelation[c[0]].append((a,c[1]))
+        # The reverse transition relation gives us access to the incoming
+        # transitions of each state
+        reverseTransitionRelation = automaton.reverseTransitions
 
         # Check assumption that there is no incoming edge in an initial state that
         # is not a self-loop -- the debug trace printer below doesn't work otherwise.
@@ -468,7 +709,7 @@ def monitorCompilerUniversalWithReasonTrackingWithoutUVWOptimizations(filenameIn
         # Build a topological sort of the depth in the weak automaton, so that
         # we can go leaf-to-root in the construction
         reverseTopologyPre = {}
-        for (a,b) in maxLengthIncomingTracePerState.items():
+        for (a,b) in enumerate(maxLengthIncomingTracePerState):
             if not b in reverseTopologyPre:
                 reverseTopologyPre[b] = [a]
             else:
@@ -481,130 +722,217 @@ def monitorCompilerUniversalWithReasonTrackingWithoutUVWOptimizations(filenameIn
         
         # Build transition function
         # Use topological sorting, so that "nextState" variables are not needed.
+        # The state flags are stored in <stateVariable><i> and the histories in <historyPrefix><i>history,
+        # so that the code can work on the global variables as well as on local copies of them.
+        def transitionCode(stateVariable,historyPrefix,traceElement,indentation):
+            code = []
+            for state in topologicalStateSort:
+                code.append(indentation+"uint8_t nextState"+str(state)+" = 0;\n")
+
+            for state in topologicalStateSort:
+                # First: process self-loops
+                foundSelfLoop = False
+                for (target,guard) in statesToTransitionsMapper[state]:
+                    if (target==state):
+                        if foundSelfLoop:
+                            raise Exception("Error: Multiple self-loops are not supported.")
+                        foundSelfLoop = True
+                        code.append(indentation+"nextState"+str(state)+" = "+stateVariable+str(state)+" && ("+guards.guardToC(guard)+");\n")
+                # if not foundSelfLoop:
+                #     code.append(indentation+stateVariable+str(state)+" = 0;\n")
+
+                # Then, all other incoming transitions
+                for transitionNum,(sourcestate,guard) in enumerate(reverseTransitionRelation[state]):
+                    if (sourcestate!=state):
+                        code.append(indentation+"if ("+stateVariable+str(sourcestate)+" && ("+guards.guardToC(guard)+")) {\n"+indentation+"  nextState"+str(state)+" = 1;\n")
+                        # Copy violation tracking information from previous state...
+                        code.append(indentation+"  *((state"+str(sourcestate)+"apValuesType*)&state"+str(state)+"apValues) = state"+str(sourcestate)+"apValues;\n")
+                        code.append(indentation+"   state"+str(state)+"apValues.vals"+str(maxLengthIncomingTracePerState[state]-1)+" = "+traceElement+";\n" )
+                        code.append(indentation+"   /* Transition from state "+str(sourcestate)+": "+guard.label+"*/\n")
+                        code.append(historyUpdateCode(state,sourcestate,len(reverseTransitionRelation[state]),transitionNum,historyTypes,indentation+"   ",historyPrefix))
+                        code.append(indentation+"}\n")
+
+            # Copy values back
+            for i in topologicalStateSort:
+                code.append(indentation+stateVariable+str(i)+" = nextState"+str(i)+";\n")
+            return "".join(code)
+
         outFile.write("\n/* Monitor step/update function */\n")
         outFile.write("int monitor("+",".join(["uint8_t "+a for a in APs])+") {\n")
-        for state in topologicalStateSort:
-            outFile.write("  uint8_t nextState"+str(state)+" = 0;\n")
-
-        for state in topologicalStateSort:
-            # First: process self-loops
-            foundSelfLoop = False
-            for (target,condition) in statesToTransitionsMapper[state]:
-                if (target==state):
-                    if foundSelfLoop:
-                        raise Exception("Error: Multiple self-loops are not supported.")
-                    foundSelfLoop = True
-                    outFile.write("  nextState"+str(state)+" = inState"+str(state)+" && (")
-                    assert condition[0]=="["
-                    assert condition[-1]=="]"
-                    condition = condition[1:-1]
-                    disjuncts = condition.split("|")
-                    for num,disjunct in enumerate(disjuncts):
-                        if num>0:
-                            outFile.write("||")
-                        if len(disjuncts)!=1:
-                            outFile.write("(")
-                        for num2,conjunct in enumerate(disjunct.split("&")):
-                            if num2>0:
-                                outFile.write("&&")
-                            conjunct = conjunct.strip()
-                            if conjunct=="t":
-                                outFile.write("1")
-                            else:
-                                if conjunct[0]=="!":
-                                    outFile.write("!")
-                                    conjunct = conjunct[1:]
-                                apNum = int(conjunct)
-                                outFile.write(APs[apMapper[apNum]])
-                        if len(disjuncts)!=1:
-                            outFile.write(")")
-                    outFile.write(");\n")
-            # if not foundSelfLoop:
-            #     outFile.write("  inState"+str(state)+" = 0;\n")
-
-            # Then, all other incoming transitions
-            for transitionNum,(sourcestate,condition) in enumerate(reverseTransitionRelation[state]):
-                if (sourcestate!=state):
-                    assert condition[0]=="["
-                    assert condition[-1]=="]"
-                    condition = condition[1:-1]
-                    disjuncts = condition.split("|")
-                    outFile.write("  if (inState"+str(sourcestate)+" && (")
-                    for num,disjunct in enumerate(disjuncts):
-                        if num>0:
-                            outFile.write("||")
-                        if len(disjuncts)!=1:
-                            outFile.write("(")
-                        for num2,conjunct in enumerate(disjunct.split("&")):
-                            if num2>0:
-                                outFile.write("&&")
-                            conjunct = conjunct.strip()
-                            if conjunct=="t":
-                                outFile.write("1")
-                            else:
-                                if conjunct[0]=="!":
-                                    outFile.write("!")
-                                    conjunct = conjunct[1:]
-                                apNum = int(conjunct)
-                                outFile.write(APs[apMapper[apNum]])
-                        if len(disjuncts)!=1:
-                            outFile.write(")")
-                    outFile.write(")) {\n    nextState"+str(state)+" = 1;\n")
-                    # Copy violation tracking information from previous state...
-                    outFile.write("    *((state"+str(sourcestate)+"apValuesType*)&state"+str(state)+"apValues) = state"+str(sourcestate)+"apValues;\n")
-                    outFile.write("     state"+str(state)+"apValues.vals"+str(maxLengthIncomingTracePerState[state]-1)+" = CONSTRUCTTRACEELEMENT;\n" )
-                    outFile.write("     /* Transition from state "+str(sourcestate)+": "+str(condition)+"*/\n")
-                    outFile.write("     state"+str(state)+"history = state"+str(sourcestate)+"history * "+str(len(reverseTransitionRelation[state])) + " + "+str(transitionNum)+";\n")
-                    outFile.write("  }\n")
-
-        # Copy values back
-        for i in topologicalStateSort:
-            outFile.write("  inState"+str(i)+" = nextState"+str(i)+";\n")
-
+        outFile.write(guards.declarationCode("  "))
+        outFile.write(transitionCode("inState","state","CONSTRUCTTRACEELEMENT","  "))
         outFile.write("  return inState"+str(rejectingState)+";\n")
         outFile.write("}\n")
         outFile.write("#undef CONSTRUCTTRACEELEMENT\n\n")
 
-        # Write trace decompiler.
-        outFile.write("/* Function for obtaining trace information from stored values. Uses statically reserved space */")
-        maximumTraceLength = max([b for (a,b) in maxLengthIncomingTracePerState.items()])
-        stringLengthOfAllAPs = sum([len(a)+3 for a in APs])
-        maxSpaceViolationTrackingPrintout = 64+64*maximumTraceLength+stringLengthOfAllAPs*maximumTraceLength
-        outFile.write("char violatingTraceInformation["+str(maxSpaceViolationTrackingPrintout+1)+"];\n")
-        outFile.write("void buildViolatingTraceInformation() {\n")
-        outFile.write("  int selector;\n")
-        outFile.write("  uint32_t history = state"+str(rejectingState)+"history;\n")
-        outFile.write("  int state="+str(rejectingState)+";\n")
-        outFile.write("  int ptr=snprintf(violatingTraceInformation,"+str(maxSpaceViolationTrackingPrintout)+",\"Violating trace (before entering the rejecting state):\\n\");\n")
-        outFile.write("  while ("+"&&".join(["(state!="+str(a)+")" for a in startingStates])+") {\n")
-        outFile.write("    switch(state) {\n")
-        for state in range(nofStates):
-            if not state in startingStates:
-                outFile.write("      case "+str(state)+":\n")
-                outFile.write("        selector = (int[]){")
-                for j,a in enumerate(reverseTransitionRelation[state]):
-                    if j>0:
-                        outFile.write(",")
-                    outFile.write(str(a[0]))
-                outFile.write("}[history % "+str(len(reverseTransitionRelation[state]))+"];\n")
-                outFile.write("        ptr += snprintf(violatingTraceInformation+ptr,"+str(maxSpaceViolationTrackingPrintout)+"-ptr,\"- Transition from state %d with prop. values: ")
-                for i,a in enumerate(APs):
-                    if i>0:
-                        outFile.write(", ")
-                    outFile.write(a+"=%d")
-                outFile.write("\\n\",selector")
-                src = "state"+str(rejectingState)+"apValues.vals"+str(maxLengthIncomingTracePerState[state]-1)
-                for i,a in enumerate(APs):
-                    outFile.write(", ")
-                    outFile.write("("+src+" & (1 << "+str(i)+"))?1:0")
-                outFile.write(");\n")
-                outFile.write("        history =  history / "+str(len(reverseTransitionRelation[state]))+";\n")
-                outFile.write("        state = selector;\n")
-                outFile.write("        break;\n")
-        outFile.write("    }\n")              
-        outFile.write("  }\n")              
+        # Write trace decompiler, or the violation record for decoding it on the host.
+        if hostDecoding:
+            writeViolationRecordCode(outFile,automaton,historyTypes,maxLengthIncomingTracePerState,dataTypeAPValues,filenameOut[:-2]+"_decoder.py")
+        else:
+            writeViolatingTraceInformationCode(outFile,automaton,historyTypes,maxLengthIncomingTracePerState)
+        outFile.write(reasonTrackingBatchEntryPointsCode(automaton,guards,historyTypes,dataTypeAPValues,transitionCode))
+    guards.report(filenameOut)
+
+
+def monitorCompilerUniversalWithSharedHistoryReasonTracking(automaton,filenameOut,stateSets,optimizeGuards=False,hostDecoding=False):
+    """This version of the translation stores the prefix traces leading to the states in a shared pool of history
+    nodes instead of one copy per state. Every node stores the letter and the number of the incoming transition
+    with which a state was entered, and a reference to the node of the predecessor state. Taking a transition
+    thus only allocates one node, and nodes that are no longer referenced are put back into a free list. A
+    non-initial state is active if and only if it refers to a history node. The pool is sized for the
+    reachable combinations of active states in stateSets by computeHistoryPoolLayout. This saves flash memory
+    and copying, but not RAM: in the worst case, the chains share no nodes, and a node is larger than the
+    entry for the letter in the per-state buffers."""
+    with open(filenameOut,"w") as outFile:
+        outFile.write("/* Temporal Logic Runtime Monitor Code */\n")
+        outFile.write("#include <stdint.h>\n")
+        if not hostDecoding:
+            outFile.write("#include <stdio.h>\n")
+        nofStates = automaton.nofStates
+        startingStates = automaton.startingStates
+        statesToTransitionsMapper = automaton.transitions
+        reverseTransitionRelation = automaton.reverseTransitions
+        guards = GuardOptimizer(automaton,[guard for transitionList in statesToTransitionsMapper for (target,guard) in transitionList],optimizeGuards)
+        rejectingState = automaton.findRejectingState()
+        assert not rejectingState in startingStates
+        for a in startingStates:
+            for (b,c) in reverseTransitionRelation[a]:
+                assert b==a
+
+        # Every active non-initial state refers to a chain of at most (length of the longest path to it) nodes
+        lengths = computeLongestIncomingPathLengths(automaton)
+        (poolSize,nodeType,infoType,referenceBits) = computeHistoryPoolLayout(automaton,stateSets)
+        noNode = str(poolSize)
+        referenceMask = str((1 << referenceBits)-1)
+        dataTypeAPValues = smallestUnsignedCType((1 << len(APs))-1)
+
+        def activeCode(state,flagPrefix="inState",nodePrefix="state"):
+            if state in startingStates:
+                return flagPrefix+str(state)
+            return "("+nodePrefix+str(state)+"node!="+noNode+")"
+
+        # Build state information
+        outFile.write("/* State storage information */\n")
+        for i in range(0,nofStates):
+            if i in startingStates:
+                outFile.write("uint8_t inState"+str(i)+" = 1;\n")
+            else:
+                outFile.write(nodeType+" state"+str(i)+"node = "+noNode+";\n")
+        outFile.write("/* History node pool. Free nodes are linked via historyParents, and "+noNode+" represents no node. */\n")
+        outFile.write(dataTypeAPValues+" historyLetters["+str(poolSize)+"];\n")
+        outFile.write("/* Number of the incoming transition (shifted by "+str(referenceBits)+" bits) and reference count of every node */\n")
+        outFile.write(infoType+" historyInfo["+str(poolSize)+"];\n")
+        outFile.write(nodeType+" historyParents["+str(poolSize)+"] = {\n")
+        outFile.write(cArrayInitializer(list(range(1,poolSize+1))))
+        outFile.write("};\n")
+        outFile.write(nodeType+" historyFree = 0;\n\n")
+        outFile.write("static void releaseHistoryNode("+nodeType+" node) {\n")
+        outFile.write("  while ((node!="+noNode+") && ((--historyInfo[node] & "+referenceMask+")==0)) {\n")
+        outFile.write("    "+nodeType+" parent = historyParents[node];\n")
+        outFile.write("    historyParents[node] = historyFree;\n")
+        outFile.write("    historyFree = node;\n")
+        outFile.write("    node = parent;\n")
+        outFile.write("  }\n")
+        outFile.write("}\n\n")
+        outFile.write("static "+nodeType+" newHistoryNode("+dataTypeAPValues+" letter, "+nodeType+" parent, "+infoType+" edge) {\n")
+        outFile.write("  "+nodeType+" node = historyFree;\n")
+        outFile.write("  historyFree = historyParents[node];\n")
+        outFile.write("  historyLetters[node] = letter;\n")
+        outFile.write("  historyInfo[node] = ("+infoType+")((edge << "+str(referenceBits)+") | 1);\n")
+        outFile.write("  historyParents[node] = parent;\n")
+        outFile.write("  if (parent!="+noNode+") historyInfo[parent]++;\n")
+        outFile.write("  return node;\n")
         outFile.write("}\n")
 
+        # Build transition function
+        # States are processed from the deepest to the starting states, so that "nextState" variables are not needed.
+        # The flags of the initial states are stored in <flagPrefix><i> and the node references in <nodePrefix><i>node,
+        # so that the code can work on the global variables as well as on local copies of them.
+        def transitionCode(flagPrefix,nodePrefix,letter,indentation):
+            code = []
+            for state in sorted(range(nofStates),key=lambda a: -lengths[a]):
+                # First: process self-loops
+                selfLoops = [guard for (target,guard) in statesToTransitionsMapper[state] if target==state]
+                if len(selfLoops)>1:
+                    raise Exception("Error: Multiple self-loops are not supported.")
+                node = nodePrefix+str(state)+"node"
+                if state in startingStates:
+                    if len(selfLoops)==0:
+                        code.append(indentation+flagPrefix+str(state)+" = 0;\n")
+                    else:
+                        code.append(indentation+flagPrefix+str(state)+" = "+flagPrefix+str(state)+" && ("+guards.guardToC(selfLoops[0])+");\n")
+                elif len(selfLoops)==0:
+                    code.append(indentation+"releaseHistoryNode("+node+");\n")
+                    code.append(indentation+node+" = "+noNode+";\n")
+                elif not selfLoops[0].isTrue():
+                    code.append(indentation+"if (!("+guards.guardToC(selfLoops[0])+")) {\n")
+                    code.append(indentation+"  releaseHistoryNode("+node+");\n")
+                    code.append(indentation+"  "+node+" = "+noNode+";\n")
+                    code.append(indentation+"}\n")
+
+                # Then, all other incoming transitions. If multiple ones can be taken, the last one is recorded.
+                prefix = indentation+"if"
+                for transitionNum,(sourcestate,guard) in reversed(list(enumerate(reverseTransitionRelation[state]))):
+                    if (sourcestate!=state):
+                        sourceNode = noNode if sourcestate in startingStates else nodePrefix+str(sourcestate)+"node"
+                        code.append(prefix+" ("+activeCode(sourcestate,flagPrefix,nodePrefix)+" && ("+guards.guardToC(guard)+")) {\n")
+                        code.append(indentation+"  /* Transition from state "+str(sourcestate)+": "+guard.label+"*/\n")
+                        code.append(indentation+"  releaseHistoryNode("+node+");\n")
+                        code.append(indentation+"  "+node+" = newHistoryNode("+letter+","+sourceNode+","+str(transitionNum)+");\n")
+                        prefix = indentation+"} else if"
+                if prefix!=indentation+"if":
+                    code.append(indentation+"}\n")
+            return "".join(code)
+
+        outFile.write("\n/* Monitor step/update function */\n")
+        outFile.write("int monitor("+",".join(["uint8_t "+a for a in APs])+") {\n")
+        outFile.write(guards.declarationCode("  "))
+        outFile.write("  "+dataTypeAPValues+" letter = "+letterConstructionCode(APs)+";\n")
+        outFile.write(transitionCode("inState","state","letter","  "))
+        outFile.write("  return "+activeCode(rejectingState)+";\n")
+        outFile.write("}\n\n")
+
+        # Write trace decompiler, or the violation record for decoding it on the host.
+        if hostDecoding:
+            writeSharedHistoryViolationRecordCode(outFile,automaton,lengths[rejectingState],nodeType,noNode,referenceBits,dataTypeAPValues,filenameOut[:-2]+"_decoder.py")
+        else:
+            outFile.write("/* Function for obtaining trace information from stored values. Uses statically reserved space */")
+            maximumTraceLength = max(lengths)
+            stringLengthOfAllAPs = sum([len(a)+3 for a in APs])
+            maxSpaceViolationTrackingPrintout = 64+64*maximumTraceLength+stringLengthOfAllAPs*maximumTraceLength
+            outFile.write("char violatingTraceInformation["+str(maxSpaceViolationTrackingPrintout+1)+"];\n")
+            outFile.write("void buildViolatingTraceInformation() {\n")
+            outFile.write("  int selector = 0;\n")
+            outFile.write("  "+nodeType+" node = state"+str(rejectingState)+"node;\n")
+            outFile.write("  int state="+str(rejectingState)+";\n")
+            outFile.write("  int ptr=snprintf(violatingTraceInformation,"+str(maxSpaceViolationTrackingPrintout)+",\"Violating trace (before entering the rejecting state):\\n\");\n")
+            outFile.write("  while ("+"&&".join(["(state!="+str(a)+")" for a in startingStates])+") {\n")
+            outFile.write("    switch(state) {\n")
+            for state in range(nofStates):
+                if not state in startingStates:
+                    outFile.write("      case "+str(state)+":\n")
+                    outFile.write("        selector = (int[]){"+",".join([str(a[0]) for a in reverseTransitionRelation[state]])+"}[historyInfo[node] >> "+str(referenceBits)+"];\n")
+                    outFile.write("        break;\n")
+            outFile.write("    }\n")
+            outFile.write("    ptr += snprintf(violatingTraceInformation+ptr,"+str(maxSpaceViolationTrackingPrintout)+"-ptr,\"- Transition from state %d with prop. values: "+", ".join([a+"=%d" for a in APs])+"\\n\",selector")
+            for i,a in enumerate(APs):
+                outFile.write(", (historyLetters[node] & (1 << "+str(i)+"))?1:0")
+            outFile.write(");\n")
+            outFile.write("    node = historyParents[node];\n")
+            outFile.write("    state = selector;\n")
+            outFile.write("  }\n")
+            outFile.write("}\n")
+
+        # Entry points for packed letters, which work on local copies of the flags of the initial states and of the
+        # node references. The history node pool stays in the global arrays.
+        loadCode = "".join(["  uint8_t state"+str(i)+" = inState"+str(i)+";\n" if i in startingStates else "  "+nodeType+" localState"+str(i)+"node = state"+str(i)+"node;\n" for i in range(nofStates)])
+        stepCode = guards.declarationCode("    ")+transitionCode("state","localState","("+dataTypeAPValues+")(letter & "+str((1 << len(APs))-1)+")","    ")
+        stepCode += "    if "+activeCode(rejectingState,"state","localState")+" break;\n"
+        storeCode = "".join(["  inState"+str(i)+" = state"+str(i)+";\n" if i in startingStates else "  state"+str(i)+"node = localState"+str(i)+"node;\n" for i in range(nofStates)])
+        outFile.write(batchEntryPointsCode(APs,loadCode,stepCode,storeCode))
+    guards.report(filenameOut)
+    print("History node pool for "+filenameOut+": "+str(poolSize)+" nodes, "+str(computeSharedHistoryStorageBytes(automaton,stateSets))+" bytes of RAM for the states and the pool (per-state buffers: "+str(computeTraceStorageBytes(automaton))+" bytes)")
+
     
 # Preparation for c<ses where all specification blocks are merged
 specLinesOfAllBlocks = []
@@ -614,16 +942,34 @@ specOfAllBlocks = " & ".join(["("+a+")" for a in specLinesOfAllBlocks])
 
     
 # Experiment: Universal automaton
-assert os.system("lib/spot-2.12/bin/ltl2tgba -f \"!("+specOfAllBlocks+")\" > results/uca.txt")==0
-assert os.system("lib/spot-2.12/bin/ltl2tgba -f \"!("+specOfAllBlocks+")\" -d > results/uca.dot")==0
-
-for version in [0,1]:
+translateLTL("!("+specOfAllBlocks+")",[],"results/uca.txt")
+translateLTL("!("+specOfAllBlocks+")",["-d"],"results/uca.dot")
+universalAutomaton = loadHOAFile("results/uca.txt",APs)
+if OPTIMIZE_AUTOMATA:
+    universalAutomaton = optimizeAutomaton(universalAutomaton,True,"results/uca.txt")
+
+# Worst-case step cost of the monitor with UVW optimizations, checked before anything is flashed
+reachableStateSets = computeReachableStateSets(universalAutomaton,WCET_MAX_NOF_STATE_SETS)
+reasonTrackingGuards = GuardOptimizer(universalAutomaton,[guard for transitionList in universalAutomaton.transitions for (target,guard) in transitionList],OPTIMIZE_GUARDS) # As in monitorCompilerUniversalWithReasonTracking
+worstCase = analyzeReasonTrackingMonitor(universalAutomaton,reachableStateSets,computeBytesCopiedPerTransition(universalAutomaton),reasonTrackingGuards)
+with open("resultsReasonTrackingTexMacros.tex","w") as texFile:
+    worstCaseStepCost = reportWorstCaseStepCost(texFile,"ReasonTracking",worstCase,APs)
+if WCET_STEP_BUDGET is not None and worstCaseStepCost>WCET_STEP_BUDGET:
+    raise Exception("Error: The worst-case step cost of the monitor ("+str(worstCaseStepCost)+") exceeds the budget of "+str(WCET_STEP_BUDGET)+".")
+
+for version in [0,1,2]:
     if version==0:
-        monitorCompilerUniversalWithReasonTracking("results/uca.txt","results/uca_reason_tracking.c")
+        monitorCompilerUniversalWithReasonTracking(universalAutomaton,"results/uca_reason_tracking.c",OPTIMIZE_GUARDS,HOST_DECODING)
         print("======================With UVW optimizations====================")
-    else:
-        monitorCompilerUniversalWithReasonTrackingWithoutUVWOptimizations("results/uca.txt","results/uca_reason_tracking.c")
+    elif version==1:
+        monitorCompilerUniversalWithReasonTrackingWithoutUVWOptimizations(universalAutomaton,"results/uca_reason_tracking.c",OPTIMIZE_GUARDS,HOST_DECODING)
         print("======================Without UVW optimizations====================")
+    else:
+        monitorCompilerUniversalWithSharedHistoryReasonTracking(universalAutomaton,"results/uca_reason_tracking.c",reachableStateSets,OPTIMIZE_GUARDS,HOST_DECODING)
+        print("======================With shared history storage====================")
+    assert os.system("cp results/uca_reason_tracking.c results/uca_reason_tracking_"+["with_uvw_optimizations","without_uvw_optimizations","shared_history"][version]+".c")==0
+    if HOST_DECODING:
+        assert os.system("cp results/uca_reason_tracking_decoder.py results/uca_reason_tracking_"+["with_uvw_optimizations","without_uvw_optimizations","shared_history"][version]+"_decoder.py")==0
     assert os.system("cp results/uca_reason_tracking.c pioproject/src/monitor.c")==0
     assert os.system("cd pioproject; pio run > /tmp/pioout 2>&1")==0
     (newRAM,newFlash) = getSizesForF446RE("/tmp/pioout")
@@ -641,6 +987,16 @@ for version in [0,1]:
     print("Results:")
     print("(Base Flash/RAM/Clock cycle usage not yet subtracted -- the 'build_monitors.py' script outputs these values to the terminal when running)")
     print("RAM used:",newRAM)
+    if version<2:
+        print("RAM for the states and the per-state buffers:",computeTraceStorageBytes(universalAutomaton))
+    else:
+        print("RAM for the states and the history node pool:",computeSharedHistoryStorageBytes(universalAutomaton,reachableStateSets))
     print("Flash used:",newFlash)
     if USE_NUCLEO_BOARD:
         print("#Cycles -- divide by 7 after subtracting the base number: ",nofCyclesThis)
+
+# For testing the decoders, the variants are also built with the description of the violating trace on the device
+if HOST_DECODING:
+    monitorCompilerUniversalWithReasonTracking(universalAutomaton,"results/uca_reason_tracking_with_uvw_optimizations_text.c",OPTIMIZE_GUARDS)
+    monitorCompilerUniversalWithReasonTrackingWithoutUVWOptimizations(universalAutomaton,"results/uca_reason_tracking_without_uvw_optimizations_text.c",OPTIMIZE_GUARDS)
+    monitorCompilerUniversalWithSharedHistoryReasonTracking(universalAutomaton,"results/uca_reason_tracking_shared_history_text.c",reachableStateSets,OPTIMIZE_GUARDS)
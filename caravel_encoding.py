@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# Generator for the input of the monitor compiler for the hardware monitor on the Caravel SoC 
+# (https://github.com/progirep/monitor_compiler_for_caraval_monitor). Builds the encoding from the
+# same universal automaton that the software monitors are built from, so that it does not need to 
+# be written by hand as in "monitor_for_caravel/monitor_encoding_by_hand.txt".
+#
+# This file is dual-licensed under licensed under CC BY-SA version 4.0, available at 
+# https://creativecommons.org/licenses/by-sa/4.0/legalcode and the following BSD licence:
+#
+# ------------------------------------------[BSD License Text]---------------------------------------------
+# Copyright 2024 Ruediger Ehlers
+# 
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided 
+# that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this list of conditions and 
+# the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and
+# the following disclaimer in the documentation and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or 
+# promote products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS “AS IS” AND ANY EXPRESS OR IMPLIED 
+# WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A 
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE 
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS 
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, 
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN 
+# IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Expressions are represented as nested tuples in prefix form, such as ("&","r1",("!","y1")), and
+# variable names as strings. The depth of an expression is the number of binary operators on the
+# longest path from the root to a variable -- negations are assumed to be free.
+
+import heapq, itertools
+from guard_optimization import GuardOptimizer
+
+
+# =====================================
+# Expression helper functions
+# =====================================
+def expressionDepth(expression,variableDepths={}):
+    if isinstance(expression,str):
+        return variableDepths.get(expression,0)
+    if expression[0]=="!":
+        return expressionDepth(expression[1],variableDepths)
+    return 1+max([expressionDepth(a,variableDepths) for a in expression[1:]])
+
+
+def expressionVariables(expression):
+    if isinstance(expression,str):
+        return set([expression])
+    result = set([])
+    for a in expression[1:]:
+        result.update(expressionVariables(a))
+    return result
+
+
+def expressionToString(expression):
+    if isinstance(expression,str):
+        return expression
+    return " ".join([expression[0]]+[expressionToString(a) for a in expression[1:]])
+
+
+def renameVariables(expression,newNames):
+    if isinstance(expression,str):
+        return newNames.get(expression,expression)
+    return tuple([expression[0]]+[renameVariables(a,newNames) for a in expression[1:]])
+
+
+def combineBalanced(operator,operands):
+    """Combines a non-empty list of expressions with a binary operator. The two shallowest expressions
+    are always combined first, which gives a tree of minimal depth."""
+    counter = itertools.count()
+    queue = [(expressionDepth(a),next(counter),a) for a in operands]
+    heapq.heapify(queue)
+    while len(queue)>1:
+        (depthA,_,a) = heapq.heappop(queue)
+        (depthB,_,b) = heapq.heappop(queue)
+        heapq.heappush(queue,(1+max(depthA,depthB),next(counter),(operator,a,b)))
+    return queue[0][2]
+
+
+# =====================================
+# Encoding generation
+# =====================================
+def buildNextStateLets(automaton,stateNames):
+    """Builds the list of (name,expression) pairs for the shared subterms of the guards and the next
+    state values. Guards are minimized and shared with the GuardOptimizer of the software monitors.
+    Initial states with a "true" self-loop are always active, so they are left out of the conjunctions
+    of the transitions leaving them."""
+    APs = automaton.APs
+    guards = GuardOptimizer(automaton,[guard for transitionList in automaton.transitions for (target,guard) in transitionList])
+    alwaysActive = set([])
+    for state in automaton.startingStates:
+        for (target,guard) in automaton.transitions[state]:
+            if target==state and guard.isTrue():
+                alwaysActive.add(state)
+    constantTrue = ("|",APs[0],("!",APs[0]))
+    constantFalse = ("&",APs[0],("!",APs[0]))
+
+    def cubeExpression(cube,cover):
+        (careMask,valueMask) = cube
+        conjuncts = []
+        if not cover is None:
+            conjuncts.append(guards.sharedCubes[cover])
+            careMask = careMask & ~cover[0]
+        for apNum in automaton.literalOrder:
+            if careMask & (1 << apNum):
+                if valueMask & (1 << apNum):
+                    conjuncts.append(APs[apNum])
+                else:
+                    conjuncts.append(("!",APs[apNum]))
+        if len(conjuncts)==0:
+            return None
+        return combineBalanced("&",conjuncts)
+
+    def cubesExpression(cubes):
+        disjuncts = [cubeExpression(cube,guards.covers.get(cube)) for cube in cubes]
+        if len(disjuncts)==0:
+            return constantFalse
+        if None in disjuncts:
+            return None
+        return combineBalanced("|",disjuncts)
+
+    # Shared subterms
+    lets = []
+    for (cube,name) in guards.sharedCubes.items():
+        lets.append((name,cubeExpression(cube,guards.termCovers.get(cube))))
+    for (letterSet,name) in guards.sharedGuards.items():
+        lets.append((name,cubesExpression(guards.minimizedGuards[letterSet])))
+
+    # Next state values
+    for state in range(automaton.nofStates):
+        if state in alwaysActive:
+            lets.append((stateNames[state]+"'",stateNames[state]))
+            continue
+        disjuncts = []
+        for (source,guard) in automaton.reverseTransitions[state]:
+            letterSet = automaton.guardToLetterSet(guard)
+            if letterSet in guards.sharedGuards:
+                conjuncts = [guards.sharedGuards[letterSet]]
+            else:
+                guardExpression = cubesExpression(guards.minimizedGuards[letterSet])
+                conjuncts = [] if guardExpression is None else [guardExpression]
+            if not source in alwaysActive:
+                conjuncts.append(stateNames[source])
+            if len(conjuncts)==0:
+                disjuncts.append(constantTrue)
+            else:
+                disjuncts.append(combineBalanced("&",conjuncts))
+        if len(disjuncts)==0:
+            lets.append((stateNames[state]+"'",constantFalse))
+        else:
+            lets.append((stateNames[state]+"'",combineBalanced("|",disjuncts)))
+    return lets
+
+
+def limitLetDepths(lets,maxDepth):
+    """Splits the expressions of the LETs by moving subexpressions into new LETs until no expression
+    is deeper than maxDepth. Identical subexpressions are only moved once."""
+    result = []
+    subtermNames = {}
+
+    def limit(expression):
+        if isinstance(expression,str):
+            return expression
+        expression = tuple([expression[0]]+[limit(a) for a in expression[1:]])
+        while expressionDepth(expression)>maxDepth:
+            deepest = max(range(1,len(expression)),key=lambda a: expressionDepth(expression[a]))
+            subterm = expressionToString(expression[deepest])
+            if not subterm in subtermNames:
+                subtermNames[subterm] = "subterm"+str(len(subtermNames))
+                result.append((subtermNames[subterm],expression[deepest]))
+            expression = expression[:deepest]+(subtermNames[subterm],)+expression[deepest+1:]
+        return expression
+
+    for (name,expression) in lets:
+        expression = limit(expression)
+        result.append((name,expression))
+    return result
+
+
+def scheduleLets(lets,maxDepth):
+    """Assigns the LETs (in an order in which every LET only uses the LETs before it) to blocks such that
+    the critical path within every block is at most maxDepth long. A LET can use the values of LETs in
+    the same block, which adds to the critical path, and in earlier blocks, which does not. Every LET
+    is put into the earliest block possible. Returns the list of blocks."""
+    blockNumbers = {}
+    criticalPathLengths = {}
+    blocks = []
+    for (name,expression) in lets:
+        usedLets = [a for a in expressionVariables(expression) if a in blockNumbers]
+        block = max([blockNumbers[a] for a in usedLets]+[0])
+        depth = expressionDepth(expression,dict([(a,criticalPathLengths[a]) for a in usedLets if blockNumbers[a]==block]))
+        if depth>maxDepth:
+            block += 1
+            depth = expressionDepth(expression)
+        assert depth<=maxDepth
+        blockNumbers[name] = block
+        criticalPathLengths[name] = depth
+        while len(blocks)<=block:
+            blocks.append([])
+        blocks[block].append((name,expression))
+    return blocks
+
+
+def generateCaravelEncoding(automaton,filenameOut,maxNofBlocks):
+    """Writes the encoding of a universal automaton for the Caravel monitor compiler, using at most maxNofBlocks
+    blocks (separated by NEWBLOCK). The smallest critical path length per block for which the LETs can be
+    scheduled into this many blocks is searched for. The rejecting state is listed last among the states,
+    as in the encoding written by hand. Returns the number of LETs, the number of blocks, and the critical
+    path length."""
+    if maxNofBlocks<1:
+        raise Exception("Error: At least one block is needed for the Caravel monitor encoding.")
+    rejectingState = automaton.findRejectingState()
+    stateOrder = [a for a in range(automaton.nofStates) if a!=rejectingState]+[rejectingState]
+    stateNames = ["q"+str(a) for a in range(automaton.nofStates)]
+    lets = buildNextStateLets(automaton,stateNames)
+
+    maxDepth = 1
+    while True:
+        limitedLets = limitLetDepths(lets,maxDepth)
+        blocks = scheduleLets(limitedLets,maxDepth)
+        if len(blocks)<=maxNofBlocks:
+            break
+        maxDepth += 1
+
+    # Number the subterms in the order in which they appear in the encoding
+    newNames = {}
+    for block in blocks:
+        for (name,expression) in block:
+            if name.startswith("subterm"):
+                newNames[name] = "subterm"+str(len(newNames))
+    blocks = [[(newNames.get(name,name),renameVariables(expression,newNames)) for (name,expression) in block] for block in blocks]
+
+    with open(filenameOut,"w") as outFile:
+        outFile.write("STATES "+" ".join([stateNames[a] for a in stateOrder])+"\n")
+        outFile.write("INITIAL "+" ".join(["1" if a in automaton.startingStates else "0" for a in stateOrder])+"\n")
+        outFile.write("PROPOSITIONS "+" ".join(automaton.APs)+"\n")
+        for blockNum,block in enumerate(blocks):
+            if blockNum>0:
+                outFile.write("NEWBLOCK\n")
+            for (name,expression) in block:
+                outFile.write("LET "+name+" "+expressionToString(expression)+"\n")
+    print("Caravel monitor encoding "+filenameOut+": "+str(len(limitedLets))+" LETs in "+str(len(blocks))+" blocks with a critical path length of "+str(maxDepth))
+    return (len(limitedLets),len(blocks),maxDepth)
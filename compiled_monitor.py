@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# Host-side Python interface to the generated monitors: A monitor is compiled into a shared library and
+# driven through its entry points for packed letters, monitor_letter() and monitor_run(). Trace files (one
+# byte per letter, as for the host benchmark) are memory-mapped and processed by a single call of 
+# monitor_run(), so that they are neither copied nor converted.
+#
+# This file is dual-licensed under licensed under CC BY-SA version 4.0, available at 
+# https://creativecommons.org/licenses/by-sa/4.0/legalcode and the following BSD licence:
+#
+# ------------------------------------------[BSD License Text]---------------------------------------------
+# Copyright 2024 Ruediger Ehlers
+# 
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided 
+# that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this list of conditions and 
+# the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and
+# the following disclaimer in the documentation and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or 
+# promote products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS “AS IS” AND ANY EXPRESS OR IMPLIED 
+# WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A 
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE 
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS 
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, 
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN 
+# IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import os, mmap, ctypes, subprocess, tempfile
+from host_benchmark import HOST_C_COMPILER, HOST_C_FLAGS
+
+
+class CompiledMonitor:
+    """A generated monitor, compiled into a shared library in the given directory. Every object has its own copy
+    of the library and hence its own monitor state, which starts in the initial state of the monitor and is
+    carried over between calls."""
+
+    def __init__(self,monitorFilename,directory):
+        (fileDescriptor,libraryFilename) = tempfile.mkstemp(suffix=".so",prefix=os.path.basename(monitorFilename)[:-2]+"_",dir=directory)
+        os.close(fileDescriptor)
+        subprocess.check_call([HOST_C_COMPILER]+HOST_C_FLAGS+["-shared","-fPIC",monitorFilename,"-o",libraryFilename])
+        self.library = ctypes.CDLL(os.path.abspath(libraryFilename))
+        self.library.monitor_letter.restype = ctypes.c_int
+        self.library.monitor_letter.argtypes = [ctypes.c_uint32]
+        self.library.monitor_run.restype = ctypes.c_size_t
+        self.library.monitor_run.argtypes = [ctypes.c_void_p,ctypes.c_size_t]
+
+    def step(self,letter):
+        """Performs one monitor step. Returns True if a violation is reported."""
+        return self.library.monitor_letter(letter)!=0
+
+    def run(self,letters):
+        """Processes a sequence of letters (given as bytes or list of integers). Returns the index of the first
+        letter for which a violation is reported, or -1 if there is none. The letters after the violation are
+        not processed."""
+        letters = bytes(letters)
+        position = self.library.monitor_run(letters,len(letters))
+        return -1 if position==len(letters) else position
+
+    def runTraceFile(self,filename):
+        """Processes a memory-mapped trace file, as run() does."""
+        size = os.path.getsize(filename)
+        if size==0:
+            return -1
+        with open(filename,"rb") as inFile:
+            with mmap.mmap(inFile.fileno(),0,access=mmap.ACCESS_COPY) as mappedFile:
+                buffer = (ctypes.c_uint8*size).from_buffer(mappedFile)
+                position = self.library.monitor_run(ctypes.addressof(buffer),size)
+                del buffer
+        return -1 if position==size else position
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# Differential fuzzing of the generated monitors: All encodings of the specification are compiled into a
+# single shared library for the host computer and run on the same random and coverage-guided traces. The
+# steps of the first violation reported by the encodings are compared with each other and, if NumPy is
+# available, with those computed by the reference simulator.
+#
+# This file is dual-licensed under licensed under CC BY-SA version 4.0, available at 
+# https://creativecommons.org/licenses/by-sa/4.0/legalcode and the following BSD licence:
+#
+# ------------------------------------------[BSD License Text]---------------------------------------------
+# Copyright 2024 Ruediger Ehlers
+# 
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided 
+# that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this list of conditions and 
+# the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and
+# the following disclaimer in the documentation and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or 
+# promote products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS “AS IS” AND ANY EXPRESS OR IMPLIED 
+# WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A 
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE 
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS 
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, 
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN 
+# IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import os, random, subprocess, ctypes
+import reference_simulator
+from host_benchmark import HOST_C_COMPILER, generateTrace
+
+# =========================================
+# Settings
+# =========================================
+FUZZ_DRIVER = "monitortest/fuzz_driver.c"
+FUZZ_C_FLAGS = ["-O2","-w","-fPIC","-fno-common"]
+
+
+# =====================================
+# Building all encodings into one library
+# =====================================
+def renameEncodingSymbols(objectFilename,encodingNum):
+    """Renames the symbols in the object file of an encoding so that they do not clash with those of the other
+    encodings: The functions and read-only data get the prefix "encoding<num>_", and the variables (including
+    static ones, which are made global) are named "encoding<num>_variable<i>". Returns the list of the new
+    names of the variables together with their sizes in bytes."""
+    variables = []
+    renamings = []
+    localVariables = []
+    for line in subprocess.check_output(["nm","-S","--defined-only",objectFilename]).decode("utf-8").split("\n"):
+        parts = line.split()
+        if len(parts)==3:
+            # Symbols of size 0 (such as empty structs) are listed without a size
+            parts = [parts[0],"0"]+parts[1:]
+        if len(parts)!=4:
+            continue
+        (address,size,symbolType,name) = parts
+        if symbolType in "DdBb":
+            newName = "encoding"+str(encodingNum)+"_variable"+str(len(variables))
+            variables.append((newName,int(size,16)))
+            renamings.append((name,newName))
+            if symbolType in "db":
+                localVariables.append(name)
+        elif symbolType in "TR":
+            renamings.append((name,"encoding"+str(encodingNum)+"_"+name))
+    if not "monitor" in [a for (a,b) in renamings]:
+        raise Exception("Error: The object file "+objectFilename+" does not define a monitor function.")
+    if len(localVariables)>0:
+        subprocess.check_call(["objcopy"]+["--globalize-symbol="+a for a in localVariables]+[objectFilename])
+    subprocess.check_call(["objcopy"]+["--redefine-sym="+a+"="+b for (a,b) in renamings]+[objectFilename])
+    return variables
+
+
+def writeEncodingTable(encodingVariables,filenameOut):
+    """Writes the C file with the table of the monitor functions of all encodings and the function for
+    resetting the variables of an encoding to the values that they have when the library is loaded."""
+    nofEncodings = len(encodingVariables)
+    with open(filenameOut,"w") as outFile:
+        outFile.write("#include <stdint.h>\n")
+        outFile.write("#include <string.h>\n")
+        outFile.write("typedef int (*monitorFunction)(uint8_t,uint8_t,uint8_t,uint8_t,uint8_t,uint8_t,uint8_t,uint8_t);\n")
+        for (encodingNum,variables) in enumerate(encodingVariables):
+            outFile.write("int encoding"+str(encodingNum)+"_monitor(uint8_t,uint8_t,uint8_t,uint8_t,uint8_t,uint8_t,uint8_t,uint8_t);\n")
+            for (name,size) in variables:
+                outFile.write("extern char "+name+"[];\n")
+                if size>0:
+                    outFile.write("static char initial_"+name+"["+str(size)+"];\n")
+        outFile.write("const int nofEncodings = "+str(nofEncodings)+";\n")
+        outFile.write("const monitorFunction encodingMonitors["+str(nofEncodings)+"] = {"+",".join(["encoding"+str(a)+"_monitor" for a in range(nofEncodings)])+"};\n")
+        outFile.write("__attribute__((constructor)) static void saveInitialEncodingStates(void) {\n")
+        for variables in encodingVariables:
+            for (name,size) in variables:
+                if size>0:
+                    outFile.write("  memcpy(initial_"+name+","+name+","+str(size)+");\n")
+        outFile.write("}\n")
+        outFile.write("void resetEncodingState(int encoding) {\n")
+        outFile.write("  switch (encoding) {\n")
+        for (encodingNum,variables) in enumerate(encodingVariables):
+            outFile.write("    case "+str(encodingNum)+":\n")
+            for (name,size) in variables:
+                if size>0:
+                    outFile.write("      memcpy("+name+",initial_"+name+","+str(size)+");\n")
+            outFile.write("      break;\n")
+        outFile.write("  }\n")
+        outFile.write("}\n")
+
+
+class EncodingLibrary:
+    """Shared library with all encodings given as list of C files, built in the given directory."""
+
+    def __init__(self,monitorFilenames,directory):
+        if len(monitorFilenames)==0:
+            raise Exception("Error: At least one encoding is needed for differential fuzzing.")
+        self.monitorFilenames = monitorFilenames
+        objectFilenames = []
+        encodingVariables = []
+        for (encodingNum,monitorFilename) in enumerate(monitorFilenames):
+            objectFilename = os.path.join(directory,"encoding"+str(encodingNum)+".o")
+            subprocess.check_call([HOST_C_COMPILER]+FUZZ_C_FLAGS+["-c",monitorFilename,"-o",objectFilename])
+            encodingVariables.append(renameEncodingSymbols(objectFilename,encodingNum))
+            objectFilenames.append(objectFilename)
+        writeEncodingTable(encodingVariables,os.path.join(directory,"encodings.c"))
+        libraryFilename = os.path.abspath(os.path.join(directory,"libmonitorfuzzing.so"))
+        subprocess.check_call([HOST_C_COMPILER]+FUZZ_C_FLAGS+["-shared",FUZZ_DRIVER,os.path.join(directory,"encodings.c")]+objectFilenames+["-o",libraryFilename])
+        self.library = ctypes.CDLL(libraryFilename)
+        self.library.runTraces.restype = ctypes.c_uint64
+        self.library.runTraces.argtypes = [ctypes.c_char_p,ctypes.POINTER(ctypes.c_uint32),ctypes.c_uint32,ctypes.POINTER(ctypes.c_int64)]
+        self.library.fuzzRandom.restype = ctypes.c_int
+        self.library.fuzzRandom.argtypes = [ctypes.c_uint64,ctypes.c_uint64,ctypes.c_uint32,ctypes.c_uint32,ctypes.c_char_p,ctypes.POINTER(ctypes.c_uint32),ctypes.POINTER(ctypes.c_uint64)]
+        self.nofEncodings = self.library.getNofEncodings()
+        assert self.nofEncodings==len(monitorFilenames)
+
+    def runTraces(self,traces):
+        """Runs all encodings on a list of traces. Returns for every trace the list of the steps of the first
+        violation found by the encodings (-1 for no violation), and the number of monitor steps executed."""
+        lengths = (ctypes.c_uint32*len(traces))(*[len(a) for a in traces])
+        firstViolations = (ctypes.c_int64*(len(traces)*self.nofEncodings))()
+        nofSteps = self.library.runTraces(b"".join([bytes(a) for a in traces]),lengths,len(traces),firstViolations)
+        return ([list(firstViolations[a*self.nofEncodings:(a+1)*self.nofEncodings]) for a in range(len(traces))],nofSteps)
+
+    def fuzzRandom(self,seed,nofTraces,maxLength,changeProbability):
+        """Runs all encodings on random traces (see monitortest/fuzz_driver.c). Returns a trace on which the
+        encodings disagree (or None) and the number of monitor steps executed."""
+        counterexample = ctypes.create_string_buffer(maxLength)
+        counterexampleLength = ctypes.c_uint32(0)
+        nofSteps = ctypes.c_uint64(0)
+        if self.library.fuzzRandom(seed,nofTraces,maxLength,changeProbability,counterexample,ctypes.byref(counterexampleLength),ctypes.byref(nofSteps)):
+            return (list(counterexample.raw[0:counterexampleLength.value]),nofSteps.value)
+        return (None,nofSteps.value)
+
+
+# =====================================
+# Verdicts and counterexamples
+# =====================================
+def computeVerdicts(library,referenceSimulator,traces):
+    """Steps of the first violations of the traces for all encodings, followed by the reference simulator
+    (if given)."""
+    (verdicts,nofSteps) = library.runTraces(traces)
+    if not referenceSimulator is None:
+        maxLength = max([len(a) for a in traces])
+        paddedTraces = [list(a)+[0]*(maxLength-len(a)) for a in traces]
+        referenceSimulator.reset(len(traces))
+        referenceSimulator.continueRun(reference_simulator.numpy.array(paddedTraces,dtype=reference_simulator.numpy.uint8),[len(a) for a in traces])
+        for (traceNum,firstViolation) in enumerate(referenceSimulator.firstViolation):
+            verdicts[traceNum].append(int(firstViolation))
+    return (verdicts,nofSteps)
+
+
+def getFirstDivergingStep(verdicts):
+    """The first step in which not all encodings agree on whether there has been a violation, or None if they
+    all agree."""
+    if len(set(verdicts))<=1:
+        return None
+    return min([a for a in verdicts if a>=0])
+
+
+def minimizeCounterexample(library,referenceSimulator,trace):
+    """Shrinks a trace on which the encodings disagree: The trace is cut after the first diverging step, parts of
+    it are removed as long as the encodings still disagree (with halving part sizes, as in delta debugging), and
+    finally the propositions are set to false wherever this is possible."""
+    def isDiverging(candidate):
+        return len(candidate)>0 and not getFirstDivergingStep(computeVerdicts(library,referenceSimulator,[candidate])[0][0]) is None
+    assert isDiverging(trace)
+    trace = list(trace[0:getFirstDivergingStep(computeVerdicts(library,referenceSimulator,[trace])[0][0])+1])
+    partSize = len(trace)//2
+    while partSize>=1:
+        position = 0
+        while position<len(trace):
+            candidate = trace[0:position]+trace[position+partSize:]
+            if isDiverging(candidate):
+                trace = candidate
+            else:
+                position += partSize
+        partSize = partSize//2
+    for position in range(len(trace)):
+        for bit in range(8):
+            if trace[position] & (1 << bit):
+                candidate = list(trace)
+                candidate[position] &= ~(1 << bit)
+                if isDiverging(candidate):
+                    trace = candidate
+    return trace
+
+
+def describeCounterexample(library,referenceSimulator,APs,trace):
+    """Text describing a trace and the verdicts of all encodings on it."""
+    verdicts = computeVerdicts(library,referenceSimulator,[trace])[0][0]
+    names = list(library.monitorFilenames)+(["reference simulator"] if not referenceSimulator is None else [])
+    lines = ["Encodings disagree in step "+str(getFirstDivergingStep(verdicts))+" on the following trace:"]
+    for (stepNum,letter) in enumerate(trace):
+        lines.append("  Step "+str(stepNum)+": "+", ".join([a+"="+str((letter >> i) & 1) for (i,a) in enumerate(APs)]))
+    for (name,verdict) in zip(names,verdicts):
+        if verdict<0:
+            lines.append("  "+name+": no violation")
+        else:
+            lines.append("  "+name+": violation in step "+str(verdict))
+    return "\n".join(lines)
+
+
+# =====================================
+# Coverage-guided fuzzing
+# =====================================
+class CoverageTracker:
+    """Computes the coverage of a trace as the set of transitions of a universal automaton taken and the set of
+    sets of active states visited until the rejecting state is reached. The subset construction needed for
+    this is built lazily."""
+
+    def __init__(self,automaton):
+        self.automaton = automaton
+        self.rejectingState = automaton.findRejectingState()
+        self.edgeLetterSets = [[(target,automaton.guardToLetterSet(guard)) for (target,guard) in automaton.transitions[state]] for state in range(automaton.nofStates)]
+        self.initialStates = sum([1 << a for a in automaton.startingStates])
+        self.successors = {}
+
+    def computeSuccessor(self,activeStates,letter):
+        if not (activeStates,letter) in self.successors:
+            nextStates = 0
+            edges = []
+            for state in range(self.automaton.nofStates):
+                if activeStates & (1 << state):
+                    for (edgeNum,(target,letterSet)) in enumerate(self.edgeLetterSets[state]):
+                        if letterSet & (1 << letter):
+                            nextStates |= 1 << target
+                            edges.append(("edge",state,edgeNum))
+            self.successors[(activeStates,letter)] = (nextStates,edges)
+        return self.successors[(activeStates,letter)]
+
+    def computeCoverage(self,trace):
+        coverage = set([])
+        activeStates = self.initialStates
+        for letter in trace:
+            (activeStates,edges) = self.computeSuccessor(activeStates,letter)
+            coverage.update(edges)
+            coverage.add(("states",activeStates))
+            if activeStates & (1 << self.rejectingState):
+                break
+        return coverage
+
+
+def mutateTrace(trace,corpus,randomGenerator,maxLength):
+    """Applies one to four random mutations to a trace: flipping a proposition, replacing a letter, repeating a
+    letter, removing a part, and splicing with another trace from the corpus."""
+    trace = list(trace)
+    for mutationNum in range(randomGenerator.randint(1,4)):
+        position = randomGenerator.randrange(len(trace))
+        mutation = randomGenerator.randrange(5)
+        if mutation==0:
+            trace[position] ^= 1 << randomGenerator.randrange(8)
+        elif mutation==1:
+            trace[position] = randomGenerator.randrange(256)
+        elif mutation==2:
+            trace[position:position] = [trace[position]]*randomGenerator.randint(1,8)
+        elif mutation==3 and len(trace)>1:
+            del trace[position:position+randomGenerator.randint(1,8)]
+        elif mutation==4:
+            otherTrace = randomGenerator.choice(corpus)
+            trace = trace[0:position]+otherTrace[randomGenerator.randrange(len(otherTrace)):]
+        if len(trace)==0:
+            trace = [randomGenerator.randrange(256)]
+    return trace[0:maxLength]
+
+
+def fuzzCoverageGuided(library,referenceSimulator,automaton,initialCorpus,nofTraces,maxLength,seed,batchSize=1000):
+    """Runs all encodings (and the reference simulator) on nofTraces traces obtained by mutating the traces in a
+    corpus. Traces that cover transitions or sets of active states of the universal automaton that no trace
+    before has covered are added to the corpus. The corpus initially consists of initialCorpus and random traces
+    that satisfy the specification. Returns a trace on which the encodings disagree (or None), the number of
+    monitor steps executed, and the size of the coverage."""
+    randomGenerator = random.Random(seed)
+    coverageTracker = CoverageTracker(automaton)
+    corpus = [list(a) for a in initialCorpus]+[generateTrace(automaton,maxLength,seed*16+a) for a in range(4)]
+    coverage = set([])
+    for trace in corpus:
+        coverage.update(coverageTracker.computeCoverage(trace))
+    nofSteps = 0
+    for batchStart in range(0,nofTraces,batchSize):
+        traces = [mutateTrace(randomGenerator.choice(corpus),corpus,randomGenerator,maxLength) for a in range(min(batchSize,nofTraces-batchStart))]
+        (verdicts,nofStepsBatch) = computeVerdicts(library,referenceSimulator,traces)
+        nofSteps += nofStepsBatch
+        for (trace,traceVerdicts) in zip(traces,verdicts):
+            if not getFirstDivergingStep(traceVerdicts) is None:
+                return (trace,nofSteps,len(coverage))
+            traceCoverage = coverageTracker.computeCoverage(trace)
+            if not traceCoverage.issubset(coverage):
+                coverage.update(traceCoverage)
+                corpus.append(trace)
+    return (None,nofSteps,len(coverage))
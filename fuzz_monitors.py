@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# Python file for differential fuzzing of the monitors built by "build_monitors.py" and 
+# "build_violation_reason_tracking_monitor.py". All monitors are run on the same random and coverage-guided
+# traces, and it is checked that they report the first violation of the specification in the same step.
+# If they do not, a minimized trace on which they disagree is printed, and the script exits with an error.
+#
+# This script is dual-licensed under licensed under CC BY-SA version 4.0, available at 
+# https://creativecommons.org/licenses/by-sa/4.0/legalcode and the following BSD licence:
+#
+# ------------------------------------------[BSD License Text]---------------------------------------------
+# Copyright 2024 Ruediger Ehlers
+# 
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided 
+# that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this list of conditions and 
+# the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and
+# the following disclaimer in the documentation and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or 
+# promote products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS “AS IS” AND ANY EXPRESS OR IMPLIED 
+# WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A 
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE 
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS 
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, 
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN 
+# IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import os, sys, time, tempfile
+import reference_simulator
+from hoa_automaton import loadHOAFile
+from differential_fuzzing import EncodingLibrary, computeVerdicts, minimizeCounterexample, describeCounterexample, fuzzCoverageGuided
+
+# =========================================
+# Settings for the scenario
+# =========================================
+APs = ["r1","y1","g1","r2","y2","g2","a1","a2"]
+NOF_RANDOM_STEPS = 10**8 # Minimal number of steps on random traces per encoding
+NOF_COVERAGE_GUIDED_TRACES = 20000 # Number of traces for coverage-guided fuzzing
+MAX_TRACE_LENGTH = 1000 # Maximal length of the traces
+CHANGE_PROBABILITY = 32 # Probability (out of 256) that the propositions of a random trace can change in a step
+SEED = 1
+ENCODINGS = ["monolithic_nba.c","fragmented_monitor.c","fragmented_event_monitor.c","partitioned_fragmented_monitor.c","hybrid_fragmented_monitor.c","fragmented_packed_monitor.c","uca.c","uca_reason_tracking_with_uvw_optimizations.c","uca_reason_tracking_without_uvw_optimizations.c","uca_reason_tracking_shared_history.c","monolithic_nba_bitparallel.c","monolithic_det_monitor.c","monolithic_det_table_monitor.c","monolithic_nba_branchless.c","monolithic_det_branchless.c","uca_bitparallel.c","uca_lookup_tables.c","uca_lazy_determinization.c","uca_context.c","uca_bitsliced.c","uca_branchless.c","uca_packed.c"]
+
+# The trace from "monitortest/test.c"
+TEST_TRACE = [0x09,0x0b,0x0c,0x0a,0x19,0x21,0x24]
+
+if not os.path.exists("results/uca.txt"):
+    raise Exception("Error: results/uca.txt does not exist. Run ./build_monitors.py first.")
+universalAutomaton = loadHOAFile("results/uca.txt",APs)
+encodings = ["results/"+a for a in ENCODINGS if os.path.exists("results/"+a)]
+print("Encodings: "+", ".join(encodings))
+if reference_simulator.numpy is None:
+    print("NumPy is not installed, so the encodings are only compared with each other.")
+    referenceSimulator = None
+else:
+    referenceSimulator = reference_simulator.ReferenceSimulator(universalAutomaton,"universal")
+
+
+def reportCounterexample(trace):
+    trace = minimizeCounterexample(library,referenceSimulator,trace)
+    print(describeCounterexample(library,referenceSimulator,APs,trace))
+    sys.exit(1)
+
+
+with tempfile.TemporaryDirectory() as temporaryDirectory:
+    library = EncodingLibrary(encodings,temporaryDirectory)
+
+    # Sanity check with the trace from the monitor tests
+    (verdicts,nofSteps) = computeVerdicts(library,referenceSimulator,[TEST_TRACE])
+    if verdicts[0]!=[len(TEST_TRACE)-1]*len(verdicts[0]):
+        reportCounterexample(TEST_TRACE)
+
+    # Random traces
+    startTime = time.time()
+    nofSteps = 0
+    chunkNum = 0
+    while nofSteps<NOF_RANDOM_STEPS*len(encodings):
+        (counterexample,nofStepsChunk) = library.fuzzRandom(SEED*1000003+chunkNum,10000,MAX_TRACE_LENGTH,CHANGE_PROBABILITY)
+        nofSteps += nofStepsChunk
+        chunkNum += 1
+        if not counterexample is None:
+            reportCounterexample(counterexample)
+    duration = time.time()-startTime
+    print("Random traces: "+str(nofSteps//len(encodings))+" steps per encoding in "+("%.1f" % duration)+" seconds, no disagreement.")
+
+    # Coverage-guided traces
+    startTime = time.time()
+    (counterexample,nofSteps,coverageSize) = fuzzCoverageGuided(library,referenceSimulator,universalAutomaton,[TEST_TRACE],NOF_COVERAGE_GUIDED_TRACES,MAX_TRACE_LENGTH,SEED)
+    if not counterexample is None:
+        reportCounterexample(counterexample)
+    duration = time.time()-startTime
+    print("Coverage-guided traces: "+str(NOF_COVERAGE_GUIDED_TRACES)+" traces with "+str(nofSteps//len(encodings))+" steps per encoding in "+("%.1f" % duration)+" seconds, "+str(coverageSize)+" coverage items, no disagreement.")
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# Guard optimization for the monitor compilers: Guards are minimized as sums of products, and
+# conjunctions and guards that are used multiple times in a monitor step function are computed
+# only once, in local variables at the start of the step function.
+#
+# This file is dual-licensed under licensed under CC BY-SA version 4.0, available at 
+# https://creativecommons.org/licenses/by-sa/4.0/legalcode and the following BSD licence:
+#
+# ------------------------------------------[BSD License Text]---------------------------------------------
+# Copyright 2024 Ruediger Ehlers
+# 
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided 
+# that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this list of conditions and 
+# the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and
+# the following disclaimer in the documentation and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or 
+# promote products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS “AS IS” AND ANY EXPRESS OR IMPLIED 
+# WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A 
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE 
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS 
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, 
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN 
+# IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+def computeCubeLetterSet(careMask,valueMask,nofAPs):
+    """Bitmask over all letters that satisfy a cube."""
+    letterSet = 0
+    for letter in range(1 << nofAPs):
+        if (letter & careMask)==valueMask:
+            letterSet |= 1 << letter
+    return letterSet
+
+
+def minimizeGuard(cubes,letterSet,nofAPs):
+    """Minimizes a guard given as list of cubes, where letterSet is the set of letters satisfying the
+    guard. Every cube is first expanded by removing literals as long as the cube only contains letters
+    of the letter set. Afterwards, cubes covered by the other cubes are removed. The result is not
+    necessarily minimal, but all cubes are prime and none of them is redundant."""
+    if letterSet==0:
+        return ()
+    if letterSet==(1 << (1 << nofAPs))-1:
+        return ((0,0),)
+    expandedCubes = []
+    for (careMask,valueMask) in cubes:
+        for apNum in range(nofAPs):
+            apBit = 1 << apNum
+            if careMask & apBit:
+                expandedCare = careMask & ~apBit
+                expandedValue = valueMask & ~apBit
+                if computeCubeLetterSet(expandedCare,expandedValue,nofAPs) & ~letterSet==0:
+                    (careMask,valueMask) = (expandedCare,expandedValue)
+        if not (careMask,valueMask) in expandedCubes:
+            expandedCubes.append((careMask,valueMask))
+
+    # Remove redundant cubes, starting with the ones having the most literals
+    cubeLetterSets = {a:computeCubeLetterSet(a[0],a[1],nofAPs) for a in expandedCubes}
+    for cube in sorted(expandedCubes,key=lambda a: -bin(a[0]).count("1")):
+        otherLetters = 0
+        for otherCube in expandedCubes:
+            if otherCube!=cube:
+                otherLetters |= cubeLetterSets[otherCube]
+        if cubeLetterSets[cube] & ~otherLetters==0:
+            expandedCubes.remove(cube)
+    return tuple(expandedCubes)
+
+
+def isSubCube(subCube,cube):
+    """Checks if all literals of subCube are also literals of cube."""
+    return (cube[0] & subCube[0])==subCube[0] and (cube[1] & subCube[0])==subCube[1]
+
+
+def countCubeOperations(cube,cover):
+    """Number of negations and conjunctions for evaluating a cube, where the sub-cube cover (if it is
+    not None) is already available in a local variable."""
+    (careMask,valueMask) = cube
+    if careMask==0 or cube==cover:
+        return 0
+    nofOperands = 0
+    if not cover is None:
+        careMask = careMask & ~cover[0]
+        nofOperands = 1
+    nofOperands += bin(careMask).count("1")
+    return nofOperands-1 + bin(careMask & ~valueMask).count("1")
+
+
+def selectSharedTerms(cubeWeights):
+    """Greedily selects conjunctions to be computed once per step, given how often every cube is
+    evaluated. Candidates are the cubes themselves and the common literals of pairs of cubes. Returns
+    the list of selected conjunctions and, for every cube, the largest selected conjunction that is
+    contained in it (or None)."""
+    cubes = [a for a in cubeWeights if bin(a[0]).count("1")>1]
+    candidates = set(cubes)
+    for i,a in enumerate(cubes):
+        for b in cubes[i+1:]:
+            careMask = a[0] & b[0] & ~(a[1] ^ b[1])
+            if bin(careMask).count("1")>1:
+                candidates.add((careMask,a[1] & careMask))
+    candidates = sorted(candidates)
+    covers = {a:None for a in cubes}
+    selected = []
+    while True:
+        bestBenefit = 0
+        bestCandidate = None
+        for candidate in candidates:
+            benefit = -countCubeOperations(candidate,None)
+            for cube in cubes:
+                if isSubCube(candidate,cube) and (covers[cube] is None or bin(covers[cube][0]).count("1")<bin(candidate[0]).count("1")):
+                    benefit += cubeWeights[cube]*(countCubeOperations(cube,covers[cube])-countCubeOperations(cube,candidate))
+            if benefit>bestBenefit:
+                (bestBenefit,bestCandidate) = (benefit,candidate)
+        if bestCandidate is None:
+            break
+        selected.append(bestCandidate)
+        candidates.remove(bestCandidate)
+        for cube in cubes:
+            if isSubCube(bestCandidate,cube) and (covers[cube] is None or bin(covers[cube][0]).count("1")<bin(bestCandidate[0]).count("1")):
+                covers[cube] = bestCandidate
+    return (selected,covers)
+
+
+def countOperations(cubes,covers):
+    """Number of negations, conjunctions, and disjunctions needed to evaluate a guard, where covers maps
+    cubes to conjunctions already available in local variables."""
+    operations = max(len(cubes)-1,0)
+    for cube in cubes:
+        operations += countCubeOperations(cube,covers.get(cube))
+    return operations
+
+
+class GuardOptimizer:
+    """Translates the guards of an automaton to C code. Gets the list of all guards evaluated in
+    the step function (including repetitions) in advance. If optimize is set, the guards are
+    minimized, and conjunctions and complete guards used more than once are stored in local
+    variables (whose names start with the given prefix). Otherwise, the guards are translated
+    as they are given in the automaton. If bitSliced is set, the AP variables are 32-bit words
+    with one bit per monitor instance, and the guards are translated to bitwise operations. If
+    packedLetter is set, the guards are translated to bitwise operations on the variable "letter", in
+    which bit i is the value of APs[i], and only bit 0 of the value of a guard is meaningful."""
+
+    def __init__(self,automaton,guardUses,optimize=True,prefix="",bitSliced=False,packedLetter=False):
+        self.automaton = automaton
+        self.optimize = optimize
+        self.prefix = prefix
+        self.bitSliced = bitSliced
+        self.packedLetter = packedLetter
+        self.literals = automaton.APs
+        if packedLetter:
+            self.literals = ["letter" if i==0 else "(letter >> "+str(i)+")" for i in range(len(automaton.APs))]
+            (self.cType,self.trueValue,self.notOperator,self.andOperator,self.orOperator) = ("uint32_t","1u","~","&","|")
+        elif bitSliced:
+            (self.cType,self.trueValue,self.notOperator,self.andOperator,self.orOperator) = ("uint32_t","0xFFFFFFFFu","~","&","|")
+        else:
+            (self.cType,self.trueValue,self.notOperator,self.andOperator,self.orOperator) = ("uint8_t","1","!","&&","||")
+        nofAPs = len(automaton.APs)
+        self.operationsBefore = sum([countOperations(guard.cubes,{}) for guard in guardUses])
+        self.minimizedGuards = {}
+        self.sharedGuards = {}
+        self.sharedCubes = {}
+        self.covers = {}
+        self.termCovers = {}
+        if not optimize:
+            self.operationsAfter = self.operationsBefore
+            return
+
+        # Minimize guards, sorted by the letters satisfying them
+        guardUseCounts = {}
+        for guard in guardUses:
+            letterSet = automaton.guardToLetterSet(guard)
+            if not letterSet in self.minimizedGuards:
+                self.minimizedGuards[letterSet] = minimizeGuard(guard.cubes,letterSet,nofAPs)
+                guardUseCounts[letterSet] = 0
+            guardUseCounts[letterSet] += 1
+
+        # Guards that are used more than once and are not just a literal are shared.
+        for (letterSet,cubes) in self.minimizedGuards.items():
+            if guardUseCounts[letterSet]>1 and countOperations(cubes,{})>1:
+                self.sharedGuards[letterSet] = self.prefix+"sharedGuard"+str(len(self.sharedGuards))
+
+        # Select conjunctions to be computed only once
+        cubeWeights = {}
+        for (letterSet,cubes) in self.minimizedGuards.items():
+            nofEvaluations = 1 if letterSet in self.sharedGuards else guardUseCounts[letterSet]
+            for cube in cubes:
+                cubeWeights[cube] = cubeWeights.get(cube,0)+nofEvaluations
+        (selectedTerms,self.covers) = selectSharedTerms(cubeWeights)
+        for cube in sorted(selectedTerms,key=lambda a: bin(a[0]).count("1")):
+            self.sharedCubes[cube] = self.prefix+"sharedTerm"+str(len(self.sharedCubes))
+
+        # Shared conjunctions can in turn use smaller shared conjunctions
+        self.termCovers = {}
+        for cube in self.sharedCubes:
+            for otherCube in self.sharedCubes:
+                if otherCube!=cube and isSubCube(otherCube,cube):
+                    if not cube in self.termCovers or bin(self.termCovers[cube][0]).count("1")<bin(otherCube[0]).count("1"):
+                        self.termCovers[cube] = otherCube
+
+        # Count the operations after optimization
+        self.operationsAfter = sum([countCubeOperations(cube,self.termCovers.get(cube)) for cube in self.sharedCubes])
+        for (letterSet,cubes) in self.minimizedGuards.items():
+            if letterSet in self.sharedGuards:
+                self.operationsAfter += countOperations(cubes,self.covers)
+            else:
+                self.operationsAfter += guardUseCounts[letterSet]*countOperations(cubes,self.covers)
+
+    def sharedOperations(self):
+        """Number of operations of the code from declarationCode, which is executed in every step."""
+        operations = sum([countCubeOperations(cube,self.termCovers.get(cube)) for cube in self.sharedCubes])
+        return operations+sum([countOperations(self.minimizedGuards[letterSet],self.covers) for letterSet in self.sharedGuards])
+
+    def guardOperations(self,guard):
+        """Number of operations for evaluating the expression from guardToC for a guard, in addition to
+        the shared operations."""
+        if guard.isTrue():
+            return 0
+        if not self.optimize:
+            return countOperations(guard.cubes,{})
+        letterSet = self.automaton.guardToLetterSet(guard)
+        if letterSet in self.sharedGuards:
+            return 0
+        return countOperations(self.minimizedGuards[letterSet],self.covers)
+
+    def cubeToC(self,cube,cover=None):
+        """C expression for a cube, using the local variable for the conjunction cover if given."""
+        (careMask,valueMask) = cube
+        if careMask==0:
+            return self.trueValue
+        conjuncts = []
+        if not cover is None:
+            conjuncts.append(self.sharedCubes[cover])
+            careMask = careMask & ~cover[0]
+        for apNum in self.automaton.literalOrder:
+            if careMask & (1 << apNum):
+                if valueMask & (1 << apNum):
+                    conjuncts.append(self.literals[apNum])
+                else:
+                    conjuncts.append(self.notOperator+self.literals[apNum])
+        return self.andOperator.join(conjuncts)
+
+    def cubesToC(self,cubes):
+        disjuncts = [self.cubeToC(cube,self.covers.get(cube)) for cube in cubes]
+        if len(disjuncts)==0:
+            return "0"
+        if len(disjuncts)==1:
+            return disjuncts[0]
+        return self.orOperator.join(["("+a+")" for a in disjuncts])
+
+    def guardToC(self,guard):
+        """C expression for a guard."""
+        if not self.optimize:
+            if self.bitSliced or self.packedLetter:
+                return self.cubesToC(guard.cubes)
+            return self.automaton.guardToC(guard)
+        letterSet = self.automaton.guardToLetterSet(guard)
+        if letterSet in self.sharedGuards:
+            return self.sharedGuards[letterSet]
+        return self.cubesToC(self.minimizedGuards[letterSet])
+
+    def declarationCode(self,indentation):
+        """Code for computing the shared conjunctions and guards, to be put at the start of the step function."""
+        lines = []
+        for (cube,name) in self.sharedCubes.items():
+            lines.append(indentation+self.cType+" "+name+" = "+self.cubeToC(cube,self.termCovers.get(cube))+";\n")
+        for (letterSet,name) in self.sharedGuards.items():
+            lines.append(indentation+self.cType+" "+name+" = "+self.cubesToC(self.minimizedGuards[letterSet])+";\n")
+        return "".join(lines)
+
+    def report(self,name):
+        """Prints the number of guard evaluation operations before and after the optimization."""
+        if self.optimize:
+            print("Guard optimization for "+name+": "+str(self.operationsBefore)+" -> "+str(self.operationsAfter)+" operations, "+str(len(self.sharedCubes))+" shared conjunctions, "+str(len(self.sharedGuards))+" shared guards")
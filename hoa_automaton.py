@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# Parser for the HOA output of SPOT and in-memory representation of the parsed automata, shared
+# by all monitor compilers.
+#
+# As for the rest of the case study, the parser only covers the subset of the HOA format that
+# SPOT produces for our specifications, i.e., explicit transition labels in disjunctive normal form.
+#
+# This file is dual-licensed under licensed under CC BY-SA version 4.0, available at 
+# https://creativecommons.org/licenses/by-sa/4.0/legalcode and the following BSD licence:
+#
+# ------------------------------------------[BSD License Text]---------------------------------------------
+# Copyright 2024 Ruediger Ehlers
+# 
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided 
+# that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this list of conditions and 
+# the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and
+# the following disclaimer in the documentation and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or 
+# promote products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS “AS IS” AND ANY EXPRESS OR IMPLIED 
+# WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A 
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE 
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS 
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, 
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN 
+# IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import os
+
+# =====================================
+# Guards
+# =====================================
+class Guard:
+    """A transition label, stored as a disjunction of cubes. Every cube is a pair (careMask,valueMask)
+    over the AP order of the monitor, i.e., bit i refers to APs[i]. A letter satisfies a cube if
+    (letter & careMask)==valueMask."""
+    __slots__ = ("label","cubes")
+
+    def __init__(self,label,cubes):
+        self.label = label
+        self.cubes = cubes
+
+    def isTrue(self):
+        return (0,0) in self.cubes
+
+    def evaluate(self,letter):
+        for (careMask,valueMask) in self.cubes:
+            if (letter & careMask)==valueMask:
+                return True
+        return False
+
+
+def parseGuard(label,apMapper):
+    """Parses a SPOT label (without the enclosing brackets) such as "!0&1 | 2" into a Guard object."""
+    cubes = []
+    for disjunct in label.split("|"):
+        careMask = 0
+        valueMask = 0
+        for conjunct in disjunct.split("&"):
+            conjunct = conjunct.strip()
+            if conjunct=="t":
+                continue
+            if conjunct=="f":
+                careMask = None
+                break
+            if conjunct[0]=="!":
+                apBit = 1 << apMapper[int(conjunct[1:])]
+                careMask |= apBit
+            else:
+                apBit = 1 << apMapper[int(conjunct)]
+                careMask |= apBit
+                valueMask |= apBit
+        if not careMask is None:
+            cubes.append((careMask,valueMask))
+    return Guard(label,tuple(cubes))
+
+
+# =====================================
+# Automata
+# =====================================
+class Automaton:
+    """Automaton read from a SPOT HOA file. States are numbered 0..nofStates-1, and for every state,
+    the outgoing transitions (transitions[state]) and incoming transitions (reverseTransitions[state])
+    are stored as lists of (other state,Guard) pairs, in the order in which they appear in the HOA file."""
+
+    def __init__(self,APs):
+        self.APs = APs
+        self.nofStates = 0
+        self.startingStates = set([])
+        self.apMapper = {}
+        self.literalOrder = []
+        self.transitions = []
+        self.reverseTransitions = []
+        self.cCodeGuardCache = {}
+        self.letterSetCache = {}
+
+    def findRejectingState(self):
+        """Find the unique state with only a "[t]" self-loop, which is the rejecting state of
+        a universal automaton."""
+        rejectingState = None
+        for state in range(self.nofStates):
+            if len(self.transitions[state])==1:
+                (target,guard) = self.transitions[state][0]
+                if target==state and guard.label=="t":
+                    assert rejectingState is None
+                    rejectingState = state
+        assert not rejectingState is None
+        return rejectingState
+
+    def guardToLetterSet(self,guard):
+        """Computes the set of letters satisfying a guard as a bitmask over all 2^|APs| letters, where
+        letter L has bit i set if APs[i] is true in the letter."""
+        if guard.label in self.letterSetCache:
+            return self.letterSetCache[guard.label]
+        letterSet = 0
+        for letter in range(1 << len(self.APs)):
+            if guard.evaluate(letter):
+                letterSet |= 1 << letter
+        self.letterSetCache[guard.label] = letterSet
+        return letterSet
+
+    def guardToC(self,guard):
+        """Translate a guard to a C expression over the AP variables of the monitor function. Literals
+        are written in the order of the APs in the HOA file, as SPOT does for the labels."""
+        if guard.label in self.cCodeGuardCache:
+            return self.cCodeGuardCache[guard.label]
+        disjuncts = []
+        for (careMask,valueMask) in guard.cubes:
+            if careMask==0:
+                disjuncts.append("1")
+            else:
+                conjuncts = []
+                for apNum in self.literalOrder:
+                    if careMask & (1 << apNum):
+                        if valueMask & (1 << apNum):
+                            conjuncts.append(self.APs[apNum])
+                        else:
+                            conjuncts.append("!"+self.APs[apNum])
+                disjuncts.append("&&".join(conjuncts))
+        if len(disjuncts)==0:
+            result = "0"
+        elif len(disjuncts)==1:
+            result = disjuncts[0]
+        else:
+            result = "||".join(["("+a+")" for a in disjuncts])
+        self.cCodeGuardCache[guard.label] = result
+        return result
+
+
+def parseHOAFile(filename,APs):
+    """Reads a HOA file in a single pass and builds an Automaton object. The APs of the HOA file are
+    mapped to their positions in the list APs, which fixes the AP order of the generated monitors."""
+    automaton = Automaton(APs)
+    guardCache = {}
+    currentTransitionList = None
+    declaredStates = set([])
+    with open(filename,"r") as inFile:
+        for line in inFile:
+            line = line.strip()
+            if line.startswith("["):
+                endOfLabel = line.find("]")
+                label = line[1:endOfLabel]
+                if not label in guardCache:
+                    guardCache[label] = parseGuard(label,automaton.apMapper)
+                destinationState = int(line[endOfLabel+1:].strip().split(" ")[0])
+                currentTransitionList.append((destinationState,guardCache[label]))
+            elif line.startswith("State:"):
+                stateNum = int(line.split(" ")[1])
+                assert not stateNum in declaredStates
+                declaredStates.add(stateNum)
+                while len(automaton.transitions)<=stateNum:
+                    automaton.transitions.append([])
+                currentTransitionList = automaton.transitions[stateNum]
+            elif line.startswith("States: "):
+                automaton.nofStates = int(line.split(" ")[1].strip())
+            elif line.startswith("AP: "):
+                parts = line.split(" ")
+                for i,a in enumerate(parts[2:]):
+                    for j,b in enumerate(APs):
+                        if a=="\""+b+"\"":
+                            automaton.apMapper[i] = j
+                    if not i in automaton.apMapper:
+                        raise Exception("Error: AP list in the script seems to be incorrect.")
+                    automaton.literalOrder.append(automaton.apMapper[i])
+            elif line.startswith("Start:"):
+                automaton.startingStates = set([int(a) for a in line[7:].split(" ")])
+
+    # Precompute the reverse transition relation
+    while len(automaton.transitions)<automaton.nofStates:
+        automaton.transitions.append([])
+    automaton.nofStates = len(automaton.transitions)
+    automaton.reverseTransitions = [[] for a in range(automaton.nofStates)]
+    for (source,transitionList) in enumerate(automaton.transitions):
+        for (target,guard) in transitionList:
+            automaton.reverseTransitions[target].append((source,guard))
+    return automaton
+
+
+# Cache of parsed files, so that multiple compilers working on the same file only need to parse it once
+parsedHOAFiles = {}
+
+def loadHOAFile(filename,APs):
+    """Returns the automaton for a HOA file, parsing it only if it has not been parsed before or the
+    file has changed in the meantime."""
+    fileStatus = os.stat(filename)
+    key = (os.path.abspath(filename),tuple(APs))
+    version = (fileStatus.st_mtime_ns,fileStatus.st_size)
+    if key in parsedHOAFiles and parsedHOAFiles[key][0]==version:
+        return parsedHOAFiles[key][1]
+    automaton = parseHOAFile(filename,APs)
+    parsedHOAFiles[key] = (version,automaton)
+    return automaton
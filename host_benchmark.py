@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# Host-side benchmarking of the generated monitors: The monitors are compiled with the C compiler of
+# the host and run on long traces, so that encodings can be compared without the Nucleo board.
+#
+# This file is dual-licensed under licensed under CC BY-SA version 4.0, available at 
+# https://creativecommons.org/licenses/by-sa/4.0/legalcode and the following BSD licence:
+#
+# ------------------------------------------[BSD License Text]---------------------------------------------
+# Copyright 2024 Ruediger Ehlers
+# 
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided 
+# that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this list of conditions and 
+# the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and
+# the following disclaimer in the documentation and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or 
+# promote products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS “AS IS” AND ANY EXPRESS OR IMPLIED 
+# WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A 
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE 
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS 
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, 
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN 
+# IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import os, random, subprocess, tempfile
+
+# =========================================
+# Settings
+# =========================================
+HOST_C_COMPILER = os.environ.get("CC","cc")
+HOST_C_FLAGS = ["-O2","-w"]
+BENCHMARK_DRIVER = "monitortest/benchmark.c"
+
+
+# =====================================
+# Traces
+# =====================================
+def writeTraceFile(letters,filenameOut):
+    """Writes a trace in the format read by the benchmark driver: one byte per letter, bit i being the
+    value of the i-th atomic proposition."""
+    with open(filenameOut,"wb") as outFile:
+        outFile.write(bytes(letters))
+
+
+def readTraceFile(filename):
+    with open(filename,"rb") as inFile:
+        return list(inFile.read())
+
+
+def generateTrace(automaton,nofSteps,seed):
+    """Generates a random trace that does not violate the specification, given as universal automaton. In
+    every step, the letter is drawn uniformly from the letters that do not lead to the rejecting state.
+    The sets of letters are computed lazily for the sets of active states that are actually visited."""
+    nofLetters = 1 << len(automaton.APs)
+    rejectingState = automaton.findRejectingState()
+    lettersToTarget = [[0 for target in range(automaton.nofStates)] for state in range(automaton.nofStates)]
+    for state in range(automaton.nofStates):
+        for (target,guard) in automaton.transitions[state]:
+            lettersToTarget[state][target] |= automaton.guardToLetterSet(guard)
+
+    successorCache = {}
+    def successorInformation(activeStates):
+        if not activeStates in successorCache:
+            lettersToTargetHere = [0 for target in range(automaton.nofStates)]
+            for state in range(automaton.nofStates):
+                if activeStates & (1 << state):
+                    for target in range(automaton.nofStates):
+                        lettersToTargetHere[target] |= lettersToTarget[state][target]
+            safeLetters = [a for a in range(nofLetters) if not lettersToTargetHere[rejectingState] & (1 << a)]
+            if len(safeLetters)==0:
+                raise Exception("Error: Cannot extend the trace without violating the specification.")
+            successorCache[activeStates] = (safeLetters,lettersToTargetHere,{})
+        return successorCache[activeStates]
+
+    randomGenerator = random.Random(seed)
+    activeStates = sum([1 << a for a in automaton.startingStates])
+    letters = []
+    for step in range(nofSteps):
+        (safeLetters,lettersToTargetHere,nextStates) = successorInformation(activeStates)
+        letter = randomGenerator.choice(safeLetters)
+        if not letter in nextStates:
+            nextStates[letter] = sum([1 << target for target in range(automaton.nofStates) if lettersToTargetHere[target] & (1 << letter)])
+        activeStates = nextStates[letter]
+        letters.append(letter)
+    return letters
+
+
+# =====================================
+# Benchmarking
+# =====================================
+def benchmarkMonitor(monitorFilename,traceFilename,nofRepetitions):
+    """Compiles a monitor together with the benchmark driver and runs it on a trace nofRepetitions times.
+    Returns a dictionary with the mean time per step in nanoseconds, the variance of the time per step
+    over the repetitions, the number of steps per second, and the number of reported violations."""
+    with tempfile.TemporaryDirectory() as temporaryDirectory:
+        executable = os.path.join(temporaryDirectory,"benchmark")
+        subprocess.check_call([HOST_C_COMPILER]+HOST_C_FLAGS+[BENCHMARK_DRIVER,monitorFilename,"-o",executable])
+        output = subprocess.check_output([executable,traceFilename,str(nofRepetitions)]).decode("utf-8")
+    nanoseconds = []
+    nofSteps = None
+    nofViolations = None
+    for line in output.split("\n"):
+        if line.startswith("#Nanoseconds:"):
+            nanoseconds.append(int(line.split(" ")[1]))
+        elif line.startswith("#Steps:"):
+            nofSteps = int(line.split(" ")[1])
+        elif line.startswith("#Violations:"):
+            nofViolations = int(line.split(" ")[1])
+    if nofSteps is None or nofSteps==0 or len(nanoseconds)==0:
+        raise Exception("Error: The benchmark of "+monitorFilename+" did not produce any measurements.")
+    nanosecondsPerStep = [a/nofSteps for a in nanoseconds]
+    mean = sum(nanosecondsPerStep)/len(nanosecondsPerStep)
+    variance = sum([(a-mean)**2 for a in nanosecondsPerStep])/len(nanosecondsPerStep)
+    return {"nsPerStep":mean,"variance":variance,"stepsPerSecond":1e9/mean if mean>0 else float("inf"),"violations":nofViolations}
+
+
+def writeEmptyMonitor(APs,filenameOut):
+    """Monitor that does nothing, for measuring the overhead of the benchmark driver."""
+    with open(filenameOut,"w") as outFile:
+        outFile.write("#include <stdint.h>\n")
+        outFile.write("int monitor("+",".join(["uint8_t "+a for a in APs])+") {\n")
+        outFile.write("  return 0;\n")
+        outFile.write("}\n")
@@ -0,0 +1,1349 @@
+#!/usr/bin/env python3
+# Monitor compilers translating automata computed by SPOT into C code for the runtime monitors
+# evaluated in the paper published at the TAP 2024 conference.
+#
+# All compilers work on the Automaton objects from hoa_automaton.py, so that an automaton is only 
+# parsed once, even if multiple encodings are generated from it.
+#
+# This file is dual-licensed under licensed under CC BY-SA version 4.0, available at 
+# https://creativecommons.org/licenses/by-sa/4.0/legalcode and the following BSD licence:
+#
+# ------------------------------------------[BSD License Text]---------------------------------------------
+# Copyright 2024 Ruediger Ehlers
+# 
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided 
+# that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this list of conditions and 
+# the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and
+# the following disclaimer in the documentation and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or 
+# promote products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS “AS IS” AND ANY EXPRESS OR IMPLIED 
+# WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A 
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE 
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS 
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, 
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN 
+# IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import multiprocessing
+import re
+from hoa_automaton import loadHOAFile
+from automaton_optimization import optimizeAutomaton
+from guard_optimization import GuardOptimizer
+from spot_translation import translateLTL
+
+# =====================================
+# Helper functions
+# =====================================
+def smallestUnsignedCType(maxValue):
+    """Narrowest unsigned C integer type that can store all values from 0 to maxValue."""
+    for (bits,cType) in [(8,"uint8_t"),(16,"uint16_t"),(32,"uint32_t"),(64,"uint64_t")]:
+        if maxValue < (1 << bits):
+            return cType
+    raise Exception("Error: Value range too large for a C integer type: "+str(maxValue))
+
+def letterConstructionCode(APs):
+    """C expression packing the AP values of the monitor function into a letter, in which bit i
+    represents the value of APs[i]."""
+    return "("+"+".join(["("+a+">0?"+str(1 << i)+":0)" for i,a in enumerate(APs)])+")"
+
+def cArrayInitializer(rows):
+    """Builds the initializer of a constant array (without braces). Rows of two-dimensional arrays are
+    written one per line, and one-dimensional arrays are written with 16 values per line."""
+    if len(rows)>0 and not isinstance(rows[0],list):
+        rows = [rows[i:i+16] for i in range(0,len(rows),16)]
+        lines = ["  "+",".join([str(a) for a in row]) for row in rows]
+    else:
+        lines = ["  {"+",".join([str(a) for a in row])+"}" for row in rows]
+    return ",\n".join(lines)+"\n"
+
+def writeCArrayRows(outFile,rows):
+    outFile.write(cArrayInitializer(rows))
+
+def batchEntryPointsCode(APs,loadCode,stepCode,storeCode,contextType=None,defaultContext=None):
+    """C code of the entry points for packed letters, in which bit i represents the value of APs[i]:
+    monitor_letter() performs a single monitor step, and monitor_run() processes a buffer of n letters
+    and returns the index of the first letter for which a violation is reported (or n if there is none).
+    monitor_run() works on local copies of the monitor state, so that they can be kept in registers:
+    loadCode copies the state into local variables, stepCode processes one letter (given in the variable
+    "letter" as well as in the AP variables) and executes "break" on a violation, and storeCode copies the
+    state back. Only the AP variables that stepCode uses are declared, so that compilers do not warn
+    about unused variables. For monitors whose state is stored in a struct of type contextType, the loop
+    is emitted as monitor_run_ctx(), which takes the context as first parameter "ctx", and monitor_run()
+    runs it on defaultContext."""
+    usedAPs = [(i,a) for (i,a) in enumerate(APs) if re.search(r"\b"+re.escape(a)+r"\b",stepCode)]
+    code = ["\n/* Entry points for packed letters, in which bit i represents the value of the i-th proposition */\n"]
+    code.append("#include <stddef.h>\n")
+    code.append("int monitor_letter(uint32_t letter) {\n")
+    code.append("  return monitor("+",".join(["(letter >> "+str(i)+") & 1" for i in range(len(APs))])+");\n")
+    code.append("}\n\n")
+    if contextType is None:
+        code.append("size_t monitor_run(const uint8_t *letters, size_t n) {\n")
+    else:
+        code.append("size_t monitor_run_ctx("+contextType+" *ctx, const uint8_t *letters, size_t n) {\n")
+    code.append(loadCode)
+    code.append("  size_t position;\n")
+    code.append("  for (position=0;position<n;position++) {\n")
+    if len(usedAPs)>0 or re.search(r"\bletter\b",stepCode):
+        code.append("    uint32_t letter = letters[position];\n")
+    for i,a in usedAPs:
+        code.append("    uint8_t "+a+" = (letter >> "+str(i)+") & 1;\n")
+    code.append(stepCode)
+    code.append("  }\n")
+    code.append(storeCode)
+    code.append("  return position;\n")
+    code.append("}\n")
+    if not contextType is None:
+        code.append("\nsize_t monitor_run(const uint8_t *letters, size_t n) {\n")
+        code.append("  return monitor_run_ctx(&"+defaultContext+",letters,n);\n")
+        code.append("}\n")
+    return "".join(code)
+
+def stateSetStepCode(automaton,guards,indentation):
+    """Code of a step of the monitors with one variable per state, working on local copies state<i> of
+    the state variables."""
+    nofStates = automaton.nofStates
+    stepCode = [guards.declarationCode(indentation)]
+    for i in range(nofStates):
+        stepCode.append(indentation+"uint8_t nextState"+str(i)+" = 0;\n")
+    for state in range(nofStates):
+        stepCode.append(indentation+"if (state"+str(state)+") {\n")
+        for (target,guard) in automaton.transitions[state]:
+            stepCode.append(indentation+"  if ("+guards.guardToC(guard)+") nextState"+str(target)+" = 1;\n")
+        stepCode.append(indentation+"}\n")
+    for i in range(nofStates):
+        stepCode.append(indentation+"state"+str(i)+" = nextState"+str(i)+";\n")
+    return "".join(stepCode)
+
+def stateSetBatchEntryPointsCode(automaton,guards,violationCondition,statePrefix="inState",contextType=None,defaultContext=None):
+    """Entry points for packed letters for the monitors with one variable <statePrefix><i> per state.
+    The violationCondition is a C expression over the local copies state<i> of these variables. The
+    contextType and defaultContext are passed to batchEntryPointsCode for monitors with contexts."""
+    nofStates = automaton.nofStates
+    loadCode = "".join(["  uint8_t state"+str(i)+" = "+statePrefix+str(i)+";\n" for i in range(nofStates)])
+    stepCode = stateSetStepCode(automaton,guards,"    ")+"    if ("+violationCondition+") break;\n"
+    storeCode = "".join(["  "+statePrefix+str(i)+" = state"+str(i)+";\n" for i in range(nofStates)])
+    return batchEntryPointsCode(automaton.APs,loadCode,stepCode,storeCode,contextType,defaultContext)
+
+
+# =====================================
+# Simple monitor compilers
+# =====================================
+def monitorCompilerNondeterministic(automaton,filenameOut,optimizeGuards=False,packStates=False):
+    if packStates:
+        return writePackedStateSetMonitor(automaton,filenameOut,"!("+packedAnyFlagCode(0,automaton.nofStates)+")",optimizeGuards)
+    APs = automaton.APs
+    nofStates = automaton.nofStates
+    guards = GuardOptimizer(automaton,[guard for transitionList in automaton.transitions for (target,guard) in transitionList],optimizeGuards)
+    with open(filenameOut,"w") as outFile:
+        outFile.write("/* Temporal Logic Runtime Monitor Code */\n")
+        outFile.write("#include <stdint.h>\n")
+
+        # Build state information
+        outFile.write("/* State storage information */\n")
+        for i in range(0,nofStates):
+            if i in automaton.startingStates:
+                outFile.write("uint8_t inState"+str(i)+" = 1;\n")
+            else:
+                outFile.write("uint8_t inState"+str(i)+" = 0;\n")
+
+        # Build transition function
+        outFile.write("\n/* Monitor step/update function */\n")
+        outFile.write("int monitor("+",".join(["uint8_t "+a for a in APs])+") {\n")
+        outFile.write(guards.declarationCode("  "))
+        for i in range(0,nofStates):
+            outFile.write("  uint8_t nextState"+str(i)+" = 0;\n")
+        for state in range(nofStates):
+            outFile.write("  if (inState"+str(state)+"){\n")
+            for (target,guard) in automaton.transitions[state]:
+                outFile.write("    if ("+guards.guardToC(guard)+") nextState"+str(target)+" = 1;\n")
+            outFile.write("  }\n")
+        for i in range(0,nofStates):
+            outFile.write("  inState"+str(i)+" = nextState"+str(i)+";\n")
+        for i in range(0,nofStates):
+            outFile.write("  if (inState"+str(i)+") return 0;\n")
+        outFile.write("  return 1; /* Reporting a violation. */\n")
+        outFile.write("}\n")
+        outFile.write(stateSetBatchEntryPointsCode(automaton,guards,"!("+"||".join(["state"+str(i) for i in range(nofStates)])+")"))
+    guards.report(filenameOut)
+    return guards
+
+
+def monitorCompilerUniversal(automaton,filenameOut,optimizeGuards=False,packStates=False):
+    if packStates:
+        return writePackedStateSetMonitor(automaton,filenameOut,packedFlagCode(automaton.findRejectingState()),optimizeGuards)
+    APs = automaton.APs
+    nofStates = automaton.nofStates
+    guards = GuardOptimizer(automaton,[guard for transitionList in automaton.transitions for (target,guard) in transitionList],optimizeGuards)
+    with open(filenameOut,"w") as outFile:
+        outFile.write("/* Temporal Logic Runtime Monitor Code */\n")
+        outFile.write("#include <stdint.h>\n")
+
+        # Find rejecting state
+        rejectingState = automaton.findRejectingState()
+
+        # Build state information
+        outFile.write("/* State storage information */\n")
+        for i in range(0,nofStates):
+            if i in automaton.startingStates:
+                outFile.write("uint8_t inState"+str(i)+" = 1;\n")
+            else:
+                outFile.write("uint8_t inState"+str(i)+" = 0;\n")
+
+        # Build transition function
+        outFile.write("\n/* Monitor step/update function */\n")
+        outFile.write("int monitor("+",".join(["uint8_t "+a for a in APs])+") {\n")
+        outFile.write(guards.declarationCode("  "))
+        for i in range(0,nofStates):
+            outFile.write("  uint8_t nextState"+str(i)+" = 0;\n")
+        for state in range(nofStates):
+            outFile.write("  if (inState"+str(state)+"){\n")
+            for (target,guard) in automaton.transitions[state]:
+                outFile.write("    if ("+guards.guardToC(guard)+") nextState"+str(target)+" = 1;\n")
+            outFile.write("  }\n")
+        for i in range(0,nofStates):
+            outFile.write("  inState"+str(i)+" = nextState"+str(i)+";\n")
+        outFile.write("  return inState"+str(rejectingState)+";\n")
+        outFile.write("}\n")
+        outFile.write(stateSetBatchEntryPointsCode(automaton,guards,"state"+str(rejectingState)))
+    guards.report(filenameOut)
+    return guards
+
+
+def monitorCompilerDeterministic(automaton,filenameOut,optimizeGuards=False):
+    APs = automaton.APs
+    nofStates = automaton.nofStates
+    guards = GuardOptimizer(automaton,[guard for transitionList in automaton.transitions for (target,guard) in transitionList],optimizeGuards)
+    with open(filenameOut,"w") as outFile:
+        outFile.write("/* Temporal Logic Runtime Monitor Code */\n")
+        outFile.write("#include <stdint.h>\n")
+
+        # Build state information
+        outFile.write("/* State storage information */\n")
+        assert len(automaton.startingStates)==1
+        for a in automaton.startingStates:
+            outFile.write("uint32_t monitorState = "+str(a)+";\n")
+
+        # Build transition function
+        outFile.write("\n/* Monitor step/update function */\n")
+        outFile.write("int monitor("+",".join(["uint8_t "+a for a in APs])+") {\n")
+        outFile.write(guards.declarationCode("  "))
+        for state in range(nofStates):
+            outFile.write("  if (monitorState=="+str(state)+") {\n")
+            for (target,guard) in automaton.transitions[state]:
+                outFile.write("    if ("+guards.guardToC(guard)+") { monitorState="+str(target)+"; return 0;")
+                outFile.write("}\n")
+            outFile.write("  }\n")
+        outFile.write("  return 1; /* Fall through. */\n")
+        outFile.write("}\n")
+
+        # Build entry points for packed letters
+        stepCode = [guards.declarationCode("    ")]
+        for state in range(nofStates):
+            stepCode.append("    if (state=="+str(state)+") {\n")
+            for (target,guard) in automaton.transitions[state]:
+                stepCode.append("      if ("+guards.guardToC(guard)+") { state="+str(target)+"; continue; }\n")
+            stepCode.append("    }\n")
+        stepCode.append("    break; /* Fall through. */\n")
+        outFile.write(batchEntryPointsCode(APs,"  uint32_t state = monitorState;\n","".join(stepCode),"  monitorState = state;\n"))
+    guards.report(filenameOut)
+    return guards
+
+
+# =====================================
+# Bit-packed state storage
+# =====================================
+def packedFlagCode(bit):
+    """C expression for the value (0 or 1) of the given bit of the bit array stateFlags."""
+    return "((stateFlags["+str(bit//8)+"] >> "+str(bit%8)+") & 1)"
+
+def packedByteMasks(firstBit,nofBits):
+    """List of the (byte,mask) pairs of the bytes of stateFlags that contain the bits firstBit to
+    firstBit+nofBits-1, where the masks select these bits."""
+    byteMasks = []
+    for byte in range(firstBit//8,(firstBit+nofBits+7)//8):
+        mask = 0
+        for bit in range(8):
+            if firstBit <= byte*8+bit < firstBit+nofBits:
+                mask |= 1 << bit
+        byteMasks.append((byte,mask))
+    return byteMasks
+
+def packedAnyFlagCode(firstBit,nofBits):
+    """C expression that is nonzero if and only if one of the bits firstBit to firstBit+nofBits-1 of the
+    bit array stateFlags is set."""
+    return "||".join(["stateFlags["+str(byte)+"]" if mask==255 else "(stateFlags["+str(byte)+"] & "+str(mask)+")" for (byte,mask) in packedByteMasks(firstBit,nofBits)])
+
+def packedStateDeclarationCode(initialFlags):
+    """Declaration of the bit array stateFlags, where bit i (bit i%8 of byte i//8) has the initial value
+    initialFlags[i]."""
+    initialBytes = [sum([1 << bit for bit in range(8) if byte*8+bit < len(initialFlags) and initialFlags[byte*8+bit]]) for byte in range((len(initialFlags)+7)//8)]
+    return "uint8_t stateFlags["+str(len(initialBytes))+"] = {\n"+cArrayInitializer(initialBytes)+"};\n"
+
+def computeInPlaceUpdateOrder(automaton):
+    """Computes an order of the states in which every state comes before all of its predecessors (other
+    than itself), or returns None if there is no such order, i.e., if the automaton is not very weak.
+    When the state flags are updated in this order, the flags of the predecessors of a state still have
+    their old values when the state is updated, so that no successor state variables are needed."""
+    nofSuccessors = [len([a for (a,b) in automaton.transitions[state] if a!=state]) for state in range(automaton.nofStates)]
+    order = [a for a in range(automaton.nofStates) if nofSuccessors[a]==0]
+    for thisOne in order:
+        for (source,guard) in automaton.reverseTransitions[thisOne]:
+            if source!=thisOne:
+                nofSuccessors[source] -= 1
+                if nofSuccessors[source]==0:
+                    order.append(source)
+    if len(order)<automaton.nofStates:
+        return None
+    return order
+
+def packedTemporaryBytes(automaton,firstBit,eventDriven=False):
+    """Number of bytes of local variables that the code from packedStateUpdateCode (and the check whether
+    the flags have changed in event-driven fragments) needs for the given automaton."""
+    nofBytes = len(packedByteMasks(firstBit,automaton.nofStates))
+    return (0 if computeInPlaceUpdateOrder(automaton) is not None else nofBytes)+(nofBytes if eventDriven else 0)
+
+def packedStateUpdateCode(automaton,guards,firstBit,prefix,indentation):
+    """Code updating the flags of the states of an automaton, where state i is stored in bit firstBit+i
+    of the bit array stateFlags. If the automaton is very weak, the flags are updated in place in the
+    order computed by computeInPlaceUpdateOrder, as in monitorCompilerUniversalWithReasonTracking.
+    Otherwise, the successor states are collected in the local array <prefix>nextStates, which covers the
+    same bytes as the flags of the automaton in stateFlags, and then merged into stateFlags."""
+    updateOrder = computeInPlaceUpdateOrder(automaton)
+    code = []
+    if updateOrder is not None:
+        for state in updateOrder:
+            terms = []
+            for (source,guard) in automaton.reverseTransitions[state]:
+                if guard.isTrue():
+                    terms.append(packedFlagCode(firstBit+source))
+                else:
+                    terms.append("("+packedFlagCode(firstBit+source)+" && ("+guards.guardToC(guard)+"))")
+            (byte,bit) = divmod(firstBit+state,8)
+            clearCode = "stateFlags["+str(byte)+"] &= "+str(255-(1 << bit))+";"
+            if len(terms)==0:
+                code.append(indentation+clearCode+"\n")
+            else:
+                code.append(indentation+"if ("+" || ".join(terms)+") stateFlags["+str(byte)+"] |= "+str(1 << bit)+"; else "+clearCode+"\n")
+        return "".join(code)
+
+    byteMasks = packedByteMasks(firstBit,automaton.nofStates)
+    firstByte = byteMasks[0][0]
+    code.append(indentation+"uint8_t "+prefix+"nextStates["+str(len(byteMasks))+"] = {0};\n")
+    for state in range(automaton.nofStates):
+        code.append(indentation+"if ("+packedFlagCode(firstBit+state)+") {\n")
+        for (target,guard) in automaton.transitions[state]:
+            (byte,bit) = divmod(firstBit+target,8)
+            code.append(indentation+"  if ("+guards.guardToC(guard)+") "+prefix+"nextStates["+str(byte-firstByte)+"] |= "+str(1 << bit)+";\n")
+        code.append(indentation+"}\n")
+    for (byte,mask) in byteMasks:
+        if mask==255:
+            code.append(indentation+"stateFlags["+str(byte)+"] = "+prefix+"nextStates["+str(byte-firstByte)+"];\n")
+        else:
+            code.append(indentation+"stateFlags["+str(byte)+"] = (stateFlags["+str(byte)+"] & "+str(255-mask)+") | "+prefix+"nextStates["+str(byte-firstByte)+"];\n")
+    return "".join(code)
+
+def reportPackedStateStorage(name,nofFlags,nofTemporaryBytes):
+    """Prints the RAM needed for the state flags of a monitor with bit-packed state storage, compared to
+    one byte per state flag and one byte per successor state variable."""
+    print("Packed state storage for "+name+": "+str(nofFlags)+" state flags in "+str((nofFlags+7)//8)+" bytes, "+str(nofTemporaryBytes)+" bytes of local variables (unpacked: "+str(nofFlags)+" bytes, "+str(nofFlags)+" bytes of local variables)")
+
+
+def writePackedStateSetMonitor(automaton,filenameOut,violationCondition,optimizeGuards=False):
+    """Writes a monitor that stores the set of active states in the bit array stateFlags, one bit per
+    state, and updates it with the code from packedStateUpdateCode. The violationCondition is a C
+    expression over stateFlags. As the state is not copied to local variables, monitor_run() works on
+    stateFlags directly. Returns the GuardOptimizer used for the guards."""
+    APs = automaton.APs
+    nofStates = automaton.nofStates
+    guards = GuardOptimizer(automaton,[guard for transitionList in automaton.transitions for (target,guard) in transitionList],optimizeGuards)
+    with open(filenameOut,"w") as outFile:
+        outFile.write("/* Temporal Logic Runtime Monitor Code */\n")
+        outFile.write("#include <stdint.h>\n")
+
+        # Build state information
+        outFile.write("/* State storage information: state i is stored in bit i%8 of stateFlags[i/8] */\n")
+        outFile.write(packedStateDeclarationCode([i in automaton.startingStates for i in range(nofStates)]))
+
+        # Build transition function
+        outFile.write("\n/* Monitor step/update function */\n")
+        outFile.write("int monitor("+",".join(["uint8_t "+a for a in APs])+") {\n")
+        outFile.write(guards.declarationCode("  "))
+        outFile.write(packedStateUpdateCode(automaton,guards,0,"","  "))
+        outFile.write("  return "+violationCondition+";\n")
+        outFile.write("}\n")
+
+        stepCode = guards.declarationCode("    ")+packedStateUpdateCode(automaton,guards,0,"","    ")+"    if ("+violationCondition+") break;\n"
+        outFile.write(batchEntryPointsCode(APs,"",stepCode,""))
+    guards.report(filenameOut)
+    reportPackedStateStorage(filenameOut,nofStates,packedTemporaryBytes(automaton,0))
+    return guards
+
+
+# =====================================
+# Branchless monitor compilers
+# =====================================
+def branchlessSuccessorCode(automaton,guards,stateVariable,indentation):
+    """Code computing the successor states nextState<i> without branches. Every successor state is the
+    disjunction over its incoming transitions of the source state variable (with the name stateVariable<i>)
+    masked with the guard. As the state variables are 0 or 1, only bit 0 of the value of a guard matters."""
+    incoming = [[] for a in range(automaton.nofStates)]
+    for state in range(automaton.nofStates):
+        for (target,guard) in automaton.transitions[state]:
+            incoming[target].append((state,guard))
+    code = []
+    for state in range(automaton.nofStates):
+        terms = []
+        for (source,guard) in incoming[state]:
+            if guard.isTrue():
+                terms.append(stateVariable+str(source))
+            else:
+                terms.append("("+stateVariable+str(source)+" & ("+guards.guardToC(guard)+"))")
+        code.append(indentation+"uint8_t nextState"+str(state)+" = (uint8_t)("+("|".join(terms) if len(terms)>0 else "0")+");\n")
+    return "".join(code)
+
+
+def writeBranchlessMonitor(automaton,filenameOut,violationCondition,optimizeGuards=False):
+    """Writes a monitor with one variable per state whose step function does not contain branches, so that
+    its computation time does not depend on the states and the letter. The guards are evaluated with
+    bitwise operations on the packed letter, and the successor states are computed as in
+    branchlessSuccessorCode. The violationCondition is a function mapping the name prefix of the state
+    variables to a C expression that is 1 for a violation and 0 otherwise. Returns the GuardOptimizer
+    used for the guards."""
+    APs = automaton.APs
+    nofStates = automaton.nofStates
+    guards = GuardOptimizer(automaton,[guard for transitionList in automaton.transitions for (target,guard) in transitionList],optimizeGuards,"",False,True)
+    with open(filenameOut,"w") as outFile:
+        outFile.write("/* Temporal Logic Runtime Monitor Code */\n")
+        outFile.write("#include <stdint.h>\n")
+
+        # Build state information
+        outFile.write("/* State storage information */\n")
+        for i in range(0,nofStates):
+            if i in automaton.startingStates:
+                outFile.write("uint8_t inState"+str(i)+" = 1;\n")
+            else:
+                outFile.write("uint8_t inState"+str(i)+" = 0;\n")
+
+        # Build transition function
+        outFile.write("\n/* Monitor step/update function */\n")
+        outFile.write("int monitor("+",".join(["uint8_t "+a for a in APs])+") {\n")
+        outFile.write("  uint32_t letter = "+letterConstructionCode(APs)+";\n")
+        outFile.write(guards.declarationCode("  "))
+        outFile.write(branchlessSuccessorCode(automaton,guards,"inState","  "))
+        for i in range(0,nofStates):
+            outFile.write("  inState"+str(i)+" = nextState"+str(i)+";\n")
+        outFile.write("  return "+violationCondition("inState")+";\n")
+        outFile.write("}\n")
+
+        # Build entry points for packed letters. Only the loop exit on a violation is a branch.
+        loadCode = "".join(["  uint8_t state"+str(i)+" = inState"+str(i)+";\n" for i in range(nofStates)])
+        stepCode = [guards.declarationCode("    ")]
+        stepCode.append(branchlessSuccessorCode(automaton,guards,"state","    "))
+        for i in range(0,nofStates):
+            stepCode.append("    state"+str(i)+" = nextState"+str(i)+";\n")
+        stepCode.append("    if ("+violationCondition("state")+") break;\n")
+        storeCode = "".join(["  inState"+str(i)+" = state"+str(i)+";\n" for i in range(nofStates)])
+        outFile.write(batchEntryPointsCode(APs,loadCode,"".join(stepCode),storeCode))
+    guards.report(filenameOut)
+    return guards
+
+
+def monitorCompilerNondeterministicBranchless(automaton,filenameOut,optimizeGuards=False):
+    return writeBranchlessMonitor(automaton,filenameOut,lambda stateVariable: "1^("+"|".join([stateVariable+str(i) for i in range(automaton.nofStates)])+")",optimizeGuards)
+
+
+def monitorCompilerUniversalBranchless(automaton,filenameOut,optimizeGuards=False):
+    rejectingState = automaton.findRejectingState()
+    return writeBranchlessMonitor(automaton,filenameOut,lambda stateVariable: stateVariable+str(rejectingState),optimizeGuards)
+
+
+def monitorCompilerDeterministicBranchless(automaton,filenameOut,optimizeGuards=False):
+    """Compiles a deterministic automaton to a branchless monitor. Instead of comparing a state number with
+    all states, the state is stored in one variable per state, of which at most one is 1."""
+    assert len(automaton.startingStates)==1
+    return monitorCompilerNondeterministicBranchless(automaton,filenameOut,optimizeGuards)
+
+
+# =====================================
+# Table-driven monitor compilers
+# =====================================
+def computeDeterministicTransitionTable(automaton):
+    """For a deterministic automaton, computes for every state and letter the successor state. The
+    additional state automaton.nofStates is used as sink for letters without a transition (which
+    represent a violation of the specification). Then, letters that lead to the same successors
+    from all states are merged to letter classes. Returns the letter class for each letter and the
+    transition table as a list of rows, one per state, indexed by the letter class."""
+    nofLetters = 1 << len(automaton.APs)
+    violationState = automaton.nofStates
+    successors = []
+    for state in range(automaton.nofStates):
+        row = [violationState for a in range(nofLetters)]
+        coveredLetters = 0
+        for (target,guard) in automaton.transitions[state]:
+            letterSet = automaton.guardToLetterSet(guard)
+            if letterSet & coveredLetters:
+                raise Exception("Error: The automaton is not deterministic (state "+str(state)+").")
+            coveredLetters |= letterSet
+            for letter in range(nofLetters):
+                if letterSet & (1 << letter):
+                    row[letter] = target
+        successors.append(row)
+    successors.append([violationState for a in range(nofLetters)])
+
+    # Alphabet compression
+    letterClassesBySignature = {}
+    letterClasses = []
+    for letter in range(nofLetters):
+        signature = tuple([row[letter] for row in successors])
+        if not signature in letterClassesBySignature:
+            letterClassesBySignature[signature] = len(letterClassesBySignature)
+        letterClasses.append(letterClassesBySignature[signature])
+    classRepresentatives = [None for a in letterClassesBySignature]
+    for letter in range(nofLetters):
+        if classRepresentatives[letterClasses[letter]] is None:
+            classRepresentatives[letterClasses[letter]] = letter
+    transitionTable = [[row[letter] for letter in classRepresentatives] for row in successors]
+    return (letterClasses,transitionTable)
+
+
+def monitorCompilerDeterministicTable(automaton,filenameOut):
+    """Compiles a deterministic automaton to a monitor that looks up the successor state in a constant
+    (and hence flash-resident) transition table, so that a monitor step takes constant time. In
+    contrast to monitorCompilerDeterministic, a violation is sticky, i.e., after a violation, the
+    monitor keeps reporting it."""
+    APs = automaton.APs
+    assert len(automaton.startingStates)==1
+    (letterClasses,transitionTable) = computeDeterministicTransitionTable(automaton)
+    nofClasses = len(transitionTable[0])
+    violationState = automaton.nofStates
+    stateType = smallestUnsignedCType(violationState)
+    with open(filenameOut,"w") as outFile:
+        outFile.write("/* Temporal Logic Runtime Monitor Code */\n")
+        outFile.write("#include <stdint.h>\n")
+
+        # Build tables
+        outFile.write("/* Letter class for each letter */\n")
+        outFile.write("const "+smallestUnsignedCType(nofClasses-1)+" letterClasses["+str(len(letterClasses))+"] = {\n")
+        writeCArrayRows(outFile,letterClasses)
+        outFile.write("};\n")
+        outFile.write("/* Transition table: successor state for each state and letter class. State "+str(violationState)+" represents a violation. */\n")
+        outFile.write("const "+stateType+" transitionTable["+str(violationState+1)+"]["+str(nofClasses)+"] = {\n")
+        writeCArrayRows(outFile,transitionTable)
+        outFile.write("};\n")
+
+        # Build state information
+        outFile.write("/* State storage information */\n")
+        for a in automaton.startingStates:
+            outFile.write(stateType+" monitorState = "+str(a)+";\n")
+
+        # Build transition function
+        outFile.write("\n/* Monitor step/update function */\n")
+        outFile.write("int monitor("+",".join(["uint8_t "+a for a in APs])+") {\n")
+        outFile.write("  monitorState = transitionTable[monitorState][letterClasses["+letterConstructionCode(APs)+"]];\n")
+        outFile.write("  return monitorState=="+str(violationState)+";\n")
+        outFile.write("}\n")
+        stepCode = "    state = transitionTable[state][letterClasses[letter]];\n    if (state=="+str(violationState)+") break;\n"
+        outFile.write(batchEntryPointsCode(APs,"  "+stateType+" state = monitorState;\n",stepCode,"  monitorState = state;\n"))
+
+
+# =====================================
+# Bit-parallel monitor compilers
+# =====================================
+def computeBitParallelUpdates(automaton,states):
+    """Groups the transitions from the given source states by their guard and by the difference between
+    target and source state number. All transitions of a group can be executed at once for a state vector stored
+    in 32-bit words by masking the source states, shifting, and masking with the guard. Returns a list
+    of (guard,sourceWord,targetWord,sourceMask,shift) tuples, where a positive shift is a shift to the
+    left and a negative shift is a shift to the right."""
+    groups = {}
+    for state in states:
+        for (target,guard) in automaton.transitions[state]:
+            key = (guard.label,target-state)
+            if not key in groups:
+                groups[key] = (guard,0)
+            groups[key] = (guard,groups[key][1] | (1 << state))
+
+    updates = []
+    nofWords = (automaton.nofStates+31)//32
+    for ((label,offset),(guard,sourceMask)) in groups.items():
+        (wordOffset,bitOffset) = divmod(offset,32)
+        for sourceWord in range(nofWords):
+            wordMask = (sourceMask >> (32*sourceWord)) & 0xFFFFFFFF
+            lowBits = wordMask & ((1 << (32-bitOffset))-1)
+            highBits = wordMask & ~lowBits
+            if lowBits!=0:
+                updates.append((guard,sourceWord,sourceWord+wordOffset,lowBits,bitOffset))
+            if highBits!=0:
+                updates.append((guard,sourceWord,sourceWord+wordOffset+1,highBits,bitOffset-32))
+    return updates
+
+
+def computeBitParallelGuards(updates):
+    """The distinct guards (other than true) of the given bit-parallel updates, in the order in which they
+    are first used. Each of them is evaluated once per step."""
+    evaluatedGuards = {}
+    for (guard,sourceWord,targetWord,sourceMask,shift) in updates:
+        if not guard.isTrue() and not guard.label in evaluatedGuards:
+            evaluatedGuards[guard.label] = guard
+    return list(evaluatedGuards.values())
+
+
+def computeGuardEvaluationCost(automaton,state):
+    """Number of literals and disjunctions that need to be evaluated for the outgoing transitions
+    of a state."""
+    cost = 0
+    for (target,guard) in automaton.transitions[state]:
+        if not guard.isTrue():
+            cost += len(guard.cubes)
+            for (careMask,valueMask) in guard.cubes:
+                cost += bin(careMask).count("1")
+    return cost
+
+
+def computeSuccessorLookupTables(automaton,flashBudget):
+    """Computes, for source states, lookup tables mapping every letter to the set of successor states,
+    as far as they fit into the given flash budget (in bytes). States with more expensive guards are
+    preferred. If all successors of a state are in the same 32-bit word of the state vector, the
+    table stores the successor bits shifted to the lowest successor in the narrowest possible data
+    type. Returns a dictionary mapping states to (entry type,first target word,shift,table rows)."""
+    nofLetters = 1 << len(automaton.APs)
+    candidates = []
+    for state in range(automaton.nofStates):
+        cost = computeGuardEvaluationCost(automaton,state)
+        if cost>0:
+            targets = [target for (target,guard) in automaton.transitions[state]]
+            firstWord = min(targets)//32
+            lastWord = max(targets)//32
+            if firstWord==lastWord:
+                shift = min(targets)%32
+                entryType = smallestUnsignedCType((1 << (max(targets)%32-shift+1))-1)
+                tableSize = nofLetters*int(entryType[4:-2])//8
+            else:
+                shift = 0
+                entryType = "uint32_t"
+                tableSize = nofLetters*4*(lastWord-firstWord+1)
+            candidates.append((-cost/tableSize,state,entryType,firstWord,lastWord,shift,tableSize))
+    candidates.sort()
+
+    tables = {}
+    for (ratio,state,entryType,firstWord,lastWord,shift,tableSize) in candidates:
+        if tableSize<=flashBudget:
+            flashBudget -= tableSize
+            rows = []
+            for letter in range(nofLetters):
+                successorMask = 0
+                for (target,guard) in automaton.transitions[state]:
+                    if automaton.guardToLetterSet(guard) & (1 << letter):
+                        successorMask |= 1 << target
+                successorMask >>= 32*firstWord
+                if firstWord==lastWord:
+                    rows.append(successorMask >> shift)
+                else:
+                    rows.append([(successorMask >> (32*i)) & 0xFFFFFFFF for i in range(lastWord-firstWord+1)])
+            tables[state] = (entryType,firstWord,shift,rows)
+    return tables
+
+
+def generateBitParallelCode(automaton,lookupTableFlashBudget,optimizeGuards=False,name="",prefix=""):
+    """Generates the state storage declarations (and lookup tables) of a bit-parallel monitor and the
+    code that computes the successor states "nextStates" from the active states. The code uses a
+    variable "letter" with the packed AP values if and only if lookup tables are used. Returns a
+    tuple consisting of the declarations and the code as lists of lines, whether "letter" is used, and
+    the GuardOptimizer used for the guards. The names of all global and local variables start with the
+    given prefix."""
+    nofWords = (automaton.nofStates+31)//32
+    lookupTables = computeSuccessorLookupTables(automaton,lookupTableFlashBudget)
+    updates = computeBitParallelUpdates(automaton,[a for a in range(automaton.nofStates) if not a in lookupTables])
+
+    # State information
+    declarations = ["/* State storage information -- bit i of word j represents state 32*j+i */\n"]
+    initialWords = [0 for a in range(nofWords)]
+    for a in automaton.startingStates:
+        initialWords[a//32] |= 1 << (a%32)
+    declarations.append("uint32_t "+prefix+"activeStates["+str(nofWords)+"] = {"+",".join([hex(a)+"u" for a in initialWords])+"};\n")
+
+    # Lookup tables
+    for (state,(entryType,firstWord,shift,rows)) in sorted(lookupTables.items()):
+        if isinstance(rows[0],list):
+            declarations.append("const "+entryType+" "+prefix+"successorsOfState"+str(state)+"["+str(len(rows))+"]["+str(len(rows[0]))+"] = {\n")
+            declarations.append(cArrayInitializer(rows))
+        else:
+            declarations.append("const "+entryType+" "+prefix+"successorsOfState"+str(state)+"["+str(len(rows))+"] = {\n")
+            declarations.append(cArrayInitializer(rows))
+        declarations.append("};\n")
+
+    # Successor computation
+    code = []
+    evaluatedGuards = computeBitParallelGuards(updates)
+    guardNumbers = dict([(guard.label,i) for i,guard in enumerate(evaluatedGuards)])
+    guards = GuardOptimizer(automaton,evaluatedGuards,optimizeGuards,prefix)
+    code.extend(guards.declarationCode("").splitlines(True))
+    for guard in evaluatedGuards:
+        code.append("uint32_t "+prefix+"guard"+str(guardNumbers[guard.label])+" = -(uint32_t)("+guards.guardToC(guard)+");\n")
+    guards.report(name)
+    code.append("uint32_t "+prefix+"nextStates["+str(nofWords)+"] = {0};\n")
+    for (state,(entryType,firstWord,shift,rows)) in sorted(lookupTables.items()):
+        sourceActive = "-(("+prefix+"activeStates["+str(state//32)+"] >> "+str(state%32)+") & 1u)"
+        if isinstance(rows[0],list):
+            for i in range(len(rows[0])):
+                code.append(prefix+"nextStates["+str(firstWord+i)+"] |= "+prefix+"successorsOfState"+str(state)+"[letter]["+str(i)+"] & "+sourceActive+";\n")
+        elif shift>0:
+            code.append(prefix+"nextStates["+str(firstWord)+"] |= ((uint32_t)"+prefix+"successorsOfState"+str(state)+"[letter] << "+str(shift)+") & "+sourceActive+";\n")
+        else:
+            code.append(prefix+"nextStates["+str(firstWord)+"] |= "+prefix+"successorsOfState"+str(state)+"[letter] & "+sourceActive+";\n")
+    for (guard,sourceWord,targetWord,sourceMask,shift) in updates:
+        expression = "("+prefix+"activeStates["+str(sourceWord)+"] & "+hex(sourceMask)+"u)"
+        if shift>0:
+            expression = "("+expression+" << "+str(shift)+")"
+        elif shift<0:
+            expression = "("+expression+" >> "+str(-shift)+")"
+        if not guard.isTrue():
+            expression = expression+" & "+prefix+"guard"+str(guardNumbers[guard.label])
+        code.append(prefix+"nextStates["+str(targetWord)+"] |= "+expression+";\n")
+    return (declarations,code,len(lookupTables)>0,guards)
+
+
+def bitParallelStateCopyCode(nofWords,target,source,indentation):
+    return "".join([indentation+target+"["+str(i)+"] = "+source+"["+str(i)+"];\n" for i in range(nofWords)])
+
+
+def writeBitParallelMonitor(automaton,filenameOut,returnCode,violationCondition,lookupTableFlashBudget=0,optimizeGuards=False):
+    """Writes a monitor that stores the set of active states in 32-bit words and computes the successor
+    states with word-wide operations. Every distinct guard is evaluated once per step to a mask that
+    is either all-zero or all-one. If lookupTableFlashBudget is greater than 0, the successors of
+    (some) states are taken from constant tables indexed by the letter instead. The violationCondition
+    is a C expression over the local copy localStates of the active states used by monitor_run().
+    Returns the GuardOptimizer used for the guards."""
+    APs = automaton.APs
+    nofWords = (automaton.nofStates+31)//32
+    (declarations,successorCode,usesLetter,guards) = generateBitParallelCode(automaton,lookupTableFlashBudget,optimizeGuards,filenameOut)
+    with open(filenameOut,"w") as outFile:
+        outFile.write("/* Temporal Logic Runtime Monitor Code */\n")
+        outFile.write("#include <stdint.h>\n")
+        outFile.write("".join(declarations))
+
+        # Build transition function
+        outFile.write("\n/* Monitor step/update function */\n")
+        outFile.write("int monitor("+",".join(["uint8_t "+a for a in APs])+") {\n")
+        if usesLetter:
+            outFile.write("  uint32_t letter = "+letterConstructionCode(APs)+";\n")
+        outFile.write("".join(["  "+a for a in successorCode]))
+        for i in range(nofWords):
+            outFile.write("  activeStates["+str(i)+"] = nextStates["+str(i)+"];\n")
+        outFile.write(returnCode)
+        outFile.write("}\n")
+
+        # Build entry points for packed letters
+        stepCode = "".join(["    "+a.replace("activeStates[","localStates[") for a in successorCode])
+        stepCode += bitParallelStateCopyCode(nofWords,"localStates","nextStates","    ")
+        stepCode += "    if ("+violationCondition+") break;\n"
+        loadCode = "  uint32_t localStates["+str(nofWords)+"];\n"+bitParallelStateCopyCode(nofWords,"localStates","activeStates","  ")
+        outFile.write(batchEntryPointsCode(APs,loadCode,stepCode,bitParallelStateCopyCode(nofWords,"activeStates","localStates","  ")))
+    return guards
+
+
+def monitorCompilerNondeterministicBitParallel(automaton,filenameOut,lookupTableFlashBudget=0,optimizeGuards=False):
+    returnCode = "  return ("+"|".join(["activeStates["+str(i)+"]" for i in range((automaton.nofStates+31)//32)])+")==0; /* Reporting a violation if no state is active. */\n"
+    violationCondition = "("+"|".join(["localStates["+str(i)+"]" for i in range((automaton.nofStates+31)//32)])+")==0"
+    return writeBitParallelMonitor(automaton,filenameOut,returnCode,violationCondition,lookupTableFlashBudget,optimizeGuards)
+
+
+def monitorCompilerUniversalBitParallel(automaton,filenameOut,lookupTableFlashBudget=0,optimizeGuards=False):
+    rejectingState = automaton.findRejectingState()
+    returnCode = "  return (activeStates["+str(rejectingState//32)+"] >> "+str(rejectingState%32)+") & 1;\n"
+    violationCondition = "(localStates["+str(rejectingState//32)+"] >> "+str(rejectingState%32)+") & 1"
+    return writeBitParallelMonitor(automaton,filenameOut,returnCode,violationCondition,lookupTableFlashBudget,optimizeGuards)
+
+
+def monitorCompilerUniversalLazyDeterminization(automaton,filenameOut,cacheSize,lookupTableFlashBudget=0,optimizeGuards=False):
+    """Compiles a universal automaton to a bit-parallel monitor with a direct-mapped cache that maps
+    pairs of the current set of states and the letter to the successor set of states, so that the
+    reachable part of the subset construction is built lazily at runtime. On a cache miss, the
+    successors are computed as in monitorCompilerUniversalBitParallel and the cache entry at the
+    hash position is overwritten. The number of cache hits and misses is counted in the global
+    variables monitorCacheHits and monitorCacheMisses. Returns the GuardOptimizer used for the guards."""
+    APs = automaton.APs
+    nofWords = (automaton.nofStates+31)//32
+    rejectingState = automaton.findRejectingState()
+    (declarations,successorCode,usesLetter,guards) = generateBitParallelCode(automaton,lookupTableFlashBudget,optimizeGuards,filenameOut)
+
+    def cachedStepCode(statesName,indentation):
+        """Code for one step on the active states in the array statesName, given the letter."""
+        code = [indentation+"uint32_t hash = letter;\n"]
+        for i in range(nofWords):
+            code.append(indentation+"hash = (hash ^ "+statesName+"["+str(i)+"]) * 2654435761u;\n")
+        code.append(indentation+"monitorCacheEntry *entry = &monitorCache[(hash ^ (hash >> 16)) % "+str(cacheSize)+"];\n")
+        code.append(indentation+"if ((entry->letterPlusOne==letter+1)"+"".join([" && (entry->states["+str(i)+"]=="+statesName+"["+str(i)+"])" for i in range(nofWords)])+") {\n")
+        code.append(indentation+"  monitorCacheHits++;\n")
+        for i in range(nofWords):
+            code.append(indentation+"  "+statesName+"["+str(i)+"] = entry->nextStates["+str(i)+"];\n")
+        code.append(indentation+"} else {\n")
+        code.append(indentation+"  monitorCacheMisses++;\n")
+        code.extend([indentation+"  "+a.replace("activeStates[",statesName+"[") for a in successorCode])
+        code.append(indentation+"  entry->letterPlusOne = letter+1;\n")
+        for i in range(nofWords):
+            code.append(indentation+"  entry->states["+str(i)+"] = "+statesName+"["+str(i)+"];\n")
+            code.append(indentation+"  entry->nextStates["+str(i)+"] = nextStates["+str(i)+"];\n")
+            code.append(indentation+"  "+statesName+"["+str(i)+"] = nextStates["+str(i)+"];\n")
+        code.append(indentation+"}\n")
+        return "".join(code)
+
+    with open(filenameOut,"w") as outFile:
+        outFile.write("/* Temporal Logic Runtime Monitor Code */\n")
+        outFile.write("#include <stdint.h>\n")
+        outFile.write("".join(declarations))
+
+        # Build cache
+        outFile.write("/* Cache for successor state sets. An entry is unused if letterPlusOne is 0. */\n")
+        outFile.write("typedef struct {\n")
+        outFile.write("  uint32_t states["+str(nofWords)+"];\n")
+        outFile.write("  uint32_t nextStates["+str(nofWords)+"];\n")
+        outFile.write("  "+smallestUnsignedCType(1 << len(APs))+" letterPlusOne;\n")
+        outFile.write("} monitorCacheEntry;\n")
+        outFile.write("monitorCacheEntry monitorCache["+str(cacheSize)+"];\n")
+        outFile.write("uint32_t monitorCacheHits = 0;\n")
+        outFile.write("uint32_t monitorCacheMisses = 0;\n")
+
+        # Build transition function
+        outFile.write("\n/* Monitor step/update function */\n")
+        outFile.write("int monitor("+",".join(["uint8_t "+a for a in APs])+") {\n")
+        outFile.write("  uint32_t letter = "+letterConstructionCode(APs)+";\n")
+        outFile.write(cachedStepCode("activeStates","  "))
+        outFile.write("  return (activeStates["+str(rejectingState//32)+"] >> "+str(rejectingState%32)+") & 1;\n")
+        outFile.write("}\n")
+
+        # Build entry points for packed letters
+        stepCode = cachedStepCode("localStates","    ")
+        stepCode += "    if ((localStates["+str(rejectingState//32)+"] >> "+str(rejectingState%32)+") & 1) break;\n"
+        loadCode = "  uint32_t localStates["+str(nofWords)+"];\n"+bitParallelStateCopyCode(nofWords,"localStates","activeStates","  ")
+        outFile.write(batchEntryPointsCode(APs,loadCode,stepCode,bitParallelStateCopyCode(nofWords,"activeStates","localStates","  ")))
+    return guards
+
+
+# =====================================
+# Multi-instance monitor compilers
+# =====================================
+def writeContextMonitor(automaton,filenameOut,violationCondition,optimizeGuards=False):
+    """Writes a monitor for a nondeterministic or universal automaton that keeps its state in a struct
+    of type monitorContext provided by the caller, so that a program can run several instances of the
+    monitor. monitor_init() sets a context to the initial states, and monitor_step() performs a step
+    on a context. monitor_run_ctx() processes a buffer of packed letters on a context, with the state
+    variables copied into local variables. The violationCondition is a C expression over the local
+    copies state<i> of the state variables ctx->inState<i>. The common monitor() interface is provided
+    for a single default context. Returns the GuardOptimizer used for the guards."""
+    APs = automaton.APs
+    nofStates = automaton.nofStates
+    guards = GuardOptimizer(automaton,[guard for transitionList in automaton.transitions for (target,guard) in transitionList],optimizeGuards)
+    initialValues = ",".join(["1" if i in automaton.startingStates else "0" for i in range(nofStates)])
+    with open(filenameOut,"w") as outFile:
+        outFile.write("/* Temporal Logic Runtime Monitor Code */\n")
+        outFile.write("#include <stdint.h>\n")
+
+        # Build state information
+        outFile.write("/* State storage information -- one context per monitor instance */\n")
+        outFile.write("typedef struct {\n")
+        for i in range(nofStates):
+            outFile.write("  uint8_t inState"+str(i)+";\n")
+        outFile.write("} monitorContext;\n")
+        outFile.write("const monitorContext monitorInitialContext = {"+initialValues+"};\n\n")
+        outFile.write("void monitor_init(monitorContext *ctx) {\n")
+        outFile.write("  *ctx = monitorInitialContext;\n")
+        outFile.write("}\n")
+
+        # Build transition function
+        outFile.write("\n/* Monitor step/update function */\n")
+        outFile.write("int monitor_step(monitorContext *ctx,"+",".join(["uint8_t "+a for a in APs])+") {\n")
+        for i in range(nofStates):
+            outFile.write("  uint8_t state"+str(i)+" = ctx->inState"+str(i)+";\n")
+        outFile.write(stateSetStepCode(automaton,guards,"  "))
+        for i in range(nofStates):
+            outFile.write("  ctx->inState"+str(i)+" = state"+str(i)+";\n")
+        outFile.write("  return "+violationCondition+";\n")
+        outFile.write("}\n")
+
+        # Build interface for a single instance
+        outFile.write("\n/* Default instance for the single-instance interface */\n")
+        outFile.write("monitorContext monitorDefaultContext = {"+initialValues+"};\n")
+        outFile.write("int monitor("+",".join(["uint8_t "+a for a in APs])+") {\n")
+        outFile.write("  return monitor_step(&monitorDefaultContext,"+",".join(APs)+");\n")
+        outFile.write("}\n")
+        outFile.write(stateSetBatchEntryPointsCode(automaton,guards,violationCondition,"ctx->inState","monitorContext","monitorDefaultContext"))
+    guards.report(filenameOut)
+    return guards
+
+
+def monitorCompilerNondeterministicContext(automaton,filenameOut,optimizeGuards=False):
+    violationCondition = "!("+"||".join(["state"+str(i) for i in range(automaton.nofStates)])+")"
+    return writeContextMonitor(automaton,filenameOut,violationCondition,optimizeGuards)
+
+
+def monitorCompilerUniversalContext(automaton,filenameOut,optimizeGuards=False):
+    return writeContextMonitor(automaton,filenameOut,"state"+str(automaton.findRejectingState()),optimizeGuards)
+
+
+def writeBitSlicedMonitor(automaton,filenameOut,violationCondition,optimizeGuards=False):
+    """Writes a monitor that runs 32 instances of a nondeterministic or universal automaton at once.
+    Every state is stored in a 32-bit word of a struct of type monitorSlicedContext, in which bit k
+    represents whether the state is active in instance k, and the AP values are passed in the same
+    way. A step then consists of the same bitwise operations for all instances, without branches.
+    monitor_sliced_step() returns the word of the instances that report a violation, and
+    monitor_sliced_letters() performs a step for one packed letter per instance. monitor_sliced_run()
+    processes a buffer with 32 packed letters per step, with the state words copied into local
+    variables. The violationCondition is a C expression over the local copies state<i> of the state
+    words ctx->inState<i>. The common monitor() interface and the batch entry points are provided for
+    instance 0 of a default context. Returns the GuardOptimizer used for the guards."""
+    APs = automaton.APs
+    nofStates = automaton.nofStates
+    guards = GuardOptimizer(automaton,[guard for transitionList in automaton.transitions for (target,guard) in transitionList if not guard.isTrue()],optimizeGuards,"",True)
+    initialValues = ",".join(["0xFFFFFFFFu" if i in automaton.startingStates else "0" for i in range(nofStates)])
+    with open(filenameOut,"w") as outFile:
+        outFile.write("/* Temporal Logic Runtime Monitor Code */\n")
+        outFile.write("#include <stdint.h>\n")
+
+        # Build state information
+        outFile.write("/* State storage information -- bit k of every word represents monitor instance k */\n")
+        outFile.write("typedef struct {\n")
+        for i in range(nofStates):
+            outFile.write("  uint32_t inState"+str(i)+";\n")
+        outFile.write("} monitorSlicedContext;\n")
+        outFile.write("const monitorSlicedContext monitorSlicedInitialContext = {"+initialValues+"};\n\n")
+        outFile.write("void monitor_sliced_init(monitorSlicedContext *ctx) {\n")
+        outFile.write("  *ctx = monitorSlicedInitialContext;\n")
+        outFile.write("}\n")
+
+        # Build transition function
+        outFile.write("\n/* Monitor step/update function for 32 instances */\n")
+        def stepCode(indentation):
+            code = [guards.declarationCode(indentation)]
+            for i in range(nofStates):
+                code.append(indentation+"uint32_t nextState"+str(i)+" = 0;\n")
+            for state in range(nofStates):
+                for (target,guard) in automaton.transitions[state]:
+                    if guard.isTrue():
+                        code.append(indentation+"nextState"+str(target)+" |= state"+str(state)+";\n")
+                    else:
+                        code.append(indentation+"nextState"+str(target)+" |= state"+str(state)+" & ("+guards.guardToC(guard)+");\n")
+            for i in range(nofStates):
+                code.append(indentation+"state"+str(i)+" = nextState"+str(i)+";\n")
+            return "".join(code)
+        def loadCode(context):
+            return "".join(["  uint32_t state"+str(i)+" = "+context+"inState"+str(i)+";\n" for i in range(nofStates)])
+        def storeCode(context):
+            return "".join(["  "+context+"inState"+str(i)+" = state"+str(i)+";\n" for i in range(nofStates)])
+
+        outFile.write("uint32_t monitor_sliced_step(monitorSlicedContext *ctx,"+",".join(["uint32_t "+a for a in APs])+") {\n")
+        outFile.write(loadCode("ctx->"))
+        outFile.write(stepCode("  "))
+        outFile.write(storeCode("ctx->"))
+        outFile.write("  return "+violationCondition+";\n")
+        outFile.write("}\n\n")
+        outFile.write("uint32_t monitor_sliced_letters(monitorSlicedContext *ctx,const uint8_t letters[32]) {\n")
+        for a in APs:
+            outFile.write("  uint32_t "+a+" = 0;\n")
+        outFile.write("  for (int instance=0;instance<32;instance++) {\n")
+        for i,a in enumerate(APs):
+            outFile.write("    "+a+" |= (uint32_t)((letters[instance] >> "+str(i)+") & 1) << instance;\n")
+        outFile.write("  }\n")
+        outFile.write("  return monitor_sliced_step(ctx,"+",".join(APs)+");\n")
+        outFile.write("}\n\n")
+
+        # Build batch entry point for 32 instances, with 32 packed letters per step
+        outFile.write("/* Processes n steps, with letters[32*i+k] being the packed letter of instance k in step i. Returns the\n")
+        outFile.write("   index of the first step in which an instance reports a violation (or n if there is none) and stores\n")
+        outFile.write("   the word of the instances that report a violation in this step (or 0) in *violations. */\n")
+        outFile.write("#include <stddef.h>\n")
+        outFile.write("size_t monitor_sliced_run(monitorSlicedContext *ctx, const uint8_t *letters, size_t n, uint32_t *violations) {\n")
+        outFile.write(loadCode("ctx->"))
+        outFile.write("  uint32_t violated = 0;\n")
+        outFile.write("  size_t position;\n")
+        outFile.write("  for (position=0;position<n;position++) {\n")
+        usedAPs = [(i,a) for (i,a) in enumerate(APs) if re.search(r"\b"+re.escape(a)+r"\b",stepCode(""))]
+        for (i,a) in usedAPs:
+            outFile.write("    uint32_t "+a+" = 0;\n")
+        if len(usedAPs)>0:
+            outFile.write("    for (int instance=0;instance<32;instance++) {\n")
+            outFile.write("      uint32_t letter = letters[32*position+instance];\n")
+            for (i,a) in usedAPs:
+                outFile.write("      "+a+" |= ((letter >> "+str(i)+") & 1) << instance;\n")
+            outFile.write("    }\n")
+        outFile.write(stepCode("    "))
+        outFile.write("    violated = "+violationCondition+";\n")
+        outFile.write("    if (violated) break;\n")
+        outFile.write("  }\n")
+        outFile.write(storeCode("ctx->"))
+        outFile.write("  *violations = violated;\n")
+        outFile.write("  return position;\n")
+        outFile.write("}\n")
+
+        # Build interface for a single instance
+        outFile.write("\n/* Instance 0 of a default context for the single-instance interface */\n")
+        outFile.write("monitorSlicedContext monitorSlicedDefaultContext = {"+initialValues+"};\n")
+        outFile.write("int monitor("+",".join(["uint8_t "+a for a in APs])+") {\n")
+        outFile.write("  return monitor_sliced_step(&monitorSlicedDefaultContext,"+",".join(["("+a+">0)" for a in APs])+") & 1;\n")
+        outFile.write("}\n")
+        outFile.write(batchEntryPointsCode(APs,loadCode("monitorSlicedDefaultContext."),stepCode("    ")+"    if (("+violationCondition+") & 1) break;\n",storeCode("monitorSlicedDefaultContext.")))
+    guards.report(filenameOut)
+    return guards
+
+
+def monitorCompilerNondeterministicBitSliced(automaton,filenameOut,optimizeGuards=False):
+    violationCondition = "~("+"|".join(["state"+str(i) for i in range(automaton.nofStates)])+")"
+    return writeBitSlicedMonitor(automaton,filenameOut,violationCondition,optimizeGuards)
+
+
+def monitorCompilerUniversalBitSliced(automaton,filenameOut,optimizeGuards=False):
+    return writeBitSlicedMonitor(automaton,filenameOut,"state"+str(automaton.findRejectingState()),optimizeGuards)
+
+
+# =====================================
+# Fragmented monitor compilers
+# =====================================
+def computeGuardSupport(automaton):
+    """Bitmask of the APs that the guards of the automaton depend on. Bit i is set if flipping the value
+    of APs[i] in some letter changes whether some guard is satisfied."""
+    nofAPs = len(automaton.APs)
+    # For every AP, the set of letters in which it is false
+    lettersWithoutAP = [sum([1 << letter for letter in range(1 << nofAPs) if not letter & (1 << i)]) for i in range(nofAPs)]
+    support = 0
+    for transitionList in automaton.transitions:
+        for (target,guard) in transitionList:
+            letterSet = automaton.guardToLetterSet(guard)
+            for i in range(nofAPs):
+                if ((letterSet >> (1 << i)) & lettersWithoutAP[i]) != (letterSet & lettersWithoutAP[i]):
+                    support |= 1 << i
+    return support
+
+
+def generateFragmentCode(fragment,automaton,optimizeGuards=False,eventDriven=False,packedFirstBit=None):
+    """Builds the C code for one fragment of a fragmented monitor. Returns a triple consisting of the
+    state storage declarations, the code for the monitor step function, and the (load,step,store)
+    code for monitor_run().
+
+    In event-driven fragments, the variable stableLetter<fragment> stores the letter (restricted to the
+    APs that the fragment depends on) for which the current states of the fragment are a fixpoint of
+    the transition relation. If the current letter restricted to these APs is the same, the fragment
+    is not updated. The step code then expects the packed letter in the variable "letter".
+
+    If packedFirstBit is given, state i of the fragment is stored in bit packedFirstBit+i of the bit
+    array stateFlags shared by all fragments (declared by writeFragmentedMonitor) and updated with the
+    code from packedStateUpdateCode. monitor_run() then works on stateFlags directly."""
+    if packedFirstBit is not None:
+        return generatePackedFragmentCode(fragment,automaton,packedFirstBit,optimizeGuards,eventDriven)
+    nofStates = automaton.nofStates
+    guards = GuardOptimizer(automaton,[guard for transitionList in automaton.transitions for (target,guard) in transitionList],optimizeGuards,"fragment"+str(fragment)+"_")
+    declarations = []
+    for i in range(0,nofStates):
+        if i in automaton.startingStates:
+            declarations.append("uint8_t inState"+str(fragment)+"_"+str(i)+" = 1;\n")
+        else:
+            declarations.append("uint8_t inState"+str(fragment)+"_"+str(i)+" = 0;\n")
+    if eventDriven:
+        support = computeGuardSupport(automaton)
+        noStableLetter = 1 << len(automaton.APs)
+        stableLetterType = smallestUnsignedCType(noStableLetter)
+        declarations.append("/* Fragment "+str(fragment)+" depends on: "+", ".join([a for i,a in enumerate(automaton.APs) if support & (1 << i)])+" */\n")
+        declarations.append(stableLetterType+" stableLetter"+str(fragment)+" = "+str(noStableLetter)+";\n")
+
+    def updateCode(stateVariable,indentation,violationCode):
+        """Code for updating the states of the fragment, stored in the variables stateVariable<i>."""
+        code = [guards.declarationCode(indentation)]
+        for i in range(0,nofStates):
+            code.append(indentation+"uint8_t nextState"+str(fragment)+"_"+str(i)+" = 0;\n")
+        for state in range(nofStates):
+            code.append(indentation+"if ("+stateVariable+str(state)+") {\n")
+            for (target,guard) in automaton.transitions[state]:
+                code.append(indentation+"  if ("+guards.guardToC(guard)+") nextState"+str(fragment)+"_"+str(target)+" = 1;\n")
+            code.append(indentation+"}\n")
+        if eventDriven:
+            code.append(indentation+"uint8_t unchanged = "+" && ".join(["(nextState"+str(fragment)+"_"+str(i)+"=="+stateVariable+str(i)+")" for i in range(nofStates)])+";\n")
+        for i in range(0,nofStates):
+            code.append(indentation+stateVariable+str(i)+" = nextState"+str(fragment)+"_"+str(i)+";\n")
+        if eventDriven:
+            code.append(indentation+"stableLetter"+str(fragment)+" = unchanged ? (letter & "+str(support)+") : "+str(noStableLetter)+";\n")
+            code.append(indentation+"if (!("+"||".join([stateVariable+str(i) for i in range(nofStates)])+")) { stableLetter"+str(fragment)+" = "+str(noStableLetter)+"; "+violationCode+" }\n")
+        else:
+            code.append(indentation+"if (!("+"||".join([stateVariable+str(i) for i in range(nofStates)])+")) "+violationCode+"\n")
+        if eventDriven:
+            code = [indentation[2:]+"if ((letter & "+str(support)+") != stableLetter"+str(fragment)+") {\n"]+code+[indentation[2:]+"}\n"]
+        return "".join(code)
+
+    stepCode = updateCode("inState"+str(fragment)+"_","    " if eventDriven else "  ","return 1;")
+
+    # Code for monitor_run(), working on local copies state<fragment>_<i> of the state variables
+    loadCode = "".join(["  uint8_t state"+str(fragment)+"_"+str(i)+" = inState"+str(fragment)+"_"+str(i)+";\n" for i in range(nofStates)])
+    batchStepCode = updateCode("state"+str(fragment)+"_","      " if eventDriven else "    ","break;")
+    storeCode = "".join(["  inState"+str(fragment)+"_"+str(i)+" = state"+str(fragment)+"_"+str(i)+";\n" for i in range(nofStates)])
+    guards.report("fragment "+str(fragment))
+    return ("".join(declarations),stepCode,(loadCode,batchStepCode,storeCode))
+
+
+def generatePackedFragmentCode(fragment,automaton,firstBit,optimizeGuards=False,eventDriven=False):
+    """Variant of generateFragmentCode for fragments whose states are stored in the bits firstBit to
+    firstBit+nofStates-1 of stateFlags. The code of every fragment is enclosed in a block, so that the
+    local variables of different fragments can share the same stack memory."""
+    nofStates = automaton.nofStates
+    prefix = "fragment"+str(fragment)+"_"
+    guards = GuardOptimizer(automaton,[guard for transitionList in automaton.transitions for (target,guard) in transitionList],optimizeGuards,prefix)
+    byteMasks = packedByteMasks(firstBit,nofStates)
+    declarations = ["/* Fragment "+str(fragment)+": states in bits "+str(firstBit)+" to "+str(firstBit+nofStates-1)+" of stateFlags */\n"]
+    if eventDriven:
+        support = computeGuardSupport(automaton)
+        noStableLetter = 1 << len(automaton.APs)
+        declarations.append("/* Fragment "+str(fragment)+" depends on: "+", ".join([a for i,a in enumerate(automaton.APs) if support & (1 << i)])+" */\n")
+        declarations.append(smallestUnsignedCType(noStableLetter)+" stableLetter"+str(fragment)+" = "+str(noStableLetter)+";\n")
+
+    def updateCode(indentation,violationCode):
+        if eventDriven:
+            code = [indentation[2:]+"if ((letter & "+str(support)+") != stableLetter"+str(fragment)+") {\n"]
+            code.append(indentation+"uint8_t "+prefix+"previousStates["+str(len(byteMasks))+"] = {"+",".join(["stateFlags["+str(byte)+"]" for (byte,mask) in byteMasks])+"};\n")
+        else:
+            code = [indentation[2:]+"{\n"]
+        code.append(guards.declarationCode(indentation))
+        code.append(packedStateUpdateCode(automaton,guards,firstBit,prefix,indentation))
+        if eventDriven:
+            unchanged = " && ".join(["((stateFlags["+str(byte)+"] ^ "+prefix+"previousStates["+str(j)+"]) & "+str(mask)+")==0" for j,(byte,mask) in enumerate(byteMasks)])
+            code.append(indentation+"stableLetter"+str(fragment)+" = ("+unchanged+") ? (letter & "+str(support)+") : "+str(noStableLetter)+";\n")
+            code.append(indentation+"if (!("+packedAnyFlagCode(firstBit,nofStates)+")) { stableLetter"+str(fragment)+" = "+str(noStableLetter)+"; "+violationCode+" }\n")
+        else:
+            code.append(indentation+"if (!("+packedAnyFlagCode(firstBit,nofStates)+")) "+violationCode+"\n")
+        code.append(indentation[2:]+"}\n")
+        return "".join(code)
+
+    guards.report("fragment "+str(fragment))
+    return ("".join(declarations),updateCode("    ","return 1;"),("",updateCode("      ","break;"),""))
+
+
+def generateTableFragmentCode(fragment,automaton):
+    """Builds the code for a fragment of a fragmented monitor from a deterministic automaton, in the same
+    format as generateFragmentCode. The successor state is looked up in a constant transition table as
+    in monitorCompilerDeterministicTable. The step code expects the packed letter in the variable
+    "letter"."""
+    assert len(automaton.startingStates)==1
+    (letterClasses,transitionTable) = computeDeterministicTransitionTable(automaton)
+    nofClasses = len(transitionTable[0])
+    violationState = automaton.nofStates
+    stateType = smallestUnsignedCType(violationState)
+    prefix = "fragment"+str(fragment)+"_"
+    declarations = ["const "+smallestUnsignedCType(nofClasses-1)+" "+prefix+"letterClasses["+str(len(letterClasses))+"] = {\n"]
+    declarations.append(cArrayInitializer(letterClasses))
+    declarations.append("};\n")
+    declarations.append("const "+stateType+" "+prefix+"transitionTable["+str(violationState+1)+"]["+str(nofClasses)+"] = {\n")
+    declarations.append(cArrayInitializer(transitionTable))
+    declarations.append("};\n")
+    for a in automaton.startingStates:
+        declarations.append(stateType+" "+prefix+"monitorState = "+str(a)+";\n")
+    stepCode = "  "+prefix+"monitorState = "+prefix+"transitionTable["+prefix+"monitorState]["+prefix+"letterClasses[letter]];\n"
+    stepCode += "  if ("+prefix+"monitorState=="+str(violationState)+") return 1;\n"
+    loadCode = "  "+stateType+" "+prefix+"state = "+prefix+"monitorState;\n"
+    batchStepCode = "    "+prefix+"state = "+prefix+"transitionTable["+prefix+"state]["+prefix+"letterClasses[letter]];\n"
+    batchStepCode += "    if ("+prefix+"state=="+str(violationState)+") break;\n"
+    storeCode = "  "+prefix+"monitorState = "+prefix+"state;\n"
+    return ("".join(declarations),stepCode,(loadCode,batchStepCode,storeCode))
+
+
+def generateUniversalFragmentCode(fragment,automaton,optimizeGuards=False):
+    """Builds the code for a fragment of a fragmented monitor from a universal automaton, in the same
+    format as generateFragmentCode. The active states are stored in 32-bit words and updated as in
+    monitorCompilerUniversalBitParallel. The fragment reports a violation when the rejecting state is
+    active."""
+    nofWords = (automaton.nofStates+31)//32
+    rejectingState = automaton.findRejectingState()
+    prefix = "fragment"+str(fragment)+"_"
+    (declarations,successorCode,usesLetter,guards) = generateBitParallelCode(automaton,0,optimizeGuards,"fragment "+str(fragment),prefix)
+    stepCode = "".join(["  "+a for a in successorCode])
+    stepCode += bitParallelStateCopyCode(nofWords,prefix+"activeStates",prefix+"nextStates","  ")
+    stepCode += "  if (("+prefix+"activeStates["+str(rejectingState//32)+"] >> "+str(rejectingState%32)+") & 1) return 1;\n"
+    loadCode = "  uint32_t "+prefix+"localStates["+str(nofWords)+"];\n"+bitParallelStateCopyCode(nofWords,prefix+"localStates",prefix+"activeStates","  ")
+    batchStepCode = "".join(["    "+a.replace(prefix+"activeStates[",prefix+"localStates[") for a in successorCode])
+    batchStepCode += bitParallelStateCopyCode(nofWords,prefix+"localStates",prefix+"nextStates","    ")
+    batchStepCode += "    if (("+prefix+"localStates["+str(rejectingState//32)+"] >> "+str(rejectingState%32)+") & 1) break;\n"
+    storeCode = bitParallelStateCopyCode(nofWords,prefix+"activeStates",prefix+"localStates","  ")
+    return ("".join(declarations),stepCode,(loadCode,batchStepCode,storeCode))
+
+
+def isDeterministic(automaton):
+    """Checks if an automaton has a single initial state and no two transitions from the same state whose
+    guards are satisfied by the same letter."""
+    if len(automaton.startingStates)!=1:
+        return False
+    for state in range(automaton.nofStates):
+        coveredLetters = 0
+        for (target,guard) in automaton.transitions[state]:
+            letterSet = automaton.guardToLetterSet(guard)
+            if letterSet & coveredLetters:
+                return False
+            coveredLetters |= letterSet
+    return True
+
+
+def estimateFragmentResources(encoding,automaton,optimizeGuards=False):
+    """Estimates the flash memory (in bytes), the RAM (in bytes), and the number of operations of a
+    monitor step in the worst case for a fragment with the given encoding ("state set", "table", or
+    "universal bit vector"). The code size is estimated with four bytes per operation."""
+    nofStates = automaton.nofStates
+    if encoding=="table":
+        (letterClasses,transitionTable) = computeDeterministicTransitionTable(automaton)
+        classTypeSize = int(smallestUnsignedCType(len(transitionTable[0])-1)[4:-2])//8
+        stateTypeSize = int(smallestUnsignedCType(nofStates)[4:-2])//8
+        flash = len(letterClasses)*classTypeSize+len(transitionTable)*len(transitionTable[0])*stateTypeSize+4*4
+        return (flash,stateTypeSize,4)
+    if encoding=="universal bit vector":
+        nofWords = (nofStates+31)//32
+        updates = computeBitParallelUpdates(automaton,range(nofStates))
+        evaluatedGuards = computeBitParallelGuards(updates)
+        guards = GuardOptimizer(automaton,evaluatedGuards,optimizeGuards)
+        operations = guards.operationsAfter+len(evaluatedGuards)+3*len(updates)+2*nofWords
+        return (4*operations,4*nofWords,operations)
+    guardUses = [guard for transitionList in automaton.transitions for (target,guard) in transitionList]
+    guards = GuardOptimizer(automaton,guardUses,optimizeGuards)
+    flash = 4*(guards.operationsAfter+len(guardUses)+3*nofStates)
+    if isDeterministic(automaton):
+        # Only one state is active, but the shared terms are computed in every step
+        stepOperations = 2*nofStates+guards.sharedOperations()+max([sum([guards.guardOperations(guard) for (target,guard) in automaton.transitions[state]]) for state in range(nofStates)]+[0])
+    else:
+        stepOperations = 2*nofStates+guards.operationsAfter
+    return (flash,nofStates,stepOperations)
+
+
+def writeFragmentedMonitor(APs,fragmentCodes,filenameOut,usesLetter=False,packedInitialFlags=None):
+    """Merges the codes of all fragments (as computed by generateFragmentCode) into a single monitor. The
+    fragments are written in the order in which they are given, so the output is independent of the
+    order in which the fragments were computed. If usesLetter is set, the monitor step function packs
+    the AP values into the variable "letter" (as needed by event-driven and table-driven fragments). If
+    packedInitialFlags is given, the bit array stateFlags for the fragments with bit-packed state storage
+    is declared with these initial values."""
+    with open(filenameOut,"w") as outFile:
+        outFile.write("/* Temporal Logic Runtime Monitor Code */\n")
+        outFile.write("#include <stdint.h>\n")
+
+        # Build state information
+        outFile.write("/* State storage information */\n")
+        if packedInitialFlags is not None and len(packedInitialFlags)>0:
+            outFile.write(packedStateDeclarationCode(packedInitialFlags))
+        for (declarations,stepCode,batchCode) in fragmentCodes:
+            outFile.write(declarations)
+
+        # Build transition function
+        outFile.write("\n/* Monitor step/update function */\n")
+        outFile.write("int monitor("+",".join(["uint8_t "+a for a in APs])+") {\n")
+        if usesLetter:
+            outFile.write("  uint32_t letter = "+letterConstructionCode(APs)+";\n")
+        for (declarations,stepCode,batchCode) in fragmentCodes:
+            outFile.write(stepCode)
+        outFile.write("  return 0;\n")
+        outFile.write("}\n")
+        outFile.write(batchEntryPointsCode(APs,"".join([a[2][0] for a in fragmentCodes]),"".join([a[2][1] for a in fragmentCodes]),"".join([a[2][2] for a in fragmentCodes])))
+
+
+def packFragmentedMonitorStates(fragments,filenameOut,optimizeGuards=False,eventDriven=False):
+    """Assigns consecutive bits of stateFlags to the states of the fragments given as (fragment,automaton)
+    pairs and generates their code. Returns the codes of the fragments and the initial values of the
+    bits of stateFlags, and reports the RAM needed for the state flags. As the code of every fragment is
+    enclosed in a block, the local variables need the memory of the largest fragment."""
+    fragmentCodes = []
+    initialFlags = []
+    temporaryBytes = [0]
+    for (fragment,automaton) in fragments:
+        fragmentCodes.append(generateFragmentCode(fragment,automaton,optimizeGuards,eventDriven,len(initialFlags)))
+        temporaryBytes.append(packedTemporaryBytes(automaton,len(initialFlags),eventDriven))
+        initialFlags.extend([i in automaton.startingStates for i in range(automaton.nofStates)])
+    reportPackedStateStorage(filenameOut,len(initialFlags),max(temporaryBytes))
+    return (fragmentCodes,initialFlags)
+
+
+def monitorCompilerFragmented(automata,filenameOut,optimizeGuards=False,eventDriven=False,packStates=False):
+    if packStates:
+        (fragmentCodes,initialFlags) = packFragmentedMonitorStates(list(enumerate(automata)),filenameOut,optimizeGuards,eventDriven)
+        writeFragmentedMonitor(automata[0].APs,fragmentCodes,filenameOut,eventDriven,initialFlags)
+        return
+    fragmentCodes = [generateFragmentCode(fragment,automaton,optimizeGuards,eventDriven) for (fragment,automaton) in enumerate(automata)]
+    writeFragmentedMonitor(automata[0].APs,fragmentCodes,filenameOut,eventDriven)
+
+
+# =====================================
+# Parallel translation and compilation
+# of fragmented monitors
+# =====================================
+def translateAndCompileFragment(job):
+    """Worker function: Translates one specification block with SPOT and generates the code for the
+    respective fragment. If hybridCostWeights is given, the fragment is also encoded as a table-driven
+    deterministic monitor and as a bit vector of the states of a universal automaton for the negated
+    block, and the encoding with the lowest weighted sum of the resources estimated by
+    estimateFragmentResources is used. Returns the number of states of the automaton computed by SPOT
+    for the selected encoding, the name of the encoding, the (optimized) automaton, and the code of the
+    fragment. If packStates is set, the bits of the fragments in stateFlags are only known after all
+    fragments have been translated, so for the "state set" encoding, None is returned instead of the code."""
+    (fragment,blockFormula,APs,filenameHOA,optimizeGuards,optimizeAutomata,eventDriven,hybridCostWeights,packStates) = job
+    translateLTL(blockFormula,["-M"],filenameHOA)
+    automaton = loadHOAFile(filenameHOA,APs)
+    candidates = [("state set",automaton.nofStates,automaton,filenameHOA)]
+    if hybridCostWeights is not None:
+        filenameDeterministic = filenameHOA.replace(".txt","_deterministic.txt")
+        translateLTL(blockFormula,["-M","-D"],filenameDeterministic)
+        deterministicAutomaton = loadHOAFile(filenameDeterministic,APs)
+        if isDeterministic(deterministicAutomaton):
+            candidates.append(("table",deterministicAutomaton.nofStates,deterministicAutomaton,filenameDeterministic))
+        filenameUniversal = filenameHOA.replace(".txt","_universal.txt")
+        translateLTL("!("+blockFormula+")",[],filenameUniversal)
+        universalAutomaton = loadHOAFile(filenameUniversal,APs)
+        # The universal automaton can only be used if it has a rejecting state, which is not the case for valid blocks
+        transitions = universalAutomaton.transitions
+        if any([len(transitions[state])==1 and transitions[state][0][0]==state and transitions[state][0][1].label=="t" for state in range(universalAutomaton.nofStates)]):
+            candidates.append(("universal bit vector",universalAutomaton.nofStates,universalAutomaton,filenameUniversal))
+    if optimizeAutomata:
+        candidates = [(encoding,nofStates,optimizeAutomaton(candidate,encoding=="universal bit vector",filename),filename) for (encoding,nofStates,candidate,filename) in candidates]
+
+    if hybridCostWeights is not None:
+        costs = []
+        report = []
+        for (encoding,nofStates,candidate,filename) in candidates:
+            resources = estimateFragmentResources(encoding,candidate,optimizeGuards)
+            costs.append(sum([a*b for (a,b) in zip(resources,hybridCostWeights)]))
+            report.append("  "+encoding+": "+str(resources[0])+" bytes of flash, "+str(resources[1])+" bytes of RAM, "+str(resources[2])+" operations per step\n")
+        candidates = [candidates[costs.index(min(costs))]]
+        print("Fragment "+str(fragment)+": Using the "+candidates[0][0]+" encoding. Estimates:\n"+"".join(report),end="")
+
+    (encoding,nofStates,automaton,filename) = candidates[0]
+    if packStates and encoding=="state set":
+        return (nofStates,encoding,automaton,None)
+    if encoding=="table":
+        return (nofStates,encoding,automaton,generateTableFragmentCode(fragment,automaton))
+    if encoding=="universal bit vector":
+        return (nofStates,encoding,automaton,generateUniversalFragmentCode(fragment,automaton,optimizeGuards))
+    return (nofStates,encoding,automaton,generateFragmentCode(fragment,automaton,optimizeGuards,eventDriven))
+
+
+def compileFragmentedMonitorInParallel(specBlocks,APs,filenamesHOA,filenameOut,nofWorkers,optimizeGuards=False,optimizeAutomata=False,eventDriven=False,hybridCostWeights=None,packStates=False):
+    """Translates all specification blocks to deterministic monitors and builds a fragmented monitor
+    from them, using a pool of nofWorkers processes. If hybridCostWeights (the weights for the flash
+    memory, the RAM, and the operations per step) is given, the encoding of every fragment is selected
+    as described for translateAndCompileFragment. If packStates is set, the states of all fragments
+    with the "state set" encoding are stored in a single bit array. Returns the list of the numbers of
+    states of the fragments as computed by SPOT and the list of the (encoding,automaton) pairs of the
+    fragments (for the worst-case step cost analysis)."""
+    jobs = []
+    for blockNum,block in enumerate(specBlocks):
+        jobs.append((blockNum," & ".join(["("+a+")" for a in block]),APs,filenamesHOA[blockNum],optimizeGuards,optimizeAutomata,eventDriven,hybridCostWeights,packStates))
+    if nofWorkers<=1:
+        results = [translateAndCompileFragment(job) for job in jobs]
+    else:
+        with multiprocessing.Pool(nofWorkers) as pool:
+            results = pool.map(translateAndCompileFragment,jobs)
+    fragmentCodes = [fragmentCode for (nofStates,encoding,automaton,fragmentCode) in results]
+    if packStates:
+        packedFragments = [(fragment,results[fragment][2]) for fragment in range(len(results)) if results[fragment][1]=="state set"]
+        (packedCodes,initialFlags) = packFragmentedMonitorStates(packedFragments,filenameOut,optimizeGuards,eventDriven)
+        for ((fragment,automaton),fragmentCode) in zip(packedFragments,packedCodes):
+            fragmentCodes[fragment] = fragmentCode
+        writeFragmentedMonitor(APs,fragmentCodes,filenameOut,eventDriven or hybridCostWeights is not None,initialFlags)
+    else:
+        writeFragmentedMonitor(APs,fragmentCodes,filenameOut,eventDriven or hybridCostWeights is not None)
+    return ([nofStates for (nofStates,encoding,automaton,fragmentCode) in results],[(encoding,automaton) for (nofStates,encoding,automaton,fragmentCode) in results])
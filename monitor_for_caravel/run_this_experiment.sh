@@ -1 +1,4 @@
 ../lib/monitor_compiler_for_caraval_monitor/compiler.py monitor_encoding_by_hand.txt
+if test -f monitor_encoding_generated.txt; then
+  ../lib/monitor_compiler_for_caraval_monitor/compiler.py monitor_encoding_generated.txt
+fi
@@ -0,0 +1,54 @@
+#include <stdlib.h>
+#include <stdio.h>
+#include <stdint.h>
+#include <time.h>
+
+/* Host-side benchmark driver for the generated monitors.
+   Usage: benchmark <trace file> <number of repetitions>
+   The trace file contains one byte per letter, where bit i is the value of the i-th proposition
+   in the order r1,y1,g1,r2,y2,g2,a1,a2 (as with CONSTRUCTTRACEELEMENT in the reason tracking monitor).
+   The monitor is run on the trace the given number of times (without resetting the monitor in between),
+   and the time needed for every repetition is printed in nanoseconds. */
+
+int monitor(uint8_t r1,uint8_t y1,uint8_t g1,uint8_t r2,uint8_t y2,uint8_t g2,uint8_t a1,uint8_t a2);
+
+int main(int argc, char **argv) {
+  if (argc!=3) {
+    fprintf(stderr,"Usage: %s <trace file> <number of repetitions>\n",argv[0]);
+    return 1;
+  }
+
+  // Read the trace
+  FILE *traceFile = fopen(argv[1],"rb");
+  if (traceFile==NULL) {
+    fprintf(stderr,"Error: Cannot open trace file %s\n",argv[1]);
+    return 1;
+  }
+  fseek(traceFile,0,SEEK_END);
+  long nofLetters = ftell(traceFile);
+  fseek(traceFile,0,SEEK_SET);
+  uint8_t *letters = malloc(nofLetters>0?nofLetters:1);
+  if ((letters==NULL) || (fread(letters,1,nofLetters,traceFile)!=(size_t)nofLetters)) {
+    fprintf(stderr,"Error: Cannot read trace file %s\n",argv[1]);
+    return 1;
+  }
+  fclose(traceFile);
+
+  // Run the monitor. The violations are counted so that the monitor calls cannot be optimized away.
+  int nofRepetitions = atoi(argv[2]);
+  uint64_t nofViolations = 0;
+  for (int repetition=0;repetition<nofRepetitions;repetition++) {
+    struct timespec start, end;
+    clock_gettime(CLOCK_MONOTONIC,&start);
+    for (long i=0;i<nofLetters;i++) {
+      uint8_t l = letters[i];
+      nofViolations += monitor(l&1,(l>>1)&1,(l>>2)&1,(l>>3)&1,(l>>4)&1,(l>>5)&1,(l>>6)&1,(l>>7)&1);
+    }
+    clock_gettime(CLOCK_MONOTONIC,&end);
+    printf("#Nanoseconds: %lld\n",(long long)(end.tv_sec-start.tv_sec)*1000000000ll+(end.tv_nsec-start.tv_nsec));
+  }
+  printf("#Steps: %ld\n",nofLetters);
+  printf("#Violations: %llu\n",(unsigned long long)nofViolations);
+  free(letters);
+  return 0;
+}
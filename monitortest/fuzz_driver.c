@@ -0,0 +1,82 @@
+#include <stdint.h>
+
+/* Core of the differential fuzzing harness (see differential_fuzzing.py), linked into a shared library
+   together with all encodings. The symbols of every encoding have been renamed, and a generated file
+   defines the table of the monitor functions of the encodings and a function for resetting the
+   variables of an encoding to their initial values. */
+
+typedef int (*monitorFunction)(uint8_t,uint8_t,uint8_t,uint8_t,uint8_t,uint8_t,uint8_t,uint8_t);
+extern const int nofEncodings;
+extern const monitorFunction encodingMonitors[];
+void resetEncodingState(int encoding);
+
+/* Runs an encoding from its initial state on a trace until the first violation. Returns the step
+   of the first violation, or -1 if there is none. */
+static int64_t runEncoding(int encoding, const uint8_t *letters, uint32_t length) {
+  resetEncodingState(encoding);
+  monitorFunction monitor = encodingMonitors[encoding];
+  for (uint32_t i=0;i<length;i++) {
+    uint8_t l = letters[i];
+    if (monitor(l&1,(l>>1)&1,(l>>2)&1,(l>>3)&1,(l>>4)&1,(l>>5)&1,(l>>6)&1,(l>>7)&1)) return i;
+  }
+  return -1;
+}
+
+static uint64_t nextRandom(uint64_t *state) {
+  *state ^= *state >> 12;
+  *state ^= *state << 25;
+  *state ^= *state >> 27;
+  return *state * 2685821657736338717ull;
+}
+
+int getNofEncodings(void) {
+  return nofEncodings;
+}
+
+/* Runs all encodings on nofTraces traces that are stored one after the other in letters. The step of the
+   first violation of trace t for encoding e is written to firstViolations[t*nofEncodings+e]. Returns the
+   number of monitor steps executed. */
+uint64_t runTraces(const uint8_t *letters, const uint32_t *lengths, uint32_t nofTraces, int64_t *firstViolations) {
+  uint64_t nofSteps = 0;
+  for (uint32_t trace=0;trace<nofTraces;trace++) {
+    for (int encoding=0;encoding<nofEncodings;encoding++) {
+      int64_t firstViolation = runEncoding(encoding,letters,lengths[trace]);
+      firstViolations[trace*nofEncodings+encoding] = firstViolation;
+      nofSteps += (firstViolation<0)?lengths[trace]:(uint64_t)(firstViolation+1);
+    }
+    letters += lengths[trace];
+  }
+  return nofSteps;
+}
+
+/* Runs all encodings on nofTraces random traces with lengths between 1 and maxLength. The first letter of
+   every trace is drawn uniformly. Afterwards, in every step, with probability changeProbability/256, each
+   proposition changes its value with probability 1/8, which makes the traces behave like the slowly
+   changing signals of a controller. Stops at the first trace for which the encodings disagree on the step
+   of the first violation, which is then copied to counterexample (of size maxLength). Returns 1 in this
+   case and 0 otherwise, and adds the number of monitor steps executed to *nofSteps. */
+int fuzzRandom(uint64_t seed, uint64_t nofTraces, uint32_t maxLength, uint32_t changeProbability, uint8_t *counterexample, uint32_t *counterexampleLength, uint64_t *nofSteps) {
+  uint64_t randomState = seed*2+1;
+  for (uint64_t trace=0;trace<nofTraces;trace++) {
+    uint32_t length = 1+nextRandom(&randomState)%maxLength;
+    uint8_t letter = nextRandom(&randomState);
+    for (uint32_t i=0;i<length;i++) {
+      uint64_t random = nextRandom(&randomState);
+      if ((random & 0xff)<changeProbability) {
+        letter ^= (random >> 8) & (random >> 16) & (random >> 24);
+      }
+      counterexample[i] = letter;
+    }
+    int64_t firstViolation = runEncoding(0,counterexample,length);
+    *nofSteps += (firstViolation<0)?length:(uint64_t)(firstViolation+1);
+    for (int encoding=1;encoding<nofEncodings;encoding++) {
+      int64_t firstViolationHere = runEncoding(encoding,counterexample,length);
+      *nofSteps += (firstViolationHere<0)?length:(uint64_t)(firstViolationHere+1);
+      if (firstViolationHere!=firstViolation) {
+        *counterexampleLength = length;
+        return 1;
+      }
+    }
+  }
+  return 0;
+}
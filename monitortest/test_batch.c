@@ -0,0 +1,18 @@
+#include <stdlib.h>
+#include <stdio.h>
+#include <stdint.h>
+#include <stddef.h>
+
+size_t monitor_run(const uint8_t *letters, size_t n);
+
+/* The trace from test.c, with the letters packed such that bit i is the value of the i-th proposition */
+const uint8_t letters[7] = {0x09,0x0b,0x0c,0x0a,0x19,0x21,0x24};
+
+int main() {
+  size_t firstViolation = monitor_run(letters,7);
+  if (firstViolation!=6) {
+    printf("Monitor reports the first violation for letter %d instead of letter 6\n",(int)firstViolation);
+    return 1;
+  }
+  return 0;
+}
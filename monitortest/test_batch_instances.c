@@ -0,0 +1,52 @@
+#include <stdlib.h>
+#include <stdio.h>
+#include <stdint.h>
+#include <stddef.h>
+
+/* The monitor is included, so that the size of its context type is known. It is given in MONITOR, and SLICED
+   is defined for the bit-sliced monitors. */
+#include MONITOR
+
+/* The trace from test.c, with the letters packed such that bit i is the value of the i-th proposition */
+const uint8_t letters[7] = {0x09,0x0b,0x0c,0x0a,0x19,0x21,0x24};
+
+int main() {
+#ifdef SLICED
+  /* All 32 instances process the trace, in two calls */
+  uint8_t slicedLetters[7*32];
+  for (int i=0;i<7*32;i++) slicedLetters[i] = letters[i/32];
+  monitorSlicedContext ctx;
+  monitor_sliced_init(&ctx);
+  uint32_t violations;
+  size_t firstViolation = monitor_sliced_run(&ctx,slicedLetters,3,&violations);
+  if ((firstViolation!=3) || (violations!=0)) {
+    printf("Monitor reports a violation in one of the first three steps\n");
+    return 1;
+  }
+  firstViolation = 3+monitor_sliced_run(&ctx,slicedLetters+3*32,4,&violations);
+  if ((firstViolation!=6) || (violations!=0xFFFFFFFFu)) {
+    printf("Monitor reports the first violation for letter %d with instance word %08x instead of letter 6 for all instances\n",(int)firstViolation,(unsigned int)violations);
+    return 1;
+  }
+#else
+  /* Context a is advanced by three letters before context b processes the whole trace */
+  monitorContext a,b;
+  monitor_init(&a);
+  monitor_init(&b);
+  if (monitor_run_ctx(&a,letters,3)!=3) {
+    printf("Monitor reports a violation in one of the first three steps\n");
+    return 1;
+  }
+  size_t firstViolation = monitor_run_ctx(&b,letters,7);
+  if (firstViolation!=6) {
+    printf("Monitor reports the first violation for letter %d instead of letter 6\n",(int)firstViolation);
+    return 1;
+  }
+  firstViolation = 3+monitor_run_ctx(&a,letters+3,4);
+  if (firstViolation!=6) {
+    printf("Monitor continued on a context reports the first violation for letter %d instead of letter 6\n",(int)firstViolation);
+    return 1;
+  }
+#endif
+  return 0;
+}
@@ -9,18 +9,78 @@ fi
 clang test.c ../results/monolithic_nba.c -o test_monolithic
 echo "Testing monolithic monitor."
 ./test_monolithic
+clang test.c ../results/monolithic_nba_bitparallel.c -o test_monolithic_bitparallel
+echo "Testing bit-parallel monolithic monitor."
+./test_monolithic_bitparallel
 clang test.c ../results/monolithic_det_monitor.c -o test_deterministic
 echo "Testing deterministic monitor."
 ./test_deterministic
+if test -f ../results/monolithic_det_table_monitor.c; then
+  clang test.c ../results/monolithic_det_table_monitor.c -o test_deterministic_table
+  echo "Testing table-driven deterministic monitor."
+  ./test_deterministic_table
+  clang test_batch.c ../results/monolithic_det_table_monitor.c -o test_batch_monolithic_det_table_monitor
+  echo "Testing batch entry point of monolithic_det_table_monitor."
+  ./test_batch_monolithic_det_table_monitor
+fi
+clang test.c ../results/monolithic_nba_branchless.c -o test_monolithic_branchless
+echo "Testing branchless monolithic monitor."
+./test_monolithic_branchless
+clang test.c ../results/monolithic_det_branchless.c -o test_deterministic_branchless
+echo "Testing branchless deterministic monitor."
+./test_deterministic_branchless
 clang test.c ../results/fragmented_monitor.c -o test_fragmented
 echo "Testing fragmented monitor."
 ./test_fragmented
+clang test.c ../results/fragmented_event_monitor.c -o test_fragmented_event
+echo "Testing event-driven fragmented monitor."
+./test_fragmented_event
+clang test.c ../results/partitioned_fragmented_monitor.c -o test_partitioned
+echo "Testing fragmented monitor for the automatically partitioned specification."
+./test_partitioned
+clang test.c ../results/hybrid_fragmented_monitor.c -o test_hybrid
+echo "Testing fragmented monitor with an encoding selected for every fragment."
+./test_hybrid
+clang test.c ../results/fragmented_packed_monitor.c -o test_fragmented_packed
+echo "Testing fragmented monitor with bit-packed states."
+./test_fragmented_packed
 clang test.c ../results/uca.c -o test_uca
 echo "Testing UCA monitor."
 ./test_uca
+clang test.c ../results/uca_bitparallel.c -o test_uca_bitparallel
+echo "Testing bit-parallel UCA monitor."
+./test_uca_bitparallel
+clang test.c ../results/uca_lookup_tables.c -o test_uca_lookup_tables
+echo "Testing UCA monitor with successor lookup tables."
+./test_uca_lookup_tables
+clang test.c ../results/uca_lazy_determinization.c -o test_uca_lazy_determinization
+echo "Testing UCA monitor with lazy determinization."
+./test_uca_lazy_determinization
+clang test.c ../results/uca_context.c -o test_uca_context
+echo "Testing UCA monitor with a caller-provided context."
+./test_uca_context
+clang test.c ../results/uca_bitsliced.c -o test_uca_bitsliced
+echo "Testing bit-sliced UCA monitor."
+./test_uca_bitsliced
+clang test_batch_instances.c -DMONITOR='"../results/uca_context.c"' -o test_batch_instances_uca_context
+echo "Testing batch entry point of uca_context on two contexts."
+./test_batch_instances_uca_context
+clang test_batch_instances.c -DSLICED -DMONITOR='"../results/uca_bitsliced.c"' -o test_batch_instances_uca_bitsliced
+echo "Testing batch entry point of uca_bitsliced for 32 instances."
+./test_batch_instances_uca_bitsliced
+clang test.c ../results/uca_branchless.c -o test_uca_branchless
+echo "Testing branchless UCA monitor."
+./test_uca_branchless
+clang test.c ../results/uca_packed.c -o test_uca_packed
+echo "Testing UCA monitor with bit-packed states."
+./test_uca_packed
 
+for monitor in monolithic_nba monolithic_nba_bitparallel monolithic_det_monitor monolithic_nba_branchless monolithic_det_branchless fragmented_monitor fragmented_event_monitor partitioned_fragmented_monitor hybrid_fragmented_monitor fragmented_packed_monitor uca uca_bitparallel uca_lookup_tables uca_lazy_determinization uca_context uca_bitsliced uca_branchless uca_packed; do
+  clang test_batch.c ../results/$monitor.c -o test_batch_$monitor
+  echo "Testing batch entry point of $monitor."
+  ./test_batch_$monitor
+done
 
 echo "==========================="
 echo "All tests successfully run!"
 echo "==========================="
-
@@ -1,9 +1,22 @@
 #!/usr/bin/env bash
 # Using clang instead of GCC.
 set -e
-clang test_violation_tracking.c ../results/uca_reason_tracking.c -o test_reasontracking_full
-echo "Testing UCA Violation Reason tracking monitor with output."
-./test_reasontracking_full
+for variant in with_uvw_optimizations without_uvw_optimizations shared_history; do
+  if grep -q buildViolationRecord ../results/uca_reason_tracking_$variant.c; then
+    # Built with HOST_DECODING: The record is decoded on the host and compared with the description computed on the device
+    clang -DHOST_DECODING test_violation_tracking.c ../results/uca_reason_tracking_$variant.c -o test_reasontracking_$variant
+    clang test_violation_tracking.c ../results/uca_reason_tracking_${variant}_text.c -o test_reasontracking_${variant}_text
+    echo "Testing UCA Violation Reason tracking monitor ($variant) with host decoding."
+    ./test_reasontracking_$variant violation_record_$variant.bin
+    python3 ../results/uca_reason_tracking_${variant}_decoder.py violation_record_$variant.bin > decoded_trace_$variant.txt
+    ./test_reasontracking_${variant}_text > device_trace_$variant.txt
+    diff decoded_trace_$variant.txt device_trace_$variant.txt
+    cat decoded_trace_$variant.txt
+  else
+    clang test_violation_tracking.c ../results/uca_reason_tracking_$variant.c -o test_reasontracking_$variant
+    echo "Testing UCA Violation Reason tracking monitor ($variant) with output."
+    ./test_reasontracking_$variant
+  fi
+done
 echo "======================="
 echo "Test successfully run. You should see debug output above.!"
-
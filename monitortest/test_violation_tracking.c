@@ -3,12 +3,19 @@
 #include <stdint.h>
 
 int monitor(uint8_t r1,uint8_t y1,uint8_t g1,uint8_t r2,uint8_t y2,uint8_t g2,uint8_t a1,uint8_t a2);
+#ifdef HOST_DECODING
+/* Monitors built with HOST_DECODING only provide a violation record, which is written to the file given as argument */
+void buildViolationRecord();
+extern uint8_t violationRecord[];
+extern const uint32_t violationRecordSize;
+#else
 void buildViolatingTraceInformation();
 extern char violatingTraceInformation[1209];
+#endif
 
 #define CHECKMON(STEP,VAL) if (failed!=VAL) { printf("Monitor result differs from expected result in step %d\n",STEP); return 1; }
 
-int main() {
+int main(int argc, char **argv) {
   int failed = 0;
   failed = monitor(1,0,0,1,0,0,0,0);
   CHECKMON(1,0)
@@ -35,7 +42,15 @@ int main() {
   failed = monitor(1,0,0,0,0,1,1,0);
   CHECKMON(12,1)
  
+#ifdef HOST_DECODING
+  if (argc<2) { printf("Usage: %s <file for the violation record>\n",argv[0]); return 1; }
+  buildViolationRecord();
+  FILE *recordFile = fopen(argv[1],"wb");
+  if ((recordFile==NULL) || (fwrite(violationRecord,1,violationRecordSize,recordFile)!=violationRecordSize)) { printf("Cannot write the violation record.\n"); return 1; }
+  fclose(recordFile);
+#else
   buildViolatingTraceInformation();
   printf("%s",violatingTraceInformation);
+#endif
   return 0;
 }
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# Reference simulator for the automata from which the monitors are built. Evaluates many traces at
+# once, with the active states of all traces stored in a NumPy array of (trace,state) pairs that is
+# updated with one gather over the successor lists of the automaton in every step. Single long traces
+# are split into segments that are simulated in parallel from every state and then composed. Used to
+# obtain verdicts independently of the generated C code.
+#
+# This file is dual-licensed under licensed under CC BY-SA version 4.0, available at 
+# https://creativecommons.org/licenses/by-sa/4.0/legalcode and the following BSD licence:
+#
+# ------------------------------------------[BSD License Text]---------------------------------------------
+# Copyright 2024 Ruediger Ehlers
+# 
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided 
+# that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this list of conditions and 
+# the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and
+# the following disclaimer in the documentation and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or 
+# promote products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS “AS IS” AND ANY EXPRESS OR IMPLIED 
+# WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A 
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE 
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS 
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, 
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN 
+# IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Traces are given as arrays of letters, where letter L has bit i set if APs[i] is true, as in the 
+# trace files of the host benchmark. NumPy is only needed when the simulator is actually used.
+
+import os
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+SEMANTICS = ["nondeterministic","universal","deterministic","fragmented"]
+CHUNK_SIZE = 65536 # Number of steps of recorded trace files that are read into memory at once
+SEGMENT_LANES = 65536 # Number of (segment,state) pairs simulated at once when splitting a single trace
+
+
+class ReferenceSimulator:
+    """Simulates an automaton (or, for the fragmented semantics, a list of automata) on a batch of traces.
+    For the nondeterministic and deterministic semantics, a trace violates the specification when no state
+    is active anymore. For the universal semantics, it does so when the rejecting state is active, and for
+    the fragmented semantics when any of the fragments has no active state anymore. Violations are sticky,
+    i.e., once a trace violates the specification, it does so for all future steps.
+
+    The active states of every automaton are stored as sorted array of numbers trace*nofStates+state.
+    A step costs time linear in the number of active (trace,state) pairs, independently of the number of
+    states of the automaton."""
+
+    def __init__(self,automata,semantics):
+        if numpy is None:
+            raise Exception("Error: The reference simulator needs NumPy, which is not installed.")
+        if not semantics in SEMANTICS:
+            raise Exception("Error: Unknown monitor semantics "+str(semantics)+".")
+        if semantics!="fragmented":
+            automata = [automata]
+        if semantics=="deterministic":
+            for automaton in automata:
+                if len(automaton.startingStates)!=1:
+                    raise Exception("Error: A deterministic automaton needs exactly one initial state.")
+        self.automata = automata
+        self.semantics = semantics
+        self.successorLists = [self.computeSuccessorLists(automaton) for automaton in automata]
+        randomNumbers = numpy.random.default_rng(0) # Random state hashes for finding runs with equal active states
+        self.stateHashes = [randomNumbers.integers(0,1 << 62,automaton.nofStates,dtype=numpy.int64) for automaton in automata]
+        if semantics=="universal":
+            self.rejectingState = automata[0].findRejectingState()
+        self.reset(0)
+
+    @staticmethod
+    def computeSuccessorLists(automaton):
+        """Successor states of every state for every letter, in compressed form. The successors of state s
+        for letter L are targets[offsets[s*nofLetters+L]:offsets[s*nofLetters+L+1]]. Only needs memory
+        linear in the number of (state,letter,successor) triples, so also large automata fit."""
+        nofLetters = 1 << len(automaton.APs)
+        successors = [[] for a in range(automaton.nofStates*nofLetters)]
+        for state in range(automaton.nofStates):
+            for (target,guard) in automaton.transitions[state]:
+                letterSet = automaton.guardToLetterSet(guard)
+                for letter in range(nofLetters):
+                    if (letterSet >> letter) & 1:
+                        successors[state*nofLetters+letter].append(target)
+        offsets = numpy.zeros(len(successors)+1,dtype=numpy.int64)
+        offsets[1:] = numpy.cumsum([len(a) for a in successors])
+        targets = numpy.array([target for a in successors for target in a],dtype=numpy.int64)
+        return (offsets,targets)
+
+    def reset(self,nofTraces):
+        """Starts the simulation of nofTraces traces from the initial states."""
+        self.activeStates = []
+        for automaton in self.automata:
+            initialStates = numpy.array(sorted(set(automaton.startingStates)),dtype=numpy.int64)
+            traces = numpy.arange(nofTraces,dtype=numpy.int64)
+            self.activeStates.append((traces[:,None]*automaton.nofStates+initialStates[None,:]).reshape(-1))
+        self.nofSteps = 0
+        self.violated = numpy.zeros(nofTraces,dtype=bool)
+        self.firstViolation = numpy.full(nofTraces,-1,dtype=numpy.int64)
+
+    def computeSuccessors(self,fragmentNum,activeStates,letters,running=None):
+        """Computes the active (trace,state) pairs of automaton fragmentNum after reading one letter per
+        trace, by gathering the successor lists of all active pairs at once. If running is given, only the
+        traces for which it is true are updated."""
+        nofStates = self.automata[fragmentNum].nofStates
+        nofLetters = 1 << len(self.automata[fragmentNum].APs)
+        (offsets,targets) = self.successorLists[fragmentNum]
+        traces = activeStates//nofStates
+        if not running is None:
+            stopped = activeStates[~running[traces]]
+            activeStates = activeStates[running[traces]]
+            traces = activeStates//nofStates
+        listIndices = (activeStates%nofStates)*nofLetters+letters[traces]
+        starts = offsets[listIndices]
+        counts = offsets[listIndices+1]-starts
+        ends = numpy.cumsum(counts)
+        positions = numpy.arange(ends[-1] if len(ends)>0 else 0,dtype=numpy.int64)+numpy.repeat(starts-ends+counts,counts)
+        nextStates = numpy.repeat(traces,counts)*nofStates+targets[positions]
+        if not running is None:
+            nextStates = numpy.concatenate([nextStates,stopped])
+        if len(letters)*nofStates<=64*len(nextStates):
+            # Marking the pairs in a dense array is faster than sorting them if there are many pairs
+            isActive = numpy.zeros(len(letters)*nofStates,dtype=bool)
+            isActive[nextStates] = True
+            return numpy.flatnonzero(isActive)
+        return numpy.unique(nextStates)
+
+    def computeViolations(self,fragmentNum,activeStates,nofTraces):
+        """Computes for every trace whether the active (trace,state) pairs of automaton fragmentNum are a
+        violation of the specification."""
+        nofStates = self.automata[fragmentNum].nofStates
+        if self.semantics=="universal":
+            violated = numpy.zeros(nofTraces,dtype=bool)
+            violated[activeStates[activeStates%nofStates==self.rejectingState]//nofStates] = True
+        else:
+            violated = numpy.ones(nofTraces,dtype=bool)
+            violated[activeStates//nofStates] = False
+        return violated
+
+    def step(self,letters,running=None):
+        """Processes one letter per trace. If running is given, only the traces for which it is true are
+        updated (which is used for traces of different lengths). Returns the (sticky) violation flags."""
+        letters = numpy.asarray(letters,dtype=numpy.int64)
+        violatedNow = numpy.zeros(len(letters),dtype=bool)
+        for fragmentNum in range(len(self.automata)):
+            self.activeStates[fragmentNum] = self.computeSuccessors(fragmentNum,self.activeStates[fragmentNum],letters,running)
+            violatedNow |= self.computeViolations(fragmentNum,self.activeStates[fragmentNum],len(letters))
+        if not running is None:
+            violatedNow &= running
+        self.firstViolation[violatedNow & ~self.violated] = self.nofSteps
+        self.violated |= violatedNow
+        self.nofSteps += 1
+        return self.violated
+
+    def run(self,traces,lengths=None):
+        """Runs the simulator from the initial states on a batch of traces, given as array of shape (nofTraces,
+        nofSteps). If the traces have different lengths, they can be given in lengths. Returns for every
+        trace the index of the step in which the specification was violated first, or -1 if it was not."""
+        traces = numpy.asarray(traces,dtype=numpy.uint8)
+        self.reset(traces.shape[0])
+        self.continueRun(traces,lengths)
+        return self.firstViolation.copy()
+
+    def continueRun(self,traces,lengths=None,offset=0):
+        """Continues the simulation with the next steps of the traces. The traces are at step offset of the
+        complete traces, which is needed to compare the steps with the lengths."""
+        for stepNum in range(traces.shape[1]):
+            if lengths is None:
+                self.step(traces[:,stepNum])
+            else:
+                self.step(traces[:,stepNum],numpy.asarray(lengths)>offset+stepNum)
+
+    def mergeEqualLanes(self,fragmentNum,activeStates,violated):
+        """Finds lanes of the same segment that have the same active states (and have both or both not
+        violated the specification yet), which then have the same future. Returns the active (lane,state)
+        pairs without the pairs of the lanes merged into other lanes, the merged lanes, and the lanes
+        into which they are merged."""
+        nofStates = self.automata[fragmentNum].nofStates
+        (lanes,starts,sizes) = numpy.unique(activeStates//nofStates,return_index=True,return_counts=True)
+        hashes = numpy.add.reduceat(self.stateHashes[fragmentNum][activeStates%nofStates],starts) if len(lanes)>0 else sizes
+        order = numpy.lexsort((lanes,hashes,sizes,violated[lanes],lanes//nofStates))
+        (lanes,starts,sizes,hashes) = (lanes[order],starts[order],sizes[order],hashes[order])
+        sameAsPrevious = numpy.zeros(len(lanes),dtype=bool)
+        sameAsPrevious[1:] = (lanes[1:]//nofStates==lanes[:-1]//nofStates) & (violated[lanes[1:]]==violated[lanes[:-1]]) & (sizes[1:]==sizes[:-1]) & (hashes[1:]==hashes[:-1])
+        groupStarts = numpy.maximum.accumulate(numpy.where(sameAsPrevious,0,numpy.arange(len(lanes))))
+        (candidates,representatives) = (numpy.flatnonzero(sameAsPrevious),groupStarts[sameAsPrevious])
+        if len(candidates)==0:
+            return (activeStates,lanes[0:0],lanes[0:0])
+        # The hashes can collide, so the active states are compared before merging
+        candidateSizes = sizes[candidates]
+        ends = numpy.cumsum(candidateSizes)
+        positions = numpy.arange(ends[-1],dtype=numpy.int64)-numpy.repeat(ends-candidateSizes,candidateSizes)
+        sameStates = activeStates[numpy.repeat(starts[candidates],candidateSizes)+positions]%nofStates==activeStates[numpy.repeat(starts[representatives],candidateSizes)+positions]%nofStates
+        equal = numpy.logical_and.reduceat(sameStates,ends-candidateSizes)
+        (mergedLanes,intoLanes) = (lanes[candidates[equal]],lanes[representatives[equal]])
+        isMerged = numpy.zeros(len(violated),dtype=bool)
+        isMerged[mergedLanes] = True
+        return (activeStates[~isMerged[activeStates//nofStates]],mergedLanes,intoLanes)
+
+    def computeSegmentRelations(self,fragmentNum,segments,lengths):
+        """Simulates automaton fragmentNum on every segment (row of segments, with the given lengths) from
+        every single state. Lane segmentNum*nofStates+state is the run from the state. Runs of the same
+        segment that reach the same active states are merged, so that the work shrinks once the runs have
+        converged. Returns the active (lane,state) pairs at the ends of the segments, for every lane the lane
+        whose pairs are its states at the end of the segment, and for every lane the index of the step in
+        the segment in which the lane violates the specification first (or -1)."""
+        nofStates = self.automata[fragmentNum].nofStates
+        lanes = numpy.arange(segments.shape[0]*nofStates,dtype=numpy.int64)
+        activeStates = lanes*nofStates+lanes%nofStates
+        firstViolation = numpy.full(len(lanes),-1,dtype=numpy.int64)
+        isMerged = numpy.zeros(len(lanes),dtype=bool)
+        merges = []
+        for stepNum in range(segments.shape[1]):
+            running = numpy.repeat(lengths>stepNum,nofStates)
+            activeStates = self.computeSuccessors(fragmentNum,activeStates,numpy.repeat(segments[:,stepNum].astype(numpy.int64),nofStates),running)
+            violatedNow = self.computeViolations(fragmentNum,activeStates,len(lanes)) & running & ~isMerged
+            firstViolation[violatedNow & (firstViolation<0)] = stepNum
+            (activeStates,mergedLanes,intoLanes) = self.mergeEqualLanes(fragmentNum,activeStates,firstViolation>=0)
+            if len(mergedLanes)>0:
+                isMerged[mergedLanes] = True
+                merges.append((mergedLanes,intoLanes))
+        # A merged lane that has not violated the specification before the merge does so together with the
+        # lane that it is merged into. Later merges are resolved first, as they are into lanes merged later.
+        endLanes = lanes.copy()
+        for (mergedLanes,intoLanes) in reversed(merges):
+            endLanes[mergedLanes] = endLanes[intoLanes]
+            firstViolation[mergedLanes] = numpy.where(firstViolation[mergedLanes]>=0,firstViolation[mergedLanes],firstViolation[intoLanes])
+        return (activeStates,endLanes,firstViolation)
+
+    def runSegmented(self,trace):
+        """Computes the index of the step of the first violation (or -1) of a single trace, which can be
+        memory-mapped. Since a single trace cannot be split over the traces of a batch, it is cut into
+        segments that are all simulated at the same time from every state of the automata. The resulting
+        relations between the states at the starts and the ends of the segments are then composed from the
+        initial states onwards. This takes nofStates times as much work as simulating the trace directly, but
+        in steps that are vectorized over up to SEGMENT_LANES lanes, which is much faster for small automata."""
+        nofSegments = max(1,SEGMENT_LANES//max(automaton.nofStates for automaton in self.automata))
+        segmentLength = max(1,min(CHUNK_SIZE,-(-len(trace)//nofSegments)))
+        activeStates = [numpy.array(sorted(set(automaton.startingStates)),dtype=numpy.int64) for automaton in self.automata]
+        for offset in range(0,len(trace),nofSegments*segmentLength):
+            part = numpy.asarray(trace[offset:offset+nofSegments*segmentLength],dtype=numpy.uint8)
+            nofSegmentsNow = -(-len(part)//segmentLength)
+            segments = numpy.zeros(nofSegmentsNow*segmentLength,dtype=numpy.uint8)
+            segments[0:len(part)] = part
+            segments = segments.reshape(nofSegmentsNow,segmentLength)
+            lengths = numpy.full(nofSegmentsNow,segmentLength,dtype=numpy.int64)
+            lengths[-1] = len(part)-(nofSegmentsNow-1)*segmentLength
+            relations = [self.computeSegmentRelations(fragmentNum,segments,lengths) for fragmentNum in range(len(self.automata))]
+            for segmentNum in range(nofSegmentsNow):
+                firstViolation = -1
+                for (fragmentNum,(endStates,endLanes,laneViolations)) in enumerate(relations):
+                    nofStates = self.automata[fragmentNum].nofStates
+                    lanes = segmentNum*nofStates+activeStates[fragmentNum]
+                    violationSteps = laneViolations[lanes]
+                    if self.semantics=="universal":
+                        # The rejecting state is active as soon as it is active in one of the runs
+                        violationSteps = violationSteps[violationSteps>=0]
+                        violationStep = violationSteps.min() if len(violationSteps)>0 else -1
+                    else:
+                        # No state is active anymore once all runs have no active state
+                        violationStep = violationSteps.max() if (violationSteps>=0).all() else -1
+                    if violationStep>=0 and (firstViolation<0 or violationStep<firstViolation):
+                        firstViolation = violationStep
+                    (low,high) = numpy.searchsorted(endStates,[segmentNum*nofStates*nofStates,(segmentNum+1)*nofStates*nofStates])
+                    segmentEndStates = endStates[low:high]
+                    activeStates[fragmentNum] = numpy.unique(segmentEndStates[numpy.isin(segmentEndStates//nofStates,endLanes[lanes])]%nofStates)
+                if firstViolation>=0:
+                    return offset+segmentNum*segmentLength+int(firstViolation)
+        return -1
+
+
+def simulateTraceFiles(simulator,filenames):
+    """Computes the verdicts for recorded traces, one trace per file (in the format of the host benchmark).
+    The files are memory-mapped and processed in chunks of CHUNK_SIZE steps, so that they do not need to
+    fit into memory. Returns the index of the step of the first violation for every file (or -1). If there
+    are fewer files than states in the automata, the files are simulated one after the other with
+    runSegmented, as a batch of few traces would not make use of vectorization."""
+    traces = [numpy.memmap(filename,dtype=numpy.uint8,mode="r") if os.path.getsize(filename)>0 else numpy.zeros(0,dtype=numpy.uint8) for filename in filenames]
+    if len(traces)<sum(automaton.nofStates for automaton in simulator.automata):
+        simulator.reset(0)
+        return numpy.array([simulator.runSegmented(trace) for trace in traces],dtype=numpy.int64)
+    lengths = numpy.array([len(a) for a in traces],dtype=numpy.int64)
+    simulator.reset(len(traces))
+    for offset in range(0,max(list(lengths)+[0]),CHUNK_SIZE):
+        chunk = numpy.zeros((len(traces),CHUNK_SIZE),dtype=numpy.uint8)
+        for (traceNum,trace) in enumerate(traces):
+            part = trace[offset:offset+CHUNK_SIZE]
+            chunk[traceNum,0:len(part)] = part
+        simulator.continueRun(chunk[:,0:min(CHUNK_SIZE,max(lengths)-offset)],lengths,offset)
+    return simulator.firstViolation.copy()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# Automatic partitioning of the specification into the blocks of a fragmented monitor. Starting from
+# one block per specification line, blocks that share propositions are merged as long as this reduces
+# a weighted cost of the number of states, the estimated code size, and the estimated number of
+# operations per step of the monitor fragments computed by SPOT.
+#
+# This file is dual-licensed under licensed under CC BY-SA version 4.0, available at 
+# https://creativecommons.org/licenses/by-sa/4.0/legalcode and the following BSD licence:
+#
+# ------------------------------------------[BSD License Text]---------------------------------------------
+# Copyright 2024 Ruediger Ehlers
+# 
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided 
+# that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this list of conditions and 
+# the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and
+# the following disclaimer in the documentation and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or 
+# promote products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS “AS IS” AND ANY EXPRESS OR IMPLIED 
+# WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A 
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE 
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS 
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, 
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN 
+# IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import os, re, tempfile, multiprocessing
+from hoa_automaton import loadHOAFile
+from automaton_optimization import optimizeAutomaton
+from spot_translation import translateLTL
+from monitor_compilers import estimateFragmentResources
+
+
+# =====================================
+# Specification blocks
+# =====================================
+def writeSpecBlocks(specBlocks,filename):
+    """Writes specification blocks in the format read by readSpecBlocks."""
+    with open(filename,"w") as outFile:
+        outFile.write("\n\n".join(["\n".join(block) for block in specBlocks])+"\n")
+
+
+def specLineAPs(line,APs):
+    """Set of the propositions occurring in a specification line."""
+    return set([a for a in re.findall("[A-Za-z_][A-Za-z_0-9]*",line) if a in APs])
+
+
+def temporalDepth(line):
+    """Number of next-time operators in a specification line, which bounds how far a fragment needs to
+    look back."""
+    return len(re.findall("\\bX\\b",line))
+
+
+# =====================================
+# Cost model
+# =====================================
+def fragmentCost(costs,weights):
+    """Weighted cost of a fragment, for the flash memory, RAM, and operations per step estimated by
+    estimateFragmentResources. The same estimates are used for selecting the encodings of the fragments
+    of hybrid fragmented monitors."""
+    return sum([a*b for (a,b) in zip(costs,weights)])
+
+
+def estimateBlockCosts(job):
+    """Worker function: Translates a specification block with SPOT and estimates the resources of
+    the respective fragment."""
+    (block,APs,filenameHOA,optimizeGuards,optimizeAutomata) = job
+    translateLTL(" & ".join(["("+a+")" for a in block]),["-M"],filenameHOA)
+    automaton = loadHOAFile(filenameHOA,APs)
+    if optimizeAutomata:
+        automaton = optimizeAutomaton(automaton,False,filenameHOA)
+    return estimateFragmentResources("state set",automaton,optimizeGuards)
+
+
+# =====================================
+# Partitioning
+# =====================================
+def partitionSpec(specLines,APs,weights,nofWorkers,optimizeGuards=False,optimizeAutomata=False,manualBlocks=None):
+    """Partitions the specification lines into blocks for a fragmented monitor. Starting with one block
+    per line, in every round, all pairs of blocks that share a proposition are translated as merged
+    blocks, and the merge that reduces the cost the most is applied. Pairs sharing more propositions
+    and having a similar temporal depth are tried first, so that they are preferred among merges with
+    the same cost. The weights are the factors for the three values computed by estimateFragmentResources.
+    If manualBlocks is given, it is used instead of the result if it has a lower total cost. The
+    blocks are returned in the order of the specification lines."""
+    blockCosts = {}
+    temporaryDirectory = tempfile.TemporaryDirectory()
+
+    def computeCosts(blocks):
+        """Computes the costs of all blocks not evaluated before, using nofWorkers processes."""
+        blocks = [a for a in set(blocks) if not a in blockCosts]
+        jobs = [(block,APs,os.path.join(temporaryDirectory.name,"block"+str(len(blockCosts)+i)+".txt"),optimizeGuards,optimizeAutomata) for i,block in enumerate(blocks)]
+        if nofWorkers<=1 or len(jobs)<=1:
+            results = [estimateBlockCosts(job) for job in jobs]
+        else:
+            with multiprocessing.Pool(nofWorkers) as pool:
+                results = pool.map(estimateBlockCosts,jobs)
+        for (block,costs) in zip(blocks,results):
+            blockCosts[block] = fragmentCost(costs,weights)
+
+    lineAPs = {line: specLineAPs(line,APs) for line in specLines}
+    lineDepths = {line: temporalDepth(line) for line in specLines}
+    blocks = [(line,) for line in specLines]
+    computeCosts(blocks)
+    while True:
+        # Candidate merges: pairs of blocks with shared propositions
+        candidates = []
+        for i in range(len(blocks)):
+            for j in range(i+1,len(blocks)):
+                sharedAPs = set.union(*[lineAPs[a] for a in blocks[i]]) & set.union(*[lineAPs[a] for a in blocks[j]])
+                if len(sharedAPs)>0:
+                    depthDifference = abs(max([lineDepths[a] for a in blocks[i]])-max([lineDepths[a] for a in blocks[j]]))
+                    candidates.append((-len(sharedAPs),depthDifference,i,j))
+        candidates.sort()
+        mergedBlocks = [tuple(sorted(blocks[i]+blocks[j],key=specLines.index)) for (sharedAPs,depthDifference,i,j) in candidates]
+        computeCosts(mergedBlocks)
+        bestMerge = None
+        bestGain = 0
+        for (mergedBlock,(sharedAPs,depthDifference,i,j)) in zip(mergedBlocks,candidates):
+            gain = blockCosts[blocks[i]]+blockCosts[blocks[j]]-blockCosts[mergedBlock]
+            if gain>bestGain:
+                (bestMerge,bestGain) = ((i,j,mergedBlock),gain)
+        if bestMerge is None:
+            break
+        (i,j,mergedBlock) = bestMerge
+        blocks = [a for k,a in enumerate(blocks) if k!=i and k!=j]+[mergedBlock]
+        blocks.sort(key=lambda a: specLines.index(a[0]))
+
+    totalCost = sum([blockCosts[a] for a in blocks])
+    print("Automatic partitioning: "+str(len(specLines))+" specification lines in "+str(len(blocks))+" blocks, cost "+str(totalCost))
+    if manualBlocks is not None:
+        manualBlocks = [tuple(a) for a in manualBlocks]
+        computeCosts(manualBlocks)
+        manualCost = sum([blockCosts[a] for a in manualBlocks])
+        print("Manual partitioning: "+str(len(manualBlocks))+" blocks, cost "+str(manualCost))
+        if manualCost<totalCost:
+            blocks = manualBlocks
+    temporaryDirectory.cleanup()
+    return [list(a) for a in blocks]
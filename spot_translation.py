@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# Calling SPOT's ltl2tgba for translating LTL formulas to automata, with a cache on disk so that
+# formulas that have been translated before (with the same flags and SPOT version) do not need to
+# be translated again.
+#
+# This file is dual-licensed under licensed under CC BY-SA version 4.0, available at 
+# https://creativecommons.org/licenses/by-sa/4.0/legalcode and the following BSD licence:
+#
+# ------------------------------------------[BSD License Text]---------------------------------------------
+# Copyright 2024 Ruediger Ehlers
+# 
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided 
+# that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this list of conditions and 
+# the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and
+# the following disclaimer in the documentation and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or 
+# promote products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS “AS IS” AND ANY EXPRESS OR IMPLIED 
+# WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A 
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE 
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS 
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, 
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN 
+# IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import os, shutil, hashlib, subprocess
+
+# =========================================
+# Settings
+# =========================================
+LTL2TGBA_BINARY = "lib/spot-2.12/bin/ltl2tgba"
+CACHE_DIRECTORY = "spot_cache"
+
+spotVersion = None
+
+def getSpotVersion():
+    """Version line reported by ltl2tgba, computed only once per run."""
+    global spotVersion
+    if spotVersion is None:
+        spotVersion = subprocess.check_output([LTL2TGBA_BINARY,"--version"]).decode("utf-8").split("\n")[0].strip()
+    return spotVersion
+
+
+def getCacheFilename(formula,flags):
+    """The cache is content-addressed: the name of the cache file is a hash over the SPOT version,
+    the flags, and the formula."""
+    keyText = "\n".join([getSpotVersion()]+flags+[formula])
+    key = hashlib.sha256(keyText.encode("utf-8")).hexdigest()
+    if "-d" in flags:
+        return os.path.join(CACHE_DIRECTORY,key+".dot")
+    return os.path.join(CACHE_DIRECTORY,key+".txt")
+
+
+def translateLTL(formula,flags,filenameOut):
+    """Translates an LTL formula with ltl2tgba and the given list of flags (such as ["-M"] or ["-d"]) and
+    writes the result to filenameOut. Returns True if the result was taken from the cache."""
+    cacheFilename = getCacheFilename(formula,flags)
+    cacheHit = os.path.exists(cacheFilename)
+    if not cacheHit:
+        os.makedirs(CACHE_DIRECTORY,exist_ok=True)
+        # Write to a temporary file first, so that an interrupted run does not leave an incomplete cache entry
+        temporaryFilename = cacheFilename+".tmp"+str(os.getpid())
+        assert os.system(LTL2TGBA_BINARY+" "+" ".join(flags+["-f","\""+formula+"\""])+" > "+temporaryFilename)==0
+        os.replace(temporaryFilename,cacheFilename)
+    shutil.copyfile(cacheFilename,filenameOut)
+    return cacheHit
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+# Static analysis of the worst-case cost of a single step of the generated monitors. For every
+# encoding, the number of guard operations, the number of memory writes, and (for the monitors that
+# track the reason for a violation) the number of bytes copied are bounded over all reachable
+# combinations of active states and all letters, and the combination for which the bound is attained
+# is reported. This is useful when the monitor is called from an interrupt service routine, where the
+# worst case matters more than the average computation time.
+#
+# This file is dual-licensed under licensed under CC BY-SA version 4.0, available at 
+# https://creativecommons.org/licenses/by-sa/4.0/legalcode and the following BSD licence:
+#
+# ------------------------------------------[BSD License Text]---------------------------------------------
+# Copyright 2024 Ruediger Ehlers
+# 
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided 
+# that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this list of conditions and 
+# the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and
+# the following disclaimer in the documentation and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or 
+# promote products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS “AS IS” AND ANY EXPRESS OR IMPLIED 
+# WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A 
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE 
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS 
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, 
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN 
+# IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from guard_optimization import GuardOptimizer
+from monitor_compilers import computeBitParallelUpdates, computeBitParallelGuards, computeSuccessorLookupTables, computeInPlaceUpdateOrder, packedByteMasks
+
+
+# =====================================
+# Reachable combinations of states
+# =====================================
+def computeLetterRepresentatives(automaton):
+    """One letter for every class of letters that satisfy the same guards. All costs depend on the letter
+    only through the guards it satisfies, so it suffices to analyze these letters."""
+    letterSets = set([automaton.guardToLetterSet(guard) for transitionList in automaton.transitions for (target,guard) in transitionList])
+    representatives = {}
+    for letter in range(1 << len(automaton.APs)):
+        signature = tuple([(letterSet >> letter) & 1 for letterSet in letterSets])
+        if not signature in representatives:
+            representatives[signature] = letter
+    return sorted(representatives.values())
+
+
+def computeSuccessorMasks(automaton):
+    """For every state and letter, the bitmask of the successor states."""
+    nofLetters = 1 << len(automaton.APs)
+    successorMasks = []
+    for state in range(automaton.nofStates):
+        row = [0 for a in range(nofLetters)]
+        for (target,guard) in automaton.transitions[state]:
+            letterSet = automaton.guardToLetterSet(guard)
+            for letter in range(nofLetters):
+                if letterSet & (1 << letter):
+                    row[letter] |= 1 << target
+        successorMasks.append(row)
+    return successorMasks
+
+
+def computeReachableStateSets(automaton,maxNofSets):
+    """Computes the combinations of states that can be active at the same time in a monitor that tracks
+    the set of active states, as a list of bitmasks. If there are more than maxNofSets of them, all
+    states are assumed to be possibly active at the same time, which over-approximates the worst case."""
+    successorMasks = computeSuccessorMasks(automaton)
+    letters = computeLetterRepresentatives(automaton)
+    initialSet = sum([1 << a for a in automaton.startingStates])
+    reachable = set([initialSet])
+    todo = [initialSet]
+    while len(todo)>0:
+        thisOne = todo.pop()
+        activeStates = [state for state in range(automaton.nofStates) if thisOne & (1 << state)]
+        for letter in letters:
+            successors = 0
+            for state in activeStates:
+                successors |= successorMasks[state][letter]
+            if not successors in reachable:
+                reachable.add(successors)
+                todo.append(successors)
+                if len(reachable)>maxNofSets:
+                    print("Warning: More than "+str(maxNofSets)+" reachable combinations of states, assuming that all states can be active at the same time.")
+                    return [(1 << automaton.nofStates)-1]
+    return sorted(reachable)
+
+
+# =====================================
+# Worst-case step costs
+#
+# Every analysis returns a tuple consisting of the number of
+# operations for selecting the transitions, the number of memory
+# writes, the number of bytes copied, and the bitmask of the
+# active states and the letter for which the maximum of the sum
+# of these numbers is attained (or None if the cost does not
+# depend on them). The operations are those of the guards as
+# counted by the GuardOptimizer of the compiler (negations,
+# conjunctions, and disjunctions), where the shared terms are
+# computed in every step, together with the comparisons, table
+# lookups, and masks that select the transitions, packing the
+# letter, and checking for a violation.
+# =====================================
+def computeLetterConstructionOperations(APs):
+    """Number of operations of letterConstructionCode: one comparison per AP and the additions."""
+    return 2*len(APs)-1
+
+
+def computeViolationCheckOperations(automaton,universal):
+    """Number of operations for checking whether a monitor with one variable per state reports a violation.
+    For a nondeterministic automaton, all state variables are tested, and for a universal automaton, the
+    variable of the rejecting state is returned as it is."""
+    return 0 if universal else automaton.nofStates
+
+
+def computeStateGuardOperations(automaton,guards):
+    """For every state, the number of operations for evaluating the guards of its outgoing transitions in
+    addition to the shared operations of the GuardOptimizer guards."""
+    return [sum([guards.guardOperations(guard) for (target,guard) in automaton.transitions[state]]) for state in range(automaton.nofStates)]
+
+
+def analyzeStateSetMonitor(automaton,stateSets,guards,universal=False):
+    """Worst-case step cost of the monitors with one variable per state (monitorCompilerNondeterministic,
+    monitorCompilerUniversal, the context monitors, and the fragments of fragmented monitors), whose
+    guards are translated by the GuardOptimizer guards. The shared terms and the guards of the outgoing
+    transitions of the active states are evaluated, and every state variable is written twice in
+    addition to the successor states set by the transitions taken."""
+    nofStates = automaton.nofStates
+    guardCosts = computeStateGuardOperations(automaton,guards)
+    letters = computeLetterRepresentatives(automaton)
+    nofTransitionsTaken = [[len([guard for (target,guard) in automaton.transitions[state] if automaton.guardToLetterSet(guard) & (1 << letter)]) for letter in letters] for state in range(nofStates)]
+    worstCase = None
+    for stateSet in stateSets:
+        activeStates = [state for state in range(nofStates) if stateSet & (1 << state)]
+        guardOperations = guards.sharedOperations()+sum([guardCosts[state] for state in activeStates])+computeViolationCheckOperations(automaton,universal)
+        for (letterNum,letter) in enumerate(letters):
+            memoryWrites = 2*nofStates+sum([nofTransitionsTaken[state][letterNum] for state in activeStates])
+            if worstCase is None or guardOperations+memoryWrites>worstCase[0]+worstCase[1]:
+                worstCase = (guardOperations,memoryWrites,0,stateSet,letter)
+    return worstCase
+
+
+def analyzePackedStateSetMonitor(automaton,stateSets,guards,universal=False,firstBit=0):
+    """Worst-case step cost of the monitors that store state i in bit firstBit+i of the bit array stateFlags
+    and update it with the code from packedStateUpdateCode (the monitors compiled with packStates). Reading
+    a flag takes a shift and a mask. If the automaton is very weak, all flags are read for the incoming
+    transitions of every state, the guards of the transitions from the active states are evaluated, and
+    every flag is written once. Otherwise, the flags of all states are read, the guards of the transitions
+    from the active states are evaluated, and the bytes of the local successor array are written when
+    initializing it and for the transitions taken, and merged into stateFlags."""
+    nofStates = automaton.nofStates
+    guardCosts = computeStateGuardOperations(automaton,guards)
+    letters = computeLetterRepresentatives(automaton)
+    byteMasks = packedByteMasks(firstBit,nofStates)
+    if universal:
+        violationCheck = 2
+    else:
+        violationCheck = len([mask for (byte,mask) in byteMasks if mask!=255])+len(byteMasks)
+    if computeInPlaceUpdateOrder(automaton) is not None:
+        # Two operations for every flag read and a disjunction between the terms of the same state
+        nofTransitions = sum([len(transitionList) for transitionList in automaton.transitions])
+        flagOperations = 2*nofTransitions+sum([len(automaton.reverseTransitions[state])-1 for state in range(nofStates) if len(automaton.reverseTransitions[state])>0])
+        nofTransitionsTaken = [[0 for letter in letters] for state in range(nofStates)]
+        fixedWrites = nofStates
+    else:
+        flagOperations = 2*nofStates+2*len([mask for (byte,mask) in byteMasks if mask!=255])
+        nofTransitionsTaken = [[len([guard for (target,guard) in automaton.transitions[state] if automaton.guardToLetterSet(guard) & (1 << letter)]) for letter in letters] for state in range(nofStates)]
+        fixedWrites = 2*len(byteMasks)
+    worstCase = None
+    for stateSet in stateSets:
+        activeStates = [state for state in range(nofStates) if stateSet & (1 << state)]
+        guardOperations = guards.sharedOperations()+flagOperations+sum([guardCosts[state] for state in activeStates])+violationCheck
+        for (letterNum,letter) in enumerate(letters):
+            memoryWrites = fixedWrites+sum([nofTransitionsTaken[state][letterNum] for state in activeStates])
+            if worstCase is None or guardOperations+memoryWrites>worstCase[0]+worstCase[1]:
+                worstCase = (guardOperations,memoryWrites,0,stateSet,letter)
+    return worstCase
+
+
+def analyzeDeterministicMonitor(automaton,guards):
+    """Worst-case step cost of the monitors computed by monitorCompilerDeterministic. The shared terms are
+    computed, the state variable is compared with all states up to the current one, and the guards of its
+    transitions are evaluated in order until one of them is satisfied. If none is, the remaining
+    comparisons are made as well."""
+    nofStates = automaton.nofStates
+    worstCase = None
+    for state in range(nofStates):
+        for letter in computeLetterRepresentatives(automaton):
+            guardOperations = guards.sharedOperations()+state+1
+            memoryWrites = 0
+            for (target,guard) in automaton.transitions[state]:
+                guardOperations += guards.guardOperations(guard)
+                if automaton.guardToLetterSet(guard) & (1 << letter):
+                    memoryWrites = 1
+                    break
+            if memoryWrites==0:
+                guardOperations += nofStates-state-1
+            if worstCase is None or guardOperations+memoryWrites>worstCase[0]+worstCase[1]:
+                worstCase = (guardOperations,memoryWrites,0,1 << state,letter)
+    return worstCase
+
+
+def analyzeTableMonitor(automaton,constructsLetter=True):
+    """Worst-case step cost of the monitors computed by monitorCompilerDeterministicTable, which look up
+    the letter class and then the successor state in tables, write the state variable, and compare it
+    with the violation state. If constructsLetter is not set (for table-driven fragments), the packed
+    letter is computed by the fragmented monitor."""
+    guardOperations = 3
+    if constructsLetter:
+        guardOperations += computeLetterConstructionOperations(automaton.APs)
+    return (guardOperations,1,0,None,None)
+
+
+def analyzeBitParallelMonitor(automaton,guards,universal=False,lookupTableFlashBudget=0):
+    """Worst-case step cost of the monitors computed by the bit-parallel compilers, whose guards are
+    translated by the GuardOptimizer guards. The shared terms and every distinct guard of the updates are
+    evaluated and turned into a mask, one entry of every word of the lookup tables is looked up, and
+    every update and table word as well as every word of the state vector (twice, for initializing the
+    successors and copying them) is written. The letter is packed if there are lookup tables."""
+    nofWords = (automaton.nofStates+31)//32
+    lookupTables = computeSuccessorLookupTables(automaton,lookupTableFlashBudget)
+    updates = computeBitParallelUpdates(automaton,[a for a in range(automaton.nofStates) if not a in lookupTables])
+    guardOperations = guards.sharedOperations()+sum([guards.guardOperations(guard)+1 for guard in computeBitParallelGuards(updates)])
+    nofTableWords = sum([len(rows[0]) if isinstance(rows[0],list) else 1 for (entryType,firstWord,shift,rows) in lookupTables.values()])
+    guardOperations += nofTableWords
+    if len(lookupTables)>0:
+        guardOperations += computeLetterConstructionOperations(automaton.APs)
+    guardOperations += 2 if universal else nofWords
+    return (guardOperations,len(updates)+nofTableWords+2*nofWords,0,None,None)
+
+
+def analyzeLazyDeterminizationMonitor(automaton,guards,lookupTableFlashBudget=0):
+    """Worst-case step cost of the monitors computed by monitorCompilerUniversalLazyDeterminization, which
+    is a cache miss: the letter is packed, the hash of the letter and the active states is computed (an
+    exclusive or and a multiplication per word and three operations for mixing and selecting the entry),
+    the entry is compared with the letter and the active states, the successors are computed as by the
+    bit-parallel monitor, and the miss counter and the letter, states, and successors of the entry are
+    written."""
+    nofWords = (automaton.nofStates+31)//32
+    (guardOperations,memoryWrites,bytesCopied,stateSet,letter) = analyzeBitParallelMonitor(automaton,guards,True,lookupTableFlashBudget)
+    if len(computeSuccessorLookupTables(automaton,lookupTableFlashBudget))==0:
+        guardOperations += computeLetterConstructionOperations(automaton.APs)
+    guardOperations += (2*nofWords+3)+(2*nofWords+2)
+    return (guardOperations,memoryWrites+2*nofWords+2,0,None,None)
+
+
+def analyzeBranchlessMonitor(automaton,guards,universal=False):
+    """Worst-case step cost of the monitors computed by the branchless compilers, which is the same for all
+    states and letters. The letter is packed, the shared terms and the guards of all transitions are
+    evaluated, every transition masks its source state with its guard, the terms of the incoming
+    transitions of every state are joined by disjunctions, and every state variable is written twice."""
+    guardOperations = computeLetterConstructionOperations(automaton.APs)+guards.sharedOperations()
+    for state in range(automaton.nofStates):
+        for (target,guard) in automaton.transitions[state]:
+            guardOperations += guards.guardOperations(guard)+(0 if guard.isTrue() else 1)
+        if len(automaton.reverseTransitions[state])>0:
+            guardOperations += len(automaton.reverseTransitions[state])-1
+    guardOperations += computeViolationCheckOperations(automaton,universal)
+    return (guardOperations,2*automaton.nofStates,0,None,None)
+
+
+def analyzeBitSlicedMonitor(automaton,guards,universal=False):
+    """Worst-case step cost of monitor_sliced_step() of the monitors computed by the bit-sliced compilers,
+    which advances 32 instances at once and is the same for all states and letters. The shared terms and
+    the guards of all transitions are evaluated, every transition masks its source state word with its
+    guard and writes the result into the successor word, and every state word is written twice."""
+    nofTransitions = sum([len(transitionList) for transitionList in automaton.transitions])
+    guardOperations = guards.sharedOperations()
+    for transitionList in automaton.transitions:
+        for (target,guard) in transitionList:
+            guardOperations += guards.guardOperations(guard)+(0 if guard.isTrue() else 1)
+    guardOperations += computeViolationCheckOperations(automaton,universal)
+    return (guardOperations,nofTransitions+2*automaton.nofStates,0,None,None)
+
+
+def analyzeFragmentedMonitor(fragments,maxNofSets,optimizeGuards=False,eventDriven=False,hybrid=False,packStates=False):
+    """Worst-case step cost of a fragmented monitor, given as the list of the (encoding,automaton) pairs of
+    its fragments returned by compileFragmentedMonitorInParallel with the same settings. The guards of every
+    fragment are translated by a GuardOptimizer for the same guard uses as in the fragment compilers. The
+    fragments are analyzed separately, so the bound is the sum of the bounds of the fragments (plus
+    packing the letter for event-driven and hybrid monitors), and the active states and letters of the
+    fragments are returned as lists. In the worst case, the letter of an event-driven fragment differs
+    from its stable letter, so in addition to the update, the letter is masked and compared, the old and
+    new states are compared, and the stable letter is written."""
+    worstCases = []
+    firstBit = 0
+    for (encoding,automaton) in fragments:
+        nofStates = automaton.nofStates
+        if encoding=="table":
+            worstCases.append(analyzeTableMonitor(automaton,False))
+        elif encoding=="universal bit vector":
+            guards = GuardOptimizer(automaton,computeBitParallelGuards(computeBitParallelUpdates(automaton,range(nofStates))),optimizeGuards)
+            worstCases.append(analyzeBitParallelMonitor(automaton,guards,True))
+        else:
+            guards = GuardOptimizer(automaton,[guard for transitionList in automaton.transitions for (target,guard) in transitionList],optimizeGuards)
+            stateSets = computeReachableStateSets(automaton,maxNofSets)
+            if packStates:
+                (guardOperations,memoryWrites,bytesCopied,stateSet,letter) = analyzePackedStateSetMonitor(automaton,stateSets,guards,False,firstBit)
+                nofBytes = len(packedByteMasks(firstBit,nofStates))
+                (changeOperations,changeWrites) = (4*nofBytes-1,nofBytes)
+                firstBit += nofStates
+            else:
+                (guardOperations,memoryWrites,bytesCopied,stateSet,letter) = analyzeStateSetMonitor(automaton,stateSets,guards)
+                (changeOperations,changeWrites) = (2*nofStates-1,0)
+            if eventDriven:
+                guardOperations += 2+changeOperations+2
+                memoryWrites += changeWrites+1
+            worstCases.append((guardOperations,memoryWrites,bytesCopied,stateSet,letter))
+    worstCase = [sum([a[i] for a in worstCases]) for i in range(3)]
+    if eventDriven or hybrid:
+        worstCase[0] += computeLetterConstructionOperations(fragments[0][1].APs)
+    return tuple(worstCase+[[a[3] for a in worstCases],[a[4] for a in worstCases]])
+
+
+def analyzeReasonTrackingMonitor(automaton,stateSets,bytesCopiedPerTransition,guards):
+    """Worst-case step cost of a universal monitor that tracks the reason for a violation and updates the
+    states in place (such as monitorCompilerUniversalWithReasonTracking), whose guards are translated by
+    the GuardOptimizer guards. The shared terms are computed in every step, and the guard of a transition
+    is only evaluated if its source state is active. Every state variable is written once, and taking a
+    transition that is not a self-loop writes the state variable of the target state and copies the path
+    information, whose size is given for all pairs (source,target) in bytesCopiedPerTransition."""
+    nofStates = automaton.nofStates
+    guardCosts = computeStateGuardOperations(automaton,guards)
+    letters = computeLetterRepresentatives(automaton)
+    # Memory writes and bytes copied for the transitions taken from every state for every letter
+    transitionCosts = []
+    for state in range(nofStates):
+        row = []
+        for letter in letters:
+            takenTransitions = [target for (target,guard) in automaton.transitions[state] if target!=state and automaton.guardToLetterSet(guard) & (1 << letter)]
+            row.append((len(takenTransitions),sum([bytesCopiedPerTransition[(state,target)] for target in takenTransitions])))
+        transitionCosts.append(row)
+    worstCase = None
+    for stateSet in stateSets:
+        activeStates = [state for state in range(nofStates) if stateSet & (1 << state)]
+        guardOperations = guards.sharedOperations()+sum([guardCosts[state] for state in activeStates])
+        for (letterNum,letter) in enumerate(letters):
+            memoryWrites = nofStates+sum([transitionCosts[state][letterNum][0] for state in activeStates])
+            bytesCopied = sum([transitionCosts[state][letterNum][1] for state in activeStates])
+            if worstCase is None or guardOperations+memoryWrites+bytesCopied>sum(worstCase[0:3]):
+                worstCase = (guardOperations,memoryWrites,bytesCopied,stateSet,letter)
+    return worstCase
+
+
+# =====================================
+# Reporting
+# =====================================
+def describeWorstCase(APs,stateSet,letter):
+    """Text describing the combination of active states and the letter for which the worst case is attained."""
+    if stateSet is None:
+        return "the same for all states and letters"
+    if isinstance(stateSet,list):
+        return ", ".join(["fragment "+str(i)+": "+describeWorstCase(APs,a,b) for i,(a,b) in enumerate(zip(stateSet,letter))])
+    states = [str(a) for a in range(stateSet.bit_length()) if stateSet & (1 << a)]
+    literals = [("" if letter & (1 << i) else "!")+a for i,a in enumerate(APs)]
+    return "states {"+",".join(states)+"} active, letter "+" & ".join(literals)
+
+
+def reportWorstCaseStepCost(outFile,macroName,worstCase,APs):
+    """Prints the worst-case step cost of a monitor and writes it as TeX macros to outFile (if not None).
+    Returns the bound, i.e., the sum of the guard operations, memory writes, and bytes copied."""
+    (guardOperations,memoryWrites,bytesCopied,stateSet,letter) = worstCase
+    bound = guardOperations+memoryWrites+bytesCopied
+    print("Worst-case step cost of "+macroName+": "+str(guardOperations)+" guard operations, "+str(memoryWrites)+" memory writes, "+str(bytesCopied)+" bytes copied, for "+describeWorstCase(APs,stateSet,letter))
+    if outFile is not None:
+        outFile.write("\\newcommand{\\WCETGuardOperations"+macroName+"}{"+str(guardOperations)+"}\n")
+        outFile.write("\\newcommand{\\WCETMemoryWrites"+macroName+"}{"+str(memoryWrites)+"}\n")
+        outFile.write("\\newcommand{\\WCETBytesCopied"+macroName+"}{"+str(bytesCopied)+"}\n")
+        outFile.write("\\newcommand{\\WCETStepCost"+macroName+"}{"+str(bound)+"}\n")
+    return bound